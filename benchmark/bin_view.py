@@ -0,0 +1,28 @@
+"""Compare unpacking large bin payloads into bytes and with bin_as_view=True."""
+
+import timeit
+
+from msgpack import Unpacker, packb, unpackb
+
+
+def profile(name, func):
+    number = 20
+    best = min(timeit.repeat(func, number=number, repeat=9)) / number
+    print("%-30s %10.3f ms" % (name, best * 1e3))
+
+
+def main():
+    message = packb({"id": 1, "name": "blob", "payload": b"x" * (20 * 1024 * 1024)})
+    profile("unpackb", lambda: unpackb(message))
+    profile("unpackb bin_as_view", lambda: unpackb(message, bin_as_view=True))
+
+    def unpacker(**kwargs):
+        unpacker = Unpacker(max_buffer_size=0, **kwargs)
+        unpacker.feed(message)
+        return unpacker.unpack()
+
+    profile("Unpacker", unpacker)
+    profile("Unpacker bin_as_view", lambda: unpacker(bin_as_view=True))
+
+
+main()
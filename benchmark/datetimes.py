@@ -0,0 +1,29 @@
+"""Pack and unpack records carrying several datetimes."""
+
+import datetime
+import timeit
+
+from msgpack import packb, unpackb
+
+utc = datetime.timezone.utc
+start = datetime.datetime(2024, 1, 1, tzinfo=utc)
+records = [
+    {
+        "created": start + datetime.timedelta(seconds=i, microseconds=i),
+        "updated": start + datetime.timedelta(minutes=i),
+        "expires": start + datetime.timedelta(days=i % 1000),
+    }
+    for i in range(30000)
+]
+packed = packb(records, datetime=True)
+
+
+def profile(name, func):
+    number = 10
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print("%-30s %10.2f ms" % (name, best * 1e3))
+
+
+profile("packb(datetime=True)", lambda: packb(records, datetime=True))
+profile("unpackb(timestamp=3)", lambda: unpackb(packed, timestamp=3))
+profile("unpackb(timestamp=0)", lambda: unpackb(packed))
@@ -0,0 +1,38 @@
+"""Compare memory and time of unpacking repeated values with dedup_values."""
+
+import timeit
+import tracemalloc
+
+from msgpack import packb, unpackb
+
+
+def profile(name, func):
+    number = 5
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    tracemalloc.start()
+    obj = func()  # noqa: F841
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print("%-30s %10.2f ms %10.2f MB" % (name, best * 1e3, size / 1e6))
+
+
+def main():
+    statuses = ["active", "inactive", "pending", "deleted"]
+    countries = ["France", "Germany", "Japan", "Brazil", "Canada"]
+    records = [
+        {
+            "id": i,
+            "status": statuses[i % 4],
+            "country": countries[i % 5],
+            "tags": ["tag%d" % (i % 10), "common"],
+            "point": [i % 3, i % 7],
+        }
+        for i in range(100000)
+    ]
+    data = packb(records)
+
+    profile("unpackb()", lambda: unpackb(data, use_list=False))
+    profile("unpackb(dedup_values=1024)", lambda: unpackb(data, use_list=False, dedup_values=1024))
+
+
+main()
@@ -0,0 +1,28 @@
+"""Pack and unpack many Timestamp and ExtType values."""
+
+import timeit
+
+from msgpack import ExtType, Timestamp, packb, unpackb
+
+
+def profile(name, func):
+    number = 10
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print("%-30s %10.2f ms" % (name, best * 1e3))
+
+
+def main():
+    timestamps = [Timestamp(1700000000 + i, i) for i in range(100000)]
+    exts = [ExtType(5, b"payload") for i in range(100000)]
+    packed_timestamps = packb(timestamps)
+    packed_exts = packb(exts)
+
+    profile("Timestamp()", lambda: [Timestamp(i, 1) for i in range(100000)])
+    profile("packb(timestamps)", lambda: packb(timestamps))
+    profile("unpackb(timestamps)", lambda: unpackb(packed_timestamps))
+    profile("ExtType()", lambda: [ExtType(5, b"payload") for i in range(100000)])
+    profile("packb(exts)", lambda: packb(exts))
+    profile("unpackb(exts)", lambda: unpackb(packed_exts))
+
+
+main()
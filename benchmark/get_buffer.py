@@ -0,0 +1,57 @@
+"""Compare feeding Unpacker with recv() and receiving with get_buffer()."""
+
+import socket
+import threading
+import timeit
+
+from msgpack import Unpacker, packb
+
+
+def profile(name, func):
+    number = 5
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print("%-30s %10.2f ms" % (name, best * 1e3))
+
+
+def receive(data, consume):
+    a, b = socket.socketpair()
+    sender = threading.Thread(target=lambda: (a.sendall(data), a.close()))
+    sender.start()
+    try:
+        consume(b)
+    finally:
+        b.close()
+        sender.join()
+
+
+def feed(sock):
+    unpacker = Unpacker()
+    while True:
+        buf = sock.recv(64 * 1024)
+        if not buf:
+            break
+        unpacker.feed(buf)
+        for _ in unpacker:
+            pass
+
+
+def get_buffer(sock):
+    unpacker = Unpacker()
+    while True:
+        n = sock.recv_into(unpacker.get_buffer(64 * 1024))
+        if not n:
+            break
+        unpacker.buffer_updated(n)
+        for _ in unpacker:
+            pass
+
+
+def main():
+    record = {"id": 1, "user": "alice", "payload": b"\x00" * 2000, "values": [1.5] * 10}
+    data = packb(record) * 20000
+
+    profile("feed(recv())", lambda: receive(data, feed))
+    profile("get_buffer()/buffer_updated()", lambda: receive(data, get_buffer))
+
+
+main()
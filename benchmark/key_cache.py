@@ -0,0 +1,32 @@
+"""Compare unpacking maps with and without the decoded key cache."""
+
+import timeit
+
+from msgpack import Unpacker, packb, unpackb_many
+
+
+def profile(name, func):
+    number = 10
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print("%-30s %10.2f ms" % (name, best * 1e3))
+
+
+def unpack(data, **kwargs):
+    unpacker = Unpacker(**kwargs)
+    unpacker.feed(data)
+    for _ in unpacker:
+        pass
+
+
+def main():
+    record = {"id": 1, "user": "alice", "created_at": 1.5, "tags": ["a", "b"], "active": True}
+    payloads = [packb(record)] * 20000
+    data = b"".join(payloads)
+
+    profile("Unpacker(key_cache=0)", lambda: unpack(data, key_cache=0))
+    profile("Unpacker()", lambda: unpack(data))
+    profile("unpackb_many(key_cache=0)", lambda: unpackb_many(payloads, key_cache=0))
+    profile("unpackb_many()", lambda: unpackb_many(payloads))
+
+
+main()
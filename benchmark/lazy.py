@@ -0,0 +1,30 @@
+"""Compare reading a few fields of a large message with unpackb and unpackb_lazy."""
+
+import timeit
+
+from msgpack import packb, unpackb, unpackb_lazy
+
+
+def profile(name, func):
+    number = 1000
+    best = min(timeit.repeat(func, number=number, repeat=9)) / number
+    print("%-30s %10.2f us" % (name, best * 1e6))
+
+
+def main():
+    message = {
+        "field%d" % i: {"name": "value%d" % i, "tags": ["a", "b", "c"], "score": i * 0.5}
+        for i in range(200)
+    }
+    message["id"] = 12345
+    packed = packb(message)
+
+    def read(unpack):
+        doc = unpack(packed)
+        return doc["id"], doc["field10"]["name"], doc["field150"]["score"]
+
+    profile("unpackb", lambda: read(unpackb))
+    profile("unpackb_lazy", lambda: read(unpackb_lazy))
+
+
+main()
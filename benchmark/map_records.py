@@ -0,0 +1,28 @@
+"""Compare unpacking maps of the same keys to dicts and to records."""
+
+import timeit
+from collections import namedtuple
+
+from msgpack import packb, unpackb
+
+KEYS = ["id", "name", "email", "created_at", "is_active", "score", "tags", "country"]
+
+
+def profile(name, func):
+    number = 10
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print("%-30s %10.2f ms" % (name, best * 1e3))
+
+
+def main():
+    data = packb([{k: i for k in KEYS} for i in range(50000)])
+    Record = namedtuple("Record", KEYS)
+
+    profile("dict", lambda: unpackb(data))
+    profile("object_hook", lambda: unpackb(data, object_hook=lambda d: Record(**d)))
+    profile("map_records='tuple'", lambda: unpackb(data, map_records="tuple"))
+    profile("map_records='namedtuple'", lambda: unpackb(data, map_records="namedtuple"))
+    profile("map_records=factory", lambda: unpackb(data, map_records=lambda keys: Record))
+
+
+main()
@@ -0,0 +1,50 @@
+"""Compare reading a large file with and without memory mapping."""
+
+import os
+import tempfile
+import timeit
+
+import msgpack
+from msgpack import Unpacker, packb
+
+
+def profile(name, func):
+    number = 3
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print("%-30s %10.2f ms" % (name, best * 1e3))
+
+
+def iterate(path, **kwargs):
+    with open(path, "rb") as f:
+        for _ in Unpacker(f, **kwargs):
+            pass
+
+
+def load(path, **kwargs):
+    with open(path, "rb") as f:
+        return msgpack.unpack(f, **kwargs)
+
+
+def read_load(path):
+    with open(path, "rb") as f:
+        return msgpack.unpackb(f.read())
+
+
+def main():
+    record = {"id": 1, "user": "alice", "payload": b"\x00" * 2000, "values": [1.5] * 10}
+    with tempfile.TemporaryDirectory() as tmp:
+        stream = os.path.join(tmp, "stream.msgpack")
+        with open(stream, "wb") as f:
+            f.write(packb(record) * 20000)
+        single = os.path.join(tmp, "single.msgpack")
+        with open(single, "wb") as f:
+            f.write(packb([record] * 20000))
+
+        profile("Unpacker(f)", lambda: iterate(stream))
+        profile("Unpacker(f, zero_copy=True)", lambda: iterate(stream, zero_copy=True))
+        profile("Unpacker(f, bin_as_view=True)", lambda: iterate(stream, bin_as_view=True))
+        profile("unpackb(f.read())", lambda: read_load(single))
+        profile("unpack(f)", lambda: load(single))
+
+
+main()
@@ -0,0 +1,31 @@
+"""Compare packing NumPy arrays as tobytes() in ExtType and with ndarray_ext_code."""
+
+import timeit
+
+import numpy
+
+from msgpack import ExtType, packb, unpackb
+
+
+def profile(name, func):
+    number = 20
+    best = min(timeit.repeat(func, number=number, repeat=9)) / number
+    print("%-30s %10.2f ms" % (name, best * 1e3))
+
+
+def ext_hook(code, data):
+    return numpy.frombuffer(data, numpy.float32)
+
+
+def main():
+    arr = numpy.random.rand(2_000_000).astype(numpy.float32)
+    packed = packb(ExtType(1, arr.tobytes()))
+    profile("pack tobytes", lambda: packb(ExtType(1, arr.tobytes())))
+    profile("unpack ext_hook", lambda: unpackb(packed, ext_hook=ext_hook))
+
+    packed = packb(arr, ndarray_ext_code=1)
+    profile("pack ndarray_ext_code", lambda: packb(arr, ndarray_ext_code=1))
+    profile("unpack ndarray_ext_code", lambda: unpackb(packed, ndarray_ext_code=1))
+
+
+main()
@@ -0,0 +1,43 @@
+"""Compare packing dataclasses with default=dataclasses.asdict and pack_objects="map"."""
+
+import dataclasses
+import timeit
+
+from msgpack import Packer
+
+
+@dataclasses.dataclass
+class Address:
+    street: str
+    city: str
+
+
+@dataclasses.dataclass
+class User:
+    id: int
+    name: str
+    email: str
+    active: bool
+    address: Address
+
+
+def profile(name, func):
+    number = 20
+    best = min(timeit.repeat(func, number=number, repeat=9)) / number
+    print("%-30s %10.2f ms" % (name, best * 1e3))
+
+
+def main():
+    data = [
+        User(i, "user%d" % i, "user%d@example.com" % i, True, Address("Main St", "Springfield"))
+        for i in range(10000)
+    ]
+    packer = Packer(default=dataclasses.asdict)
+    profile("default=asdict", lambda: packer.pack(data))
+    packer = Packer(pack_objects="map")
+    profile('pack_objects="map"', lambda: packer.pack(data))
+    packer = Packer(pack_objects="array")
+    profile('pack_objects="array"', lambda: packer.pack(data))
+
+
+main()
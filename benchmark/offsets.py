@@ -0,0 +1,36 @@
+"""Compare indexing a stream of records with scan_offsets and with Unpacker."""
+
+import io
+import timeit
+
+from msgpack import Unpacker, packb, scan_offsets
+
+
+def profile(name, func):
+    number = 10
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print("%-30s %10.2f ms" % (name, best * 1e3))
+
+
+def unpacker_offsets(data):
+    unpacker = Unpacker(io.BytesIO(data))
+    offsets = []
+    while True:
+        offset = unpacker.tell()
+        try:
+            unpacker.skip()
+        except Exception:
+            return offsets
+        offsets.append(offset)
+
+
+def main():
+    record = {"id": 1, "user": "alice", "tags": ["a", "b", "c"], "values": [1.5] * 10}
+    data = packb(record) * 20000
+
+    profile("Unpacker.skip + tell", lambda: unpacker_offsets(data))
+    profile("scan_offsets(bytes)", lambda: scan_offsets(data))
+    profile("scan_offsets(file)", lambda: scan_offsets(io.BytesIO(data)))
+
+
+main()
@@ -0,0 +1,35 @@
+"""Compare packing objects one by one and joining them with pack_many()."""
+
+import timeit
+from array import array
+
+from msgpack import Packer
+
+
+def profile(name, func):
+    number = 20
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print("%-30s %10.2f ms" % (name, best * 1e3))
+
+
+def pack_join(packer, objs):
+    offsets = array("Q")
+    chunks = []
+    pos = 0
+    for o in objs:
+        b = packer.pack(o)
+        offsets.append(pos)
+        pos += len(b)
+        chunks.append(b)
+    return b"".join(chunks), offsets
+
+
+def main():
+    objs = [{"id": i, "name": "user%d" % i, "score": i * 0.5} for i in range(10000)]
+    packer = Packer()
+
+    profile("pack() and join", lambda: pack_join(packer, objs))
+    profile("pack_many()", lambda: packer.pack_many(objs))
+
+
+main()
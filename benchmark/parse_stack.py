@@ -0,0 +1,25 @@
+"""Time unpacking small messages, which use the embedded parse stack,
+and deeply nested data, which spills to the heap."""
+
+import sys
+import timeit
+
+from msgpack import Unpacker, packb, unpackb
+
+
+def profile(name, func, number=100000):
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print("%-30s %10.2f us" % (name, best * 1e6))
+
+
+def main():
+    small = packb({"id": 1, "tags": ["a", "b"]})
+    deep = b"\x91" * 1000 + b"\xc0"
+
+    print("%-30s %10d bytes" % ("sys.getsizeof(Unpacker())", sys.getsizeof(Unpacker())))
+    profile("Unpacker()", Unpacker)
+    profile("unpackb(small)", lambda: unpackb(small))
+    profile("unpackb(nested 1000)", lambda: unpackb(deep), number=1000)
+
+
+main()
@@ -0,0 +1,46 @@
+"""Compare Unpacker refills with read() and with readinto()/recv_into()."""
+
+import io
+import socket
+import threading
+import timeit
+
+from msgpack import Unpacker, packb
+
+
+def profile(name, func):
+    number = 5
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print("%-30s %10.2f ms" % (name, best * 1e3))
+
+
+class ReadOnly:
+    def __init__(self, data):
+        self.read = io.BytesIO(data).read
+
+
+def iterate(f):
+    for _ in Unpacker(f, read_size=64 * 1024):
+        pass
+
+
+def iterate_socket(data):
+    a, b = socket.socketpair()
+    sender = threading.Thread(target=lambda: (a.sendall(data), a.close()))
+    sender.start()
+    for _ in Unpacker(b, read_size=64 * 1024):
+        pass
+    sender.join()
+    b.close()
+
+
+def main():
+    record = {"id": 1, "user": "alice", "payload": b"\x00" * 2000, "values": [1.5] * 10}
+    data = packb(record) * 20000
+
+    profile("read()", lambda: iterate(ReadOnly(data)))
+    profile("readinto()", lambda: iterate(io.BytesIO(data)))
+    profile("recv_into()", lambda: iterate_socket(data))
+
+
+main()
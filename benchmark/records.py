@@ -0,0 +1,25 @@
+"""Pack a list of records sharing the same keys, with and without key_cache."""
+
+import timeit
+
+from msgpack import Packer
+
+KEYS = ["id", "name", "email", "created_at", "updated_at", "is_active", "score", "tags"]
+KEYS += ["field_%02d" % i for i in range(12)]
+
+
+def profile(name, func):
+    number = 20
+    best = min(timeit.repeat(func, number=number, repeat=9)) / number
+    print("%-30s %10.2f ms" % (name, best * 1e3))
+
+
+def main():
+    records = [{k: i for k in KEYS} for i in range(10000)]
+    packer = Packer()
+    profile("key_cache=0", lambda: packer.pack(records))
+    packer = Packer(key_cache=256)
+    profile("key_cache=256", lambda: packer.pack(records))
+
+
+main()
@@ -0,0 +1,61 @@
+"""Compare decoding records with object_hook and with schema."""
+
+import dataclasses
+import timeit
+
+from msgpack import Unpacker, packb, unpackb
+
+
+@dataclasses.dataclass
+class Address:
+    street: str
+    city: str
+
+
+@dataclasses.dataclass
+class User:
+    id: int
+    name: str
+    email: str
+    active: bool
+    address: Address
+
+
+def profile(name, func):
+    number = 20
+    best = min(timeit.repeat(func, number=number, repeat=9)) / number
+    print("%-30s %10.2f ms" % (name, best * 1e3))
+
+
+def object_hook(d):
+    if "street" in d:
+        return Address(**d)
+    return User(**d)
+
+
+def main():
+    data = [
+        {
+            "id": i,
+            "name": "user%d" % i,
+            "email": "user%d@example.com" % i,
+            "active": True,
+            "address": {"street": "Main St", "city": "Springfield"},
+        }
+        for i in range(10000)
+    ]
+    packed = b"".join(packb(d) for d in data)
+
+    def run(**kwargs):
+        unpacker = Unpacker(**kwargs)
+        unpacker.feed(packed)
+        return list(unpacker)
+
+    profile("dict", lambda: run())
+    profile("object_hook", lambda: run(object_hook=object_hook))
+    profile("schema=User", lambda: run(schema=User))
+    one = packb(data[0])
+    profile("unpackb(schema=User) x1000", lambda: [unpackb(one, schema=User) for _ in range(1000)])
+
+
+main()
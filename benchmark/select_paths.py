@@ -0,0 +1,30 @@
+"""Compare unpacking a few paths of a large record with and without select."""
+
+import timeit
+
+from msgpack import Selector, packb, unpackb
+
+
+def profile(name, func):
+    number = 200
+    best = min(timeit.repeat(func, number=number, repeat=9)) / number
+    print("%-30s %10.2f us" % (name, best * 1e6))
+
+
+def main():
+    record = {
+        "user": {"id": 1, "name": "alice", "groups": list(range(50))},
+        "events": [
+            {"ts": i, "kind": "click", "payload": {"x": i, "y": [1.5] * 20, "tag": "t%d" % i}}
+            for i in range(200)
+        ],
+        "blob": b"\x00" * 10000,
+    }
+    packed = packb(record)
+    sel = Selector([("user", "id"), ("events", "*", "ts")])
+
+    profile("unpackb", lambda: unpackb(packed))
+    profile("unpackb(select=...)", lambda: unpackb(packed, select=sel))
+
+
+main()
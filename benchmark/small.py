@@ -0,0 +1,27 @@
+"""Measure one-shot packb() and unpackb() calls with small payloads."""
+
+import timeit
+
+import msgpack
+
+
+def profile(name, func):
+    number = 100000
+    best = min(timeit.repeat(func, number=number, repeat=9)) / number
+    print("%-40s %10.1f ns" % (name, best * 1e9))
+
+
+def main():
+    payloads = {
+        "int": 1,
+        "short str": "hello",
+        "small map": {"id": 1, "name": "foo", "tags": ["a", "b"]},
+    }
+    for name, obj in payloads.items():
+        data = msgpack.packb(obj)
+        profile("packb %s" % name, lambda: msgpack.packb(obj))
+        profile("Packer().pack %s" % name, lambda: msgpack.Packer().pack(obj))
+        profile("unpackb %s" % name, lambda: msgpack.unpackb(data))
+
+
+main()
@@ -0,0 +1,57 @@
+"""Compare Packer(default=...) with Packer(type_encoders=...) for custom types."""
+
+import enum
+import timeit
+import uuid
+from decimal import Decimal
+
+from msgpack import Packer
+
+
+class Color(enum.Enum):
+    RED = 1
+
+
+class Money:
+    def __init__(self, amount):
+        self.amount = amount
+
+
+def default(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, uuid.UUID):
+        return obj.bytes
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, Money):
+        return obj.amount
+    raise TypeError(obj)
+
+
+ENCODERS = {
+    Decimal: str,
+    uuid.UUID: lambda u: u.bytes,
+    Color: lambda e: e.value,
+    Money: lambda m: m.amount,
+}
+
+
+def profile(name, func):
+    number = 20
+    best = min(timeit.repeat(func, number=number, repeat=9)) / number
+    print("%-30s %10.2f ms" % (name, best * 1e3))
+
+
+def main():
+    data = [[Decimal("1.5"), uuid.uuid4(), Color.RED, Money(3)] for _ in range(10000)]
+    packer = Packer(default=default)
+    profile("default", lambda: packer.pack(data))
+    try:
+        packer = Packer(type_encoders=ENCODERS)
+    except TypeError:
+        return
+    profile("type_encoders", lambda: packer.pack(data))
+
+
+main()
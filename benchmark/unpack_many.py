@@ -0,0 +1,51 @@
+"""Compare iterating over Unpacker with unpack_many() and iter_batches()."""
+
+import timeit
+
+from msgpack import Unpacker, packb
+
+
+def profile(name, func):
+    number = 5
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print("%-30s %10.2f ms" % (name, best * 1e3))
+
+
+def to_list(data):
+    unpacker = Unpacker(max_buffer_size=0)
+    unpacker.feed(data)
+    return list(unpacker)
+
+
+def unpack_many(data):
+    unpacker = Unpacker(max_buffer_size=0)
+    unpacker.feed(data)
+    return unpacker.unpack_many()
+
+
+def iterate(data):
+    unpacker = Unpacker(max_buffer_size=0)
+    unpacker.feed(data)
+    for _ in unpacker:
+        pass
+
+
+def iter_batches(data):
+    unpacker = Unpacker(max_buffer_size=0)
+    unpacker.feed(data)
+    for batch in unpacker.iter_batches(1000):
+        for _ in batch:
+            pass
+
+
+def main():
+    # Many small messages.
+    data = b"".join(packb(i % 100) for i in range(1000000))
+
+    profile("list(unpacker)", lambda: to_list(data))
+    profile("unpack_many()", lambda: unpack_many(data))
+    profile("for o in unpacker", lambda: iterate(data))
+    profile("for o in iter_batches(1000)", lambda: iter_batches(data))
+
+
+main()
@@ -0,0 +1,22 @@
+"""Compare unpackb() in a loop with unpackb_many()."""
+
+import timeit
+
+from msgpack import packb, unpackb, unpackb_many
+
+
+def profile(name, func):
+    number = 20
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print("%-30s %10.2f ms" % (name, best * 1e3))
+
+
+def main():
+    # Like the values of a multi-key get from a cache.
+    payloads = [packb({"id": i, "name": "user%d" % i, "score": i * 0.5}) for i in range(10000)]
+
+    profile("[unpackb(p) for p in ...]", lambda: [unpackb(p) for p in payloads])
+    profile("unpackb_many()", lambda: unpackb_many(payloads))
+
+
+main()
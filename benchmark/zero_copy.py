@@ -0,0 +1,23 @@
+"""Compare Packer.pack() with and without zero_copy by message size."""
+
+import timeit
+
+from msgpack import Packer, packb
+
+
+def profile(name, func, number):
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print("%-40s %12.2f us" % (name, best * 1e6))
+
+
+def main():
+    for size in [1024, 64 * 1024, 1024**2, 16 * 1024**2]:
+        data = [b"x" * 1024] * (size // 1024)
+        number = max(10, 10 * 1024**2 // size)
+        packer = Packer()
+        profile("%d KiB (copy)" % (size // 1024), lambda: packer.pack(data), number)
+        packer = Packer(zero_copy=True, buf_size=len(packb(data)))
+        profile("%d KiB (zero_copy)" % (size // 1024), lambda: packer.pack(data), number)
+
+
+main()
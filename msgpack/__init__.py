@@ -1,6 +1,10 @@
 # ruff: noqa: F401
 import os
 
+from ._lazy import LazyList, LazyMap
+from ._mmap import map_rest as _map_rest
+from ._mmap import unmap as _unmap
+from ._select import Selector
 from .exceptions import *  # noqa: F403
 from .ext import ExtType, Timestamp
 
@@ -9,12 +13,36 @@ __version__ = "1.2.1"
 
 
 if os.environ.get("MSGPACK_PUREPYTHON"):
-    from .fallback import Packer, Unpacker, unpackb
+    from .fallback import (
+        Packer,
+        Unpacker,
+        packb,
+        scan_offsets,
+        unpackb,
+        unpackb_lazy,
+        unpackb_many,
+    )
 else:
     try:
-        from ._cmsgpack import Packer, Unpacker, unpackb
+        from ._cmsgpack import (
+            Packer,
+            Unpacker,
+            packb,
+            scan_offsets,
+            unpackb,
+            unpackb_lazy,
+            unpackb_many,
+        )
     except ImportError:
-        from .fallback import Packer, Unpacker, unpackb
+        from .fallback import (
+            Packer,
+            Unpacker,
+            packb,
+            scan_offsets,
+            unpackb,
+            unpackb_lazy,
+            unpackb_many,
+        )
 
 
 def pack(o, stream, **kwargs):
@@ -23,28 +51,26 @@ def pack(o, stream, **kwargs):
 
     See :class:`Packer` for options.
     """
-    packer = Packer(**kwargs)
-    stream.write(packer.pack(o))
-
-
-def packb(o, **kwargs):
-    """
-    Pack object `o` and return packed bytes
-
-    See :class:`Packer` for options.
-    """
-    return Packer(**kwargs).pack(o)
+    stream.write(packb(o, **kwargs))
 
 
 def unpack(stream, **kwargs):
     """
     Unpack an object from `stream`.
 
+    Large regular files are memory mapped and unpacked in place instead
+    of being read into memory.
+
     Raises `ExtraData` when `stream` contains extra bytes.
     See :class:`Unpacker` for options.
     """
-    data = stream.read()
-    return unpackb(data, **kwargs)
+    data = _map_rest(stream)
+    if data is None:
+        return unpackb(stream.read(), **kwargs)
+    try:
+        return unpackb(data, **kwargs)
+    finally:
+        _unmap(data)
 
 
 # alias for compatibility to simplejson/marshal/pickle.
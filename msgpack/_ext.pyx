@@ -0,0 +1,285 @@
+from libc.stdint cimport int64_t, uint32_t, uint64_t
+from cpython.datetime cimport (
+    PyDateTime_Check, datetime_tzinfo,
+    datetime_year, datetime_month, datetime_day,
+    datetime_hour, datetime_minute, datetime_second, datetime_microsecond,
+    timedelta_days, timedelta_seconds, timedelta_microseconds,
+)
+
+from collections import namedtuple
+
+# C implementations of ExtType and Timestamp of msgpack/ext.py, which uses
+# them instead of its own when this module is available.  Both are named
+# msgpack.ext.X, so that pickles are portable between the implementations.
+
+
+# ExtType stays a namedtuple: a cdef class can't subclass tuple, and tuple
+# behaviour is part of its API.  The unpacker allocates it directly
+# (unpack_new_ext_type) and the packer reads its items, so only calls from
+# user code go through __new__.
+class ExtType(namedtuple("ExtType", "code data")):
+    """ExtType represents ext type in msgpack."""
+
+    __module__ = "msgpack.ext"
+
+    def __new__(cls, code, data):
+        if not isinstance(code, int):
+            raise TypeError("code must be int")
+        if not isinstance(data, bytes):
+            raise TypeError("data must be bytes")
+        if not 0 <= code <= 127:
+            raise ValueError("code must be 0~127")
+        return tuple.__new__(cls, (code, data))
+
+
+cdef extern from "unpack.h":
+    object unpack_datetime(int64_t sec, uint32_t nsec, object tz)
+
+
+cdef class _Timestamp:
+    # Storage and methods of Timestamp.
+    cdef readonly int64_t seconds
+    cdef readonly uint32_t nanoseconds
+
+    def __init__(self, seconds, nanoseconds=0):
+        """Initialize a Timestamp object.
+
+        :param int seconds:
+            Number of seconds since the UNIX epoch (00:00:00 UTC Jan 1 1970, minus leap seconds).
+            May be negative.
+
+        :param int nanoseconds:
+            Number of nanoseconds to add to `seconds` to get fractional time.
+            Maximum is 999_999_999.  Default is 0.
+
+        Note: Negative times (before the UNIX epoch) are represented as neg. seconds + pos. ns.
+        """
+        init_timestamp(self, seconds, nanoseconds)
+
+    def __repr__(self):
+        """String representation of Timestamp."""
+        return f"Timestamp(seconds={self.seconds}, nanoseconds={self.nanoseconds})"
+
+    def __eq__(self, other):
+        """Check for equality with another Timestamp object"""
+        if type(other) is type(self):
+            return (self.seconds == (<_Timestamp>other).seconds and
+                    self.nanoseconds == (<_Timestamp>other).nanoseconds)
+        return False
+
+    def __ne__(self, other):
+        """not-equals method (see :func:`__eq__()`)"""
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((self.seconds, self.nanoseconds))
+
+    def __reduce__(self):
+        return type(self), (self.seconds, self.nanoseconds)
+
+    def __setstate__(self, state):
+        # Pickled by the pure Python Timestamp: (None, {slot: value}).
+        slots = state[1]
+        init_timestamp(self, slots["seconds"], slots["nanoseconds"])
+
+    @staticmethod
+    def from_bytes(b):
+        """Unpack bytes into a `Timestamp` object.
+
+        Used for pure-Python msgpack unpacking.
+
+        :param b: Payload from msgpack ext message with code -1
+        :type b: bytes
+
+        :returns: Timestamp object unpacked from msgpack ext payload
+        :rtype: Timestamp
+        """
+        cdef const unsigned char[:] v = memoryview(b).cast("B")
+        cdef uint64_t data64
+        if v.shape[0] == 4:
+            return new_timestamp(load_be(&v[0], 4), 0)
+        elif v.shape[0] == 8:
+            data64 = load_be(&v[0], 8)
+            return new_timestamp(data64 & 0x00000003FFFFFFFF, data64 >> 34)
+        elif v.shape[0] == 12:
+            return new_timestamp(<int64_t>load_be(&v[4], 8), load_be(&v[0], 4))
+        raise ValueError("Timestamp type can only be created from 32, 64, or 96-bit byte objects")
+
+    def to_bytes(self):
+        """Pack this Timestamp object into bytes.
+
+        Used for pure-Python msgpack packing.
+
+        :returns data: Payload for EXT message with code -1 (timestamp type)
+        :rtype: bytes
+        """
+        cdef unsigned char buf[12]
+        cdef uint64_t data64
+        if (self.seconds >> 34) == 0:  # seconds is non-negative and fits in 34 bits
+            data64 = <uint64_t>self.nanoseconds << 34 | <uint64_t>self.seconds
+            if data64 & 0xFFFFFFFF00000000 == 0:
+                # nanoseconds is zero and seconds < 2**32, so timestamp 32
+                store_be(buf, data64, 4)
+                return PyBytes_FromStringAndSize(<char*>buf, 4)
+            # timestamp 64
+            store_be(buf, data64, 8)
+            return PyBytes_FromStringAndSize(<char*>buf, 8)
+        # timestamp 96
+        store_be(buf, self.nanoseconds, 4)
+        store_be(buf + 4, <uint64_t>self.seconds, 8)
+        return PyBytes_FromStringAndSize(<char*>buf, 12)
+
+    @staticmethod
+    def from_unix(unix_sec):
+        """Create a Timestamp from posix timestamp in seconds.
+
+        :param unix_float: Posix timestamp in seconds.
+        :type unix_float: int or float
+        """
+        seconds = int(unix_sec // 1)
+        nanoseconds = int((unix_sec % 1) * 10**9)
+        return Timestamp(seconds, nanoseconds)
+
+    def to_unix(self):
+        """Get the timestamp as a floating-point value.
+
+        :returns: posix timestamp
+        :rtype: float
+        """
+        return <double>self.seconds + self.nanoseconds / 1e9
+
+    @staticmethod
+    def from_unix_nano(unix_ns):
+        """Create a Timestamp from posix timestamp in nanoseconds.
+
+        :param int unix_ns: Posix timestamp in nanoseconds.
+        :rtype: Timestamp
+        """
+        return Timestamp(*divmod(unix_ns, 10**9))
+
+    def to_unix_nano(self):
+        """Get the timestamp as a unixtime in nanoseconds.
+
+        :returns: posix timestamp in nanoseconds
+        :rtype: int
+        """
+        return <object>self.seconds * 10**9 + self.nanoseconds
+
+    def to_datetime(self):
+        """Get the timestamp as a UTC datetime.
+
+        :rtype: `datetime.datetime`
+        """
+        return unpack_datetime(self.seconds, self.nanoseconds, utc)
+
+    @staticmethod
+    def from_datetime(dt):
+        """Create a Timestamp from datetime with tzinfo.
+
+        :rtype: Timestamp
+        """
+        cdef int64_t seconds
+        cdef uint32_t nanoseconds
+        if dt.tzinfo is None:
+            # Match datetime.timestamp(): a naive datetime is treated as local time.
+            dt = dt.astimezone()
+        if PyDateTime_Check(dt):
+            datetime_to_timestamp(dt, &seconds, &nanoseconds)
+            return new_timestamp(seconds, nanoseconds)
+        delta = dt - epoch
+        return Timestamp(
+            seconds=delta.days * 86400 + delta.seconds,
+            nanoseconds=delta.microseconds * 1000,
+        )
+
+
+class Timestamp(_Timestamp):
+    """Timestamp represents the Timestamp extension type in msgpack.
+
+    When built with Cython, msgpack uses C methods to pack and unpack `Timestamp`.
+    When using pure-Python msgpack, :func:`to_bytes` and :func:`from_bytes` are used to pack and
+    unpack `Timestamp`.
+
+    This class is immutable: Do not override seconds and nanoseconds.
+    """
+
+    __module__ = "msgpack.ext"
+    __slots__ = ()
+
+
+cdef type ext_type = ExtType
+cdef type timestamp_type = Timestamp
+
+
+cdef int init_timestamp(_Timestamp ts, object seconds, object nanoseconds) except -1:
+    if not isinstance(seconds, int):
+        raise TypeError("seconds must be an integer")
+    if not isinstance(nanoseconds, int):
+        raise TypeError("nanoseconds must be an integer")
+    if not (0 <= nanoseconds < 10**9):
+        raise ValueError("nanoseconds must be a non-negative integer less than 999999999.")
+    if not (-2**63 <= seconds < 2**63):
+        raise ValueError("seconds must be a 64-bit signed integer.")
+    ts.seconds = seconds
+    ts.nanoseconds = nanoseconds
+    return 0
+
+
+cdef object new_timestamp(int64_t seconds, uint32_t nanoseconds):
+    # Timestamp(seconds, nanoseconds) without calling the class.
+    if nanoseconds >= 1000000000:
+        raise ValueError("nanoseconds must be a non-negative integer less than 999999999.")
+    cdef _Timestamp ts = _Timestamp.__new__(timestamp_type)
+    ts.seconds = seconds
+    ts.nanoseconds = nanoseconds
+    return ts
+
+
+cdef inline int64_t days_from_civil(int y, int m, int d):
+    # Days since 1970-01-01 of a date in 1..9999 (days_from_civil of
+    # http://howardhinnant.github.io/date_algorithms.html).
+    cdef int era, yoe, doy, doe
+    if m <= 2:
+        y -= 1
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * (m - 3 if m > 2 else m + 9) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return <int64_t>era * 146097 + doe - 719468
+
+
+cdef int datetime_to_timestamp(object dt, int64_t* seconds, uint32_t* nanoseconds) except -1:
+    # Timestamp fields of datetime *dt*, read from its fields without
+    # subtracting the epoch.  A naive *dt* is taken as UTC.
+    cdef int64_t s
+    cdef int us = datetime_microsecond(dt)
+    s = (days_from_civil(datetime_year(dt), datetime_month(dt), datetime_day(dt)) * 86400
+         + datetime_hour(dt) * 3600 + datetime_minute(dt) * 60 + datetime_second(dt))
+    tz = datetime_tzinfo(dt)
+    if tz is not None and tz is not utc:
+        offset = dt.utcoffset()
+        if offset is None:
+            raise TypeError("can not convert datetime whose utcoffset() is None")
+        s -= timedelta_days(offset) * <int64_t>86400 + timedelta_seconds(offset)
+        us -= timedelta_microseconds(offset)
+        if us < 0:
+            us += 1000000
+            s -= 1
+    seconds[0] = s
+    nanoseconds[0] = us * 1000
+    return 0
+
+
+cdef inline uint64_t load_be(const unsigned char* p, int n):
+    cdef uint64_t v = 0
+    cdef int i
+    for i in range(n):
+        v = (v << 8) | p[i]
+    return v
+
+
+cdef inline void store_be(unsigned char* p, uint64_t v, int n):
+    cdef int i
+    for i in range(n - 1, -1, -1):
+        p[i] = v & 0xFF
+        v >>= 8
@@ -0,0 +1,156 @@
+"""Lazy proxies returned by ``unpackb_lazy()``.
+
+Both implementations provide a reader with this interface, where offsets
+are positions in the packed input:
+
+- ``get(offset)``: the object at *offset*.  Maps and arrays are returned as
+  proxies; everything else is decoded.
+- ``index_map(offset, size)``: entries for the map whose items start at
+  *offset*, and the offset following the map.  The entries are opaque and
+  only passed back to the two methods below.
+- ``find(entries, key)``: the offset of the value of the ``str`` or
+  ``bytes`` *key*, -1 when there is no such key, or None when the reader
+  can't tell without decoding the keys.
+- ``index_keys(entries)``: dict mapping each decoded key to the offset of
+  its value.
+- ``index_array(offset, size)``: list of the offsets of the items of the
+  array whose items start at *offset*, and the offset following the array.
+- ``skip(offset)``: the offset following the object at *offset*.
+- ``extra_data(offset)``: the input from *offset* on, as bytes.
+"""
+
+from collections.abc import Mapping, Sequence
+
+from .exceptions import ExtraData
+
+
+def load(reader):
+    """Return the object at the start of the input of *reader*."""
+    obj = reader.get(0)
+    if type(obj) is LazyMap or type(obj) is LazyList:
+        # Indexing checks the whole message, so it is not walked twice.
+        end = obj._build()
+    else:
+        end = reader.skip(0)
+    extra = reader.extra_data(end)
+    if extra:
+        raise ExtraData(obj, extra)
+    return obj
+
+
+class LazyMap(Mapping):
+    """Read-only mapping over a packed msgpack map.
+
+    ``str`` and ``bytes`` keys are looked up without decoding the keys of
+    the map; they are decoded only when the map is iterated or other keys
+    are looked up.  Values are decoded when they are accessed, and kept.
+    """
+
+    __slots__ = ("_reader", "_offset", "_size", "_entries", "_index", "_values")
+
+    def __init__(self, reader, offset, size):
+        self._reader = reader
+        self._offset = offset
+        self._size = size
+        self._entries = None
+        self._index = None
+        self._values = {}
+
+    def _build(self):
+        self._entries, end = self._reader.index_map(self._offset, self._size)
+        return end
+
+    def _find(self, key):
+        # Return the offset of the value of key, or -1.
+        if self._index is None and (type(key) is str or type(key) is bytes):
+            if self._entries is None:
+                self._build()
+            offset = self._reader.find(self._entries, key)
+            if offset is not None:
+                return offset
+        return self._get_index().get(key, -1)
+
+    def _get_index(self):
+        if self._index is None:
+            if self._entries is None:
+                self._build()
+            self._index = self._reader.index_keys(self._entries)
+        return self._index
+
+    def __getitem__(self, key):
+        values = self._values
+        try:
+            return values[key]
+        except KeyError:
+            pass
+        offset = self._find(key)
+        if offset < 0:
+            raise KeyError(key)
+        value = values[key] = self._reader.get(offset)
+        return value
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def __iter__(self):
+        return iter(self._get_index())
+
+    def __len__(self):
+        return len(self._get_index())
+
+    def __repr__(self):
+        return f"LazyMap({dict(self)!r})"
+
+
+class LazyList(Sequence):
+    """Read-only sequence over a packed msgpack array.
+
+    Items are decoded when they are accessed, and kept.
+    """
+
+    __slots__ = ("_reader", "_offset", "_size", "_offsets", "_values")
+
+    def __init__(self, reader, offset, size):
+        self._reader = reader
+        self._offset = offset
+        self._size = size
+        self._offsets = None
+        self._values = {}
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._size))]
+        if i < 0:
+            i += self._size
+        values = self._values
+        try:
+            return values[i]
+        except KeyError:
+            pass
+        if not 0 <= i < self._size:
+            raise IndexError("list index out of range")
+        if self._offsets is None:
+            self._build()
+        value = values[i] = self._reader.get(self._offsets[i])
+        return value
+
+    def _build(self):
+        self._offsets, end = self._reader.index_array(self._offset, self._size)
+        return end
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self[i]
+
+    def __len__(self):
+        return self._size
+
+    def __eq__(self, other):
+        if isinstance(other, (list, LazyList)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"LazyList({list(self)!r})"
@@ -0,0 +1,65 @@
+"""Memory mapping of files, to unpack them without reading them into memory."""
+
+import mmap
+import os
+import stat
+
+# Files smaller than this are read by unpack(), which is as fast for them.
+MAP_THRESHOLD = 1024 * 1024
+
+
+def map_file(f):
+    """Return a read-only memoryview of the whole of file *f*.
+
+    Returns None when *f* is not a regular file with ``fileno()``.
+    """
+    try:
+        fd = f.fileno()
+        st = os.fstat(fd)
+    except (AttributeError, OSError, ValueError):
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    if st.st_size == 0:
+        return memoryview(b"")
+    try:
+        return memoryview(mmap.mmap(fd, 0, access=mmap.ACCESS_READ))
+    except (OSError, ValueError):
+        return None
+
+
+def map_rest(f):
+    """Return a read-only memoryview of *f* from its position to its end,
+    and move *f* to its end like ``f.read()`` does.
+
+    Returns None, without moving *f*, when it can't be mapped or when the
+    rest is smaller than MAP_THRESHOLD.
+    """
+    try:
+        pos = f.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
+    view = map_file(f)
+    if view is None:
+        return None
+    if len(view) - pos < MAP_THRESHOLD:
+        unmap(view)
+        return None
+    rest = view[pos:]
+    view.release()
+    f.seek(0, os.SEEK_END)
+    return rest
+
+
+def unmap(view):
+    """Release *view* and unmap its file, unless unpacked objects still
+    refer to it (e.g. with ``bin_as_view``).  Then it's unmapped when they
+    are freed.
+    """
+    obj = view.obj
+    view.release()
+    if isinstance(obj, mmap.mmap):
+        try:
+            obj.close()
+        except BufferError:
+            pass
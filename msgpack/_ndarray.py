@@ -0,0 +1,72 @@
+"""NumPy ndarray support for the ``ndarray_ext_code`` option.
+
+An ndarray is packed as an ext type whose data is a header followed by the
+raw array data, in C order::
+
+    +--------+-------------+------+--------------------+------
+    | uint8  | dtype.str   | uint8| uint64 * ndim (BE) | data
+    | len    | (ascii)     | ndim | shape              |
+    +--------+-------------+------+--------------------+------
+
+The dtype string carries the byte order, so arrays are unpacked as they were
+packed and never swapped item by item.
+
+NumPy is imported only when the option is used, not with msgpack.
+"""
+
+import struct
+
+
+def ndarray_type(code):
+    """Check the ``ndarray_ext_code`` option and return ``numpy.ndarray``."""
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("ndarray_ext_code requires numpy") from None
+    if type(code) is not int or not 0 <= code <= 127:
+        raise ValueError("ndarray_ext_code must be an int in 0~127")
+    return numpy.ndarray
+
+
+def pack_ndarray(arr):
+    """Return (header, data) for *arr*.  *data* exports the raw array data."""
+    import numpy
+
+    dtype = arr.dtype
+    if dtype.hasobject or dtype.fields is not None:
+        raise TypeError(f"can not serialize ndarray of dtype {dtype}")
+    if not arr.flags.c_contiguous:
+        arr = numpy.ascontiguousarray(arr)
+    descr = dtype.str.encode("ascii")
+    header = struct.pack(f">B{len(descr)}sB{arr.ndim}Q", len(descr), descr, arr.ndim, *arr.shape)
+    # Not every dtype (e.g. datetime64) supports the buffer protocol.
+    return header, arr.reshape(-1).view(numpy.uint8)
+
+
+def unpack_ndarray(buf, offset, length):
+    """Return a read-only array viewing ``buf[offset:offset+length]``."""
+    import numpy
+
+    end = offset + length
+    try:
+        (n,) = struct.unpack_from(">B", buf, offset)
+        descr, ndim = struct.unpack_from(f">{n}sB", buf, offset + 1)
+        pos = offset + 2 + n
+        shape = struct.unpack_from(f">{ndim}Q", buf, pos)
+        dtype = numpy.dtype(descr.decode("ascii"))
+    except (struct.error, UnicodeDecodeError, TypeError) as e:
+        raise ValueError("invalid ndarray ext data") from e
+    if dtype.hasobject or dtype.fields is not None:
+        raise ValueError(f"invalid ndarray dtype {dtype}")
+    pos += 8 * ndim
+    count = 1
+    for dim in shape:
+        count *= dim
+    if pos + count * dtype.itemsize != end:
+        raise ValueError("invalid ndarray ext data")
+    if count == 0 or dtype.itemsize == 0:
+        arr = numpy.empty(shape, dtype)
+    else:
+        arr = numpy.frombuffer(buf, dtype, count, pos).reshape(shape)
+    arr.flags.writeable = False
+    return arr
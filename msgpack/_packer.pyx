@@ -1,14 +1,14 @@
 from cpython cimport *
 from cpython.bytearray cimport PyByteArray_Check, PyByteArray_CheckExact
+from libc.stdint cimport SIZE_MAX, int64_t, uint32_t
+from cpython cimport array as carray
 from cpython.datetime cimport (
-    PyDateTime_CheckExact, PyDelta_CheckExact,
-    datetime_tzinfo, timedelta_days, timedelta_seconds, timedelta_microseconds,
+    PyDate_CheckExact, PyDateTime_CheckExact, datetime_tzinfo, date_year, date_month, date_day,
 )
 
-cdef ExtType
-cdef Timestamp
+import array
 
-from .ext import ExtType, Timestamp
+from ._ndarray import ndarray_type, pack_ndarray
 
 
 cdef extern from "Python.h":
@@ -16,11 +16,20 @@ cdef extern from "Python.h":
     int PyMemoryView_Check(object obj)
 
 cdef extern from "pack.h":
+    struct msgpack_chunk:
+        pass
+
     struct msgpack_packer:
         char* buf
         size_t length
         size_t buf_size
         bint use_bin_type
+        bint fixed
+        PyObject* obj
+        msgpack_chunk* chunks
+        size_t nchunks
+        size_t chunked
+        double growth
 
     int msgpack_pack_nil(msgpack_packer* pk) except -1
     int msgpack_pack_true(msgpack_packer* pk) except -1
@@ -36,10 +45,51 @@ cdef extern from "pack.h":
     int msgpack_pack_raw_body(msgpack_packer* pk, char* body, size_t l) except -1
     int msgpack_pack_ext(msgpack_packer* pk, char typecode, size_t l) except -1
     int msgpack_pack_timestamp(msgpack_packer* x, long long seconds, unsigned long nanoseconds) except -1
+    size_t msgpack_pack_size(msgpack_packer* pk)
+    void msgpack_pack_copy(msgpack_packer* pk, char* dst)
+    int msgpack_pack_join(msgpack_packer* pk) except -1
+    void msgpack_pack_clear(msgpack_packer* pk, size_t base, size_t retain)
 
 
 cdef int DEFAULT_RECURSE_LIMIT=1024
 cdef long long ITEM_LIMIT = (2**32)-1
+cdef size_t KEY_CACHE_PROBES = 4
+cdef Py_ssize_t DEFAULT_TYPES_LIMIT = 256
+# Smallest bytes object a message starts with in zero_copy mode.
+cdef size_t ZERO_COPY_BUF_SIZE = 256
+
+
+cdef object _object_fields(type cls):
+    # Return the names of the fields to pack for instances of *cls*, and
+    # whether they are slots which may be unset.  None when *cls* is not a
+    # dataclass, a NamedTuple or a class using __slots__ which opts in with
+    # __msgpack_slots__.
+    if hasattr(cls, "__dataclass_fields__"):
+        import dataclasses
+        return tuple([f.name for f in dataclasses.fields(cls)]), False
+    if issubclass(cls, tuple):
+        fields = getattr(cls, "_fields", None)
+        return (tuple(fields), False) if fields is not None else None
+    if not getattr(cls, "__msgpack_slots__", False):
+        return None
+    names = []
+    for c in reversed(cls.__mro__[:-1]):
+        slots = c.__dict__.get("__slots__")
+        if slots is None or "__dict__" in c.__dict__:
+            return None  # instances have a __dict__
+        if isinstance(slots, str):
+            slots = (slots,)
+        for name in slots:
+            if name == "__weakref__":
+                continue
+            if name.startswith("__") and not name.endswith("__"):
+                name = "_%s%s" % (c.__name__.lstrip("_"), name)
+            names.append(name)
+    return (tuple(names), True) if names else None
+
+
+# Value of unset slots in _pack_object().
+cdef object _unset = object()
 
 
 cdef inline int PyBytesLike_Check(object o):
@@ -91,6 +141,12 @@ cdef class Packer:
         Note that the tzinfo is stripped in the timestamp.
         You can get UTC datetime with `timestamp=3` option of the Unpacker.
 
+    :param bool naive_utc:
+        If set to true, `datetime` also packs naive datetime as UTC time and
+        datetime.date as midnight UTC, instead of raising ValueError and
+        calling default respectively.  Requires `datetime=True`.
+        You can get naive UTC datetime with `timestamp=4` option of the Unpacker.
+
     :param str unicode_errors:
         The error handler for encoding unicode. (default: 'strict')
         DO NOT USE THIS!!  This option is kept for very specific usage.
@@ -99,9 +155,66 @@ cdef class Packer:
         The size of the internal buffer. (default: 256*1024)
         Useful if serialisation size can be correctly estimated,
         avoid unnecessary reallocations.
+
+    :param float buf_growth:
+        When the internal buffer is full, a new segment this many times
+        larger than the last one, and of at least 256 bytes, is added.
+        Data already written is never moved.  Must be at least 1.0.
+        (default: 2.0)
+
+    :param int buf_retain:
+        Maximum capacity kept between messages.  After a larger message,
+        the internal buffer shrinks back to *buf_size*. (default: 16*1024*1024)
+
+    :param dict type_encoders:
+        Mapping from types to callables converting their instances into
+        packable objects, like *default*.  The lookup is by exact type and
+        happens before the builtin types are checked.  Types which turn out
+        to be handled by *default* are remembered the same way, so their
+        instances go to *default* directly next time.
+
+    :param str pack_objects:
+        If set to ``"map"``, instances of dataclasses, ``NamedTuple`` and
+        classes using ``__slots__`` with a true ``__msgpack_slots__``
+        attribute are packed as maps from field names to values.  Unset
+        slots are left out.  If set to ``"array"``, they are packed as arrays
+        of the values in field order, with nil for unset slots.  The fields
+        of each class are looked up once.  *type_encoders* and *default*
+        take precedence: objects which *default* returns unchanged are
+        packed by fields.  (default: None, disabled)
+
+    :param int key_cache:
+        Maximum number of map keys whose encoded form is cached.  Packing
+        many maps with the same ``str`` keys gets faster because each key is
+        encoded once.  Keys are looked up by identity, and old entries are
+        replaced when the cache is full.  Only keys of exact ``str`` type
+        shorter than 256 bytes are cached.  Disabled when *type_encoders*
+        has an encoder for ``str``, so that it applies to keys too.
+        (default: 0, disabled)
+
+    :param bool zero_copy:
+        If set to true, pack into a new bytes object which is shrunk to fit
+        and returned as is, instead of copying the internal buffer into the
+        result.  Each object starts with the size of the previous message,
+        up to *buf_size* bytes, and grows as needed.  This is faster for
+        large messages, but slower for small ones.  Requires
+        ``autoreset=True``.  (default: False)
+
+    :param int ndarray_ext_code:
+        If set, NumPy arrays (of exact type ``numpy.ndarray``) are packed as
+        ext type with this code, holding their dtype, shape and raw data.
+        The data is written straight from the array.  Arrays of object or
+        structured dtypes are not supported.  Requires NumPy.
+        (default: None, disabled)
     """
     cdef msgpack_packer pk
     cdef object _default
+    cdef dict _encoders
+    cdef Py_ssize_t _encoders_limit
+    cdef dict _object_plans
+    cdef bint objects_as_map
+    cdef object _ndarray_type
+    cdef char ndarray_ext_code
     cdef object _berrors
     cdef const char *unicode_errors
     cdef size_t exports  # number of exported buffers
@@ -109,6 +222,14 @@ cdef class Packer:
     cdef bint use_float
     cdef bint autoreset
     cdef bint datetime
+    cdef bint naive_utc
+    cdef bint zero_copy
+    cdef size_t buf_size
+    cdef size_t buf_retain
+    cdef size_t zero_copy_size  # size of the next zero_copy bytes object
+    cdef PyObject** _key_cache_keys
+    cdef PyObject** _key_cache_values
+    cdef size_t key_cache_mask
 
     def __cinit__(self, size_t buf_size=256*1024, **_kwargs):
         self.pk.buf = <char*> PyMem_Malloc(buf_size)
@@ -116,10 +237,27 @@ cdef class Packer:
             raise MemoryError("Unable to allocate internal buffer.")
         self.pk.buf_size = buf_size
         self.pk.length = 0
+        self.pk.fixed = False
+        self.pk.growth = 2.0
+        self.buf_size = buf_size
         self.exports = 0
 
     def __dealloc__(self):
-        PyMem_Free(self.pk.buf)
+        cdef size_t i
+        msgpack_pack_clear(&self.pk, 0, SIZE_MAX)
+        PyMem_Free(self.pk.chunks)
+        if self._key_cache_keys != NULL:
+            for i in range(self.key_cache_mask + 1):
+                Py_XDECREF(self._key_cache_keys[i])
+            PyMem_Free(self._key_cache_keys)
+        if self._key_cache_values != NULL:
+            for i in range(self.key_cache_mask + 1):
+                Py_XDECREF(self._key_cache_values[i])
+            PyMem_Free(self._key_cache_values)
+        if self.pk.obj != NULL:
+            Py_CLEAR(self.pk.obj)
+        else:
+            PyMem_Free(self.pk.buf)
         self.pk.buf = NULL
         assert self.exports == 0
 
@@ -130,17 +268,65 @@ cdef class Packer:
     @cython.critical_section
     def __init__(self, *, default=None,
                  bint use_single_float=False, bint autoreset=True, bint use_bin_type=True,
-                 bint strict_types=False, bint datetime=False, unicode_errors=None,
-                 buf_size=256*1024):
+                 bint strict_types=False, bint datetime=False, bint naive_utc=False,
+                 unicode_errors=None, buf_size=256*1024, double buf_growth=2.0,
+                 Py_ssize_t buf_retain=16*1024*1024, Py_ssize_t key_cache=0,
+                 bint zero_copy=False, type_encoders=None, pack_objects=None,
+                 ndarray_ext_code=None):
+        if zero_copy and not autoreset:
+            raise ValueError("zero_copy requires autoreset=True")
+        if naive_utc and not datetime:
+            raise ValueError("naive_utc requires datetime=True")
+        if not buf_growth >= 1.0:
+            raise ValueError("buf_growth must be at least 1.0")
+        if buf_retain < 0:
+            raise ValueError("buf_retain must be non-negative")
+        self.pk.growth = buf_growth
+        self.buf_retain = buf_retain
+        if key_cache < 0:
+            raise ValueError("key_cache must be non-negative")
+        if type_encoders and str in type_encoders:
+            key_cache = 0
+        if key_cache and self._key_cache_keys == NULL:
+            # Direct-mapped by key identity; the size is rounded up to a power of two.
+            self.key_cache_mask = 1
+            while self.key_cache_mask < <size_t>key_cache:
+                self.key_cache_mask <<= 1
+            self._key_cache_keys = <PyObject**>PyMem_Calloc(self.key_cache_mask, sizeof(PyObject*))
+            self._key_cache_values = <PyObject**>PyMem_Calloc(self.key_cache_mask, sizeof(PyObject*))
+            if self._key_cache_keys == NULL or self._key_cache_values == NULL:
+                raise MemoryError("Unable to allocate key cache.")
+            self.key_cache_mask -= 1
         self.use_float = use_single_float
         self.strict_types = strict_types
         self.autoreset = autoreset
         self.datetime = datetime
+        self.naive_utc = naive_utc
         self.pk.use_bin_type = use_bin_type
         if default is not None:
             if not PyCallable_Check(default):
                 raise TypeError("default must be a callable.")
         self._default = default
+        self._encoders = None
+        if type_encoders:
+            self._encoders = dict(type_encoders)
+            for encoder in self._encoders.values():
+                if not PyCallable_Check(encoder):
+                    raise TypeError("type_encoders values must be callable.")
+        elif default is not None:
+            self._encoders = {}
+        if self._encoders is not None:
+            self._encoders_limit = len(self._encoders) + DEFAULT_TYPES_LIMIT
+        self._object_plans = None
+        if pack_objects is not None:
+            if pack_objects not in ("map", "array"):
+                raise ValueError("pack_objects must be None, 'map' or 'array'")
+            self._object_plans = {}
+            self.objects_as_map = pack_objects == "map"
+        self._ndarray_type = None
+        if ndarray_ext_code is not None:
+            self._ndarray_type = ndarray_type(ndarray_ext_code)
+            self.ndarray_ext_code = ndarray_ext_code
 
         self._berrors = unicode_errors
         if unicode_errors is None:
@@ -148,11 +334,21 @@ cdef class Packer:
         else:
             self.unicode_errors = self._berrors
 
+        self.zero_copy = zero_copy
+        self.zero_copy_size = ZERO_COPY_BUF_SIZE
+        if zero_copy and self.pk.obj == NULL:
+            # The internal buffer is not used; a bytes object is allocated per message.
+            PyMem_Free(self.pk.buf)
+            self.pk.buf = NULL
+            self.pk.buf_size = 0
+            self.pk.length = 0
+
     # returns -2 when default should(o) be called
     cdef int _pack_inner(self, object o, bint will_default, int nest_limit) except -1:
         cdef long long llval
         cdef unsigned long long ullval
-        cdef unsigned long ulval
+        cdef int64_t seconds
+        cdef uint32_t nanoseconds
         cdef const char* rawval
         cdef Py_ssize_t L
         cdef Py_buffer view
@@ -207,21 +403,38 @@ cdef class Packer:
             if L > ITEM_LIMIT:
                 raise ValueError("dict is too large")
             msgpack_pack_map(&self.pk, L)
-            for k, v in o.items():
-                self._pack(k, nest_limit)
-                self._pack(v, nest_limit)
-        elif type(o) is ExtType if strict else isinstance(o, ExtType):
+            if self._key_cache_values != NULL:
+                for k, v in o.items():
+                    if not (PyUnicode_CheckExact(k) and self._pack_cached_key(k)):
+                        self._pack(k, nest_limit)
+                    self._pack(v, nest_limit)
+            else:
+                for k, v in o.items():
+                    self._pack(k, nest_limit)
+                    self._pack(v, nest_limit)
+        elif type(o) is ext_type if strict else isinstance(o, ext_type):
             # This should be before Tuple because ExtType is namedtuple.
-            rawval = o.data
-            L = len(o.data)
+            if type(o) is ext_type:
+                # The fields of the namedtuple, without looking them up.
+                code = <object>PyTuple_GET_ITEM(o, 0)
+                data = <object>PyTuple_GET_ITEM(o, 1)
+            else:
+                code = o.code
+                data = o.data
+            rawval = data
+            L = len(data)
             if L > ITEM_LIMIT:
                 raise ValueError("EXT data is too large")
-            msgpack_pack_ext(&self.pk, <long>o.code, L)
+            msgpack_pack_ext(&self.pk, <long>code, L)
             msgpack_pack_raw_body(&self.pk, rawval, L)
-        elif type(o) is Timestamp:
-            llval = o.seconds
-            ulval = o.nanoseconds
-            msgpack_pack_timestamp(&self.pk, llval, ulval)
+        elif type(o) is timestamp_type:
+            msgpack_pack_timestamp(&self.pk, (<_Timestamp>o).seconds, (<_Timestamp>o).nanoseconds)
+        elif (self._object_plans is not None and not PyList_CheckExact(o)
+                and not PyTuple_CheckExact(o) and (not will_default or PyTuple_Check(o))
+                and self._pack_object(o, nest_limit)):
+            # This should be before Tuple because of NamedTuple.  Other objects
+            # are packed by fields after default has been called.
+            pass
         elif PyList_CheckExact(o) if strict else (PyTuple_Check(o) or PyList_Check(o)):
             L = Py_SIZE(o)
             if L > ITEM_LIMIT:
@@ -240,14 +453,30 @@ cdef class Packer:
                 msgpack_pack_raw_body(&self.pk, <char*>view.buf, L)
             finally:
                 PyBuffer_Release(&view);
-        elif self.datetime and PyDateTime_CheckExact(o) and datetime_tzinfo(o) is not None:
-            delta = o - epoch
-            if not PyDelta_CheckExact(delta):
-                raise ValueError("failed to calculate delta")
-            llval = timedelta_days(delta) * <long long>(24*60*60) + timedelta_seconds(delta)
-            ulval = timedelta_microseconds(delta) * 1000
-            msgpack_pack_timestamp(&self.pk, llval, ulval)
+        elif self._ndarray_type is not None and type(o) is self._ndarray_type:
+            header, data = pack_ndarray(o)
+            PyObject_GetBuffer(data, &view, PyBUF_SIMPLE)
+            try:
+                L = len(header) + view.len
+                if L > ITEM_LIMIT:
+                    raise ValueError("ndarray is too large")
+                msgpack_pack_ext(&self.pk, self.ndarray_ext_code, L)
+                msgpack_pack_raw_body(&self.pk, header, len(header))
+                msgpack_pack_raw_body(&self.pk, <char*>view.buf, view.len)
+            finally:
+                PyBuffer_Release(&view)
+        elif self.datetime and PyDateTime_CheckExact(o) and (
+                self.naive_utc or datetime_tzinfo(o) is not None):
+            datetime_to_timestamp(o, &seconds, &nanoseconds)
+            msgpack_pack_timestamp(&self.pk, seconds, nanoseconds)
+        elif self.naive_utc and PyDate_CheckExact(o):
+            seconds = days_from_civil(date_year(o), date_month(o), date_day(o)) * 86400
+            msgpack_pack_timestamp(&self.pk, seconds, 0)
         elif will_default:
+            if not (self.datetime and PyDateTime_CheckExact(o)):
+                # Any instance of this type would end up here; skip the checks next time.
+                if len(self._encoders) < self._encoders_limit:
+                    self._encoders[type(o)] = self._default
             return -2
         elif self.datetime and PyDateTime_CheckExact(o):
             # this should be later than will_default
@@ -255,11 +484,136 @@ cdef class Packer:
         else:
             PyErr_Format(TypeError, b"can not serialize '%.200s' object", Py_TYPE(o).tp_name)
 
+    cdef object _encode_str(self, object s, Py_ssize_t max_len):
+        # Return str *s* packed as bytes, or None when its encoded body is
+        # longer than *max_len* bytes.
+        cdef msgpack_packer tmp
+        cdef const char* rawval
+        cdef Py_ssize_t L
+
+        if self.unicode_errors == NULL:
+            rawval = PyUnicode_AsUTF8AndSize(s, &L)
+        else:
+            b = PyUnicode_AsEncodedString(s, NULL, self.unicode_errors)
+            rawval = b
+            L = Py_SIZE(b)
+        if L > max_len:
+            return None
+        encoded = PyBytes_FromStringAndSize(NULL, L + 5)
+        tmp.buf = PyBytes_AS_STRING(encoded)
+        tmp.buf_size = L + 5
+        tmp.length = 0
+        tmp.use_bin_type = self.pk.use_bin_type
+        tmp.fixed = True
+        msgpack_pack_raw(&tmp, L)
+        msgpack_pack_raw_body(&tmp, rawval, L)
+        return encoded[:tmp.length]
+
+    cdef int _pack_cached_key(self, object key) except -1:
+        # Write the encoded form of str *key* from the key cache.
+        # Returns 0 without writing when *key* is too long to be cached.
+        cdef size_t mask = self.key_cache_mask
+        cdef size_t start = (<size_t><PyObject*>key >> 4) & mask
+        cdef size_t slot = start
+        cdef size_t i
+        cdef PyObject* encoded
+
+        # Look up the key by identity in up to KEY_CACHE_PROBES slots.
+        for i in range(KEY_CACHE_PROBES):
+            slot = (start + i) & mask
+            if self._key_cache_keys[slot] == <PyObject*>key:
+                break
+            if self._key_cache_keys[slot] == NULL:
+                break
+        else:
+            slot = start  # all slots are taken; replace the first one
+
+        if self._key_cache_keys[slot] != <PyObject*>key:
+            value = self._encode_str(key, 255)
+            if value is None:
+                return 0
+            # The cache keeps a reference to the key, so that its address
+            # can't be reused by another object.
+            Py_INCREF(key)
+            Py_INCREF(value)
+            Py_XDECREF(self._key_cache_keys[slot])
+            Py_XDECREF(self._key_cache_values[slot])
+            self._key_cache_keys[slot] = <PyObject*>key
+            self._key_cache_values[slot] = <PyObject*>value
+        encoded = self._key_cache_values[slot]
+        msgpack_pack_raw_body(&self.pk, PyBytes_AS_STRING(<object>encoded), Py_SIZE(<object>encoded))
+        return 1
+
+    cdef object _object_plan(self, type cls):
+        # Compile the plan to pack instances of *cls*: the field names, their
+        # packed form when packing as map, and whether they are slots.  None
+        # when *cls* has no fields.
+        info = _object_fields(cls)
+        if info is None:
+            plan = None
+        else:
+            fields, slotted = info
+            if self.objects_as_map:
+                keys = tuple([self._encode_str(name, ITEM_LIMIT) for name in fields])
+            else:
+                keys = None
+            plan = (fields, keys, slotted)
+        if len(self._object_plans) < DEFAULT_TYPES_LIMIT:
+            self._object_plans[cls] = plan
+        return plan
+
+    cdef int _pack_object(self, object o, int nest_limit) except -1:
+        # Pack a dataclass, NamedTuple or __slots__ instance field by field.
+        # Returns 0 without writing when *o* is not such an object.
+        cdef PyObject* p = PyDict_GetItem(self._object_plans, <object>Py_TYPE(o))
+        cdef tuple names, keys
+        cdef bint slotted
+        cdef Py_ssize_t i, n, L
+
+        plan = <object>p if p != NULL else self._object_plan(type(o))
+        if plan is None:
+            return 0
+        names, keys, slotted = plan
+        L = len(names)
+        if slotted:
+            values = [getattr(o, name, _unset) for name in names]
+            if keys is None:
+                msgpack_pack_array(&self.pk, L)
+                for value in values:
+                    self._pack(None if value is _unset else value, nest_limit)
+            else:
+                n = 0
+                for value in values:
+                    n += value is not _unset
+                msgpack_pack_map(&self.pk, n)
+                for i in range(L):
+                    if values[i] is not _unset:
+                        key = keys[i]
+                        msgpack_pack_raw_body(&self.pk, PyBytes_AS_STRING(key), Py_SIZE(key))
+                        self._pack(values[i], nest_limit)
+        elif keys is None:
+            msgpack_pack_array(&self.pk, L)
+            for i in range(L):
+                self._pack(getattr(o, names[i]), nest_limit)
+        else:
+            msgpack_pack_map(&self.pk, L)
+            for i in range(L):
+                key = keys[i]
+                msgpack_pack_raw_body(&self.pk, PyBytes_AS_STRING(key), Py_SIZE(key))
+                self._pack(getattr(o, names[i]), nest_limit)
+        return 1
+
     cdef int _pack(self, object o, int nest_limit=DEFAULT_RECURSE_LIMIT) except -1:
         cdef int ret
+        cdef PyObject* encoder
         if nest_limit < 0:
             raise ValueError("recursion limit exceeded.")
         nest_limit -= 1
+        if self._encoders is not None:
+            encoder = PyDict_GetItem(self._encoders, <object>Py_TYPE(o))
+            if encoder != NULL:
+                o = (<object>encoder)(o)
+                return self._pack_inner(o, 0, nest_limit)
         if self._default is not None:
             ret = self._pack_inner(o, 1, nest_limit)
             if ret == -2:
@@ -268,55 +622,186 @@ cdef class Packer:
                 return ret
         return self._pack_inner(o, 0, nest_limit)
 
+    cdef int _new_result_buffer(self) except -1:
+        # Start a bytes object to pack into when zero_copy is enabled.  It is
+        # sized after the previous message, and resized as it fills (see
+        # msgpack_pack_write).
+        cdef object obj
+        if self.pk.obj != NULL:
+            self.pk.length = 0
+            return 0
+        obj = PyBytes_FromStringAndSize(NULL, self.zero_copy_size)
+        Py_INCREF(obj)
+        self.pk.obj = <PyObject*>obj
+        self.pk.buf = PyBytes_AS_STRING(obj)
+        self.pk.buf_size = self.zero_copy_size
+        self.pk.length = 0
+        return 0
+
+    cdef void _clear(self):
+        # Discard packed data, shrinking the buffer after a large message.
+        if self.pk.obj != NULL:
+            # Start over from the smallest size after an error.
+            Py_CLEAR(self.pk.obj)
+            self.pk.buf = NULL
+            self.pk.buf_size = 0
+            self.pk.length = 0
+            self.zero_copy_size = ZERO_COPY_BUF_SIZE
+        elif self.pk.nchunks or self.pk.buf_size > self.buf_size:
+            msgpack_pack_clear(&self.pk, self.buf_size, self.buf_retain)
+        else:
+            self.pk.length = 0
+
+    cdef object _take_result(self):
+        # Return packed data and reset the buffer.
+        cdef PyObject* obj = self.pk.obj
+        cdef Py_ssize_t length = self.pk.length
+        if obj == NULL:
+            if self.pk.nchunks == 0:
+                buf = PyBytes_FromStringAndSize(self.pk.buf, length)
+            else:
+                buf = PyBytes_FromStringAndSize(NULL, msgpack_pack_size(&self.pk))
+                msgpack_pack_copy(&self.pk, PyBytes_AS_STRING(buf))
+            self._clear()
+            return buf
+
+        # Hand the bytes object over to the caller without copying, and size
+        # the next one after it, with some room, up to buf_size.
+        self.zero_copy_size = min(max(<size_t>length + <size_t>length // 4, ZERO_COPY_BUF_SIZE),
+                                  max(self.buf_size, ZERO_COPY_BUF_SIZE))
+        self.pk.obj = NULL
+        self.pk.buf = NULL
+        self.pk.buf_size = 0
+        self.pk.length = 0
+        # On failure obj is freed and set to NULL, and the packer is left
+        # without a buffer, like after success.
+        if _PyBytes_Resize(&obj, length) < 0:
+            raise MemoryError
+        buf = <object>obj
+        Py_DECREF(buf)
+        return buf
+
     @cython.critical_section
     def pack(self, object obj):
         cdef int ret
         self._check_exports()
+        if self.zero_copy:
+            self._new_result_buffer()
         try:
             ret = self._pack(obj, DEFAULT_RECURSE_LIMIT)
         except:
-            self.pk.length = 0
+            self._clear()
             raise
         if ret:  # should not happen.
             raise RuntimeError("internal error")
         if self.autoreset:
-            buf = PyBytes_FromStringAndSize(self.pk.buf, self.pk.length)
+            return self._take_result()
+
+    @cython.critical_section
+    def pack_many(self, object objs):
+        """Pack the objects of the iterable *objs* one after another.
+
+        Returns ``(data, offsets)``, where *data* is the packed objects as
+        one ``bytes`` and *offsets* is an ``array('Q')`` of the position of
+        each object in it.  Writing *data* with *offsets* as an index saves
+        packing and joining the objects one by one.
+
+        With ``autoreset=False``, the objects are appended to the internal
+        buffer, *data* is None and *offsets* are positions in the buffer.
+        """
+        cdef tuple seq = objs if type(objs) is tuple else tuple(objs)
+        cdef carray.array offsets = carray.clone(array.array("Q"), len(seq), False)
+        cdef unsigned long long* items = offsets.data.as_ulonglongs
+        cdef Py_ssize_t i = 0
+        self._check_exports()
+        if self.zero_copy:
+            self._new_result_buffer()
+        try:
+            for o in seq:
+                items[i] = msgpack_pack_size(&self.pk)
+                self._pack(o, DEFAULT_RECURSE_LIMIT)
+                i += 1
+        except:
+            self._clear()
+            raise
+        if self.autoreset:
+            return self._take_result(), offsets
+        return None, offsets
+
+    @cython.critical_section
+    def pack_into(self, object obj, object buffer, Py_ssize_t offset=0):
+        """Pack *obj* into writable *buffer* at *offset* and return the number of bytes written.
+
+        Data is written directly into *buffer* (e.g. ``bytearray``, ``mmap``)
+        without going through the internal buffer.
+
+        Raises ``ValueError`` when *buffer* is too small.  The required size
+        is reported in the message.  The contents of *buffer* after *offset*
+        are undefined in that case.
+        """
+        cdef Py_buffer view
+        cdef msgpack_packer saved
+        cdef size_t avail
+        cdef size_t length
+
+        PyObject_GetBuffer(buffer, &view, PyBUF_WRITABLE)
+        try:
+            if offset < 0 or offset > view.len:
+                raise ValueError("offset is out of range")
+            avail = view.len - offset
+            saved = self.pk
+            self.pk.buf = <char*>view.buf + offset
+            self.pk.buf_size = avail
             self.pk.length = 0
-            return buf
+            self.pk.fixed = True
+            self.pk.nchunks = 0
+            self.pk.chunked = 0
+            try:
+                self._pack(obj, DEFAULT_RECURSE_LIMIT)
+                length = self.pk.length
+            finally:
+                self.pk = saved
+        finally:
+            PyBuffer_Release(&view)
+
+        if length > avail:
+            raise ValueError(
+                "buffer is too small: %d bytes required, %d bytes available" % (length, avail))
+        return length
 
     @cython.critical_section
     def pack_ext_type(self, typecode, data):
         self._check_exports()
         if len(data) > ITEM_LIMIT:
             raise ValueError("ext data too large")
+        if self.zero_copy:
+            self._new_result_buffer()
         msgpack_pack_ext(&self.pk, typecode, len(data))
         msgpack_pack_raw_body(&self.pk, data, len(data))
         if self.autoreset:
-            buf = PyBytes_FromStringAndSize(self.pk.buf, self.pk.length)
-            self.pk.length = 0
-            return buf
+            return self._take_result()
 
     @cython.critical_section
     def pack_array_header(self, long long size):
         self._check_exports()
         if size > ITEM_LIMIT:
             raise ValueError("array too large")
+        if self.zero_copy:
+            self._new_result_buffer()
         msgpack_pack_array(&self.pk, size)
         if self.autoreset:
-            buf = PyBytes_FromStringAndSize(self.pk.buf, self.pk.length)
-            self.pk.length = 0
-            return buf
+            return self._take_result()
 
     @cython.critical_section
     def pack_map_header(self, long long size):
         self._check_exports()
         if size > ITEM_LIMIT:
             raise ValueError("map too learge")
+        if self.zero_copy:
+            self._new_result_buffer()
         msgpack_pack_map(&self.pk, size)
         if self.autoreset:
-            buf = PyBytes_FromStringAndSize(self.pk.buf, self.pk.length)
-            self.pk.length = 0
-            return buf
+            return self._take_result()
 
     @cython.critical_section
     def pack_map_pairs(self, object pairs):
@@ -330,14 +815,18 @@ cdef class Packer:
         size = len(pairs)
         if size > ITEM_LIMIT:
             raise ValueError("map too large")
-        msgpack_pack_map(&self.pk, size)
-        for k, v in pairs:
-            self._pack(k)
-            self._pack(v)
+        if self.zero_copy:
+            self._new_result_buffer()
+        try:
+            msgpack_pack_map(&self.pk, size)
+            for k, v in pairs:
+                self._pack(k)
+                self._pack(v)
+        except:
+            self._clear()
+            raise
         if self.autoreset:
-            buf = PyBytes_FromStringAndSize(self.pk.buf, self.pk.length)
-            self.pk.length = 0
-            return buf
+            return self._take_result()
 
     @cython.critical_section
     def reset(self):
@@ -346,12 +835,14 @@ cdef class Packer:
         This method is useful only when autoreset=False.
         """
         self._check_exports()
-        self.pk.length = 0
+        self._clear()
 
     @cython.critical_section
     def bytes(self):
         """Return internal buffer contents as bytes object"""
-        return PyBytes_FromStringAndSize(self.pk.buf, self.pk.length)
+        buf = PyBytes_FromStringAndSize(NULL, msgpack_pack_size(&self.pk))
+        msgpack_pack_copy(&self.pk, PyBytes_AS_STRING(buf))
+        return buf
 
     def getbuffer(self):
         """Return memoryview of internal buffer.
@@ -362,9 +853,102 @@ cdef class Packer:
 
     @cython.critical_section
     def __getbuffer__(self, Py_buffer *buffer, int flags):
+        msgpack_pack_join(&self.pk)
         PyBuffer_FillInfo(buffer, self, self.pk.buf, self.pk.length, 1, flags)
         self.exports += 1
 
     @cython.critical_section
     def __releasebuffer__(self, Py_buffer *buffer):
         self.exports -= 1
+
+
+# Packers reused by packb(), per thread and per option set.
+cdef object _packer_pool_key = "msgpack._cmsgpack.packer_pool"
+cdef Py_ssize_t PACKER_POOL_SIZE = 8
+
+
+cdef dict _pool_options(dict kwargs):
+    # Return the options to match later calls against, or None when they
+    # can't be pooled.  Dicts (type_encoders) are copied by Packer, so a copy
+    # is kept to notice changes; callables are matched by identity, since
+    # they can hold state.
+    cdef dict options = {}
+    for k, v in kwargs.items():
+        if type(v) is dict:
+            v = dict(v)
+        elif not (v is None or type(v) in (bool, int, float, str) or callable(v)):
+            return None
+        options[k] = v
+    return options
+
+
+cdef bint _same_options(dict options, dict kwargs):
+    if len(options) != len(kwargs):
+        return False
+    for k, v in options.items():
+        w = kwargs.get(k, _unset)
+        if v is w:
+            continue
+        if type(v) is not type(w) or type(v) not in (bool, int, float, str, dict) or v != w:
+            return False
+    return True
+
+
+cdef Packer _pooled_packer(dict kwargs):
+    # Pooled packers live as long as their thread, so unless buf_retain is
+    # given they keep no more than buf_size bytes after a large message.
+    cdef Packer packer = Packer(**kwargs)
+    if "buf_retain" not in kwargs:
+        packer.buf_retain = packer.buf_size
+    return packer
+
+
+def packb(object o, **kwargs):
+    """
+    Pack object `o` and return packed bytes
+
+    See :class:`Packer` for options.
+    """
+    cdef PyObject* tsdict
+    cdef list pool
+    cdef Py_ssize_t i, n
+    cdef tuple entry = None
+
+    if kwargs and not kwargs.get("autoreset", True):
+        return Packer(**kwargs).pack(o)
+    tsdict = PyThreadState_GetDict()
+    if tsdict == NULL:
+        return Packer(**kwargs).pack(o)
+    pool = (<dict>tsdict).get(_packer_pool_key)
+    if pool is None:
+        pool = []
+        (<dict>tsdict)[_packer_pool_key] = pool
+
+    # The pool holds (options, packer) entries.  A slot is None while its
+    # packer is in use, so that nested packb() calls (e.g. from `default`)
+    # don't share it.
+    n = len(pool)
+    for i in range(n):
+        entry = <tuple>pool[i]
+        if entry is not None and _same_options(entry[0], kwargs):
+            break
+        entry = None
+    if entry is None:
+        options = _pool_options(kwargs)
+        if options is None:
+            return Packer(**kwargs).pack(o)
+        entry = (options, _pooled_packer(kwargs))
+        if n < PACKER_POOL_SIZE:
+            pool.append(None)
+            i = n
+        else:
+            for i in range(n - 1, -1, -1):
+                if pool[i] is not None:
+                    break
+            else:
+                return (<Packer>entry[1]).pack(o)
+    pool[i] = None
+    try:
+        return (<Packer>entry[1]).pack(o)
+    finally:
+        pool[i] = entry
@@ -0,0 +1,154 @@
+"""Decoding plans for the ``schema`` option of Unpacker.
+
+A plan is a list, so that plans of recursive types can refer to themselves.
+Both implementations read it by position:
+
+Record plan (dataclass or NamedTuple)::
+
+    [RECORD, cls, index, npositional, kwnames, defaults, factories, types, subplans, names]
+
+- index: dict mapping field name to field position.
+- npositional: number of fields passed positionally.  The remaining ones are
+  keyword-only and their names are in the *kwnames* tuple (or None).
+- defaults: per field, a 1-tuple holding the default value, or None.
+- factories: per field, the default factory, or None.
+- types: per field, a type or a tuple of types for ``isinstance``, or None.
+- subplans: per field, the plan to decode the value with, or None.
+- names: field names, in position order.
+
+List plan (``list[T]`` where T has a record plan)::
+
+    [LIST, item_plan]
+"""
+
+import collections.abc
+import dataclasses
+import datetime
+import types
+import typing
+
+from . import ext
+
+RECORD = 0
+LIST = 1
+
+_plans = {}
+
+# Types the unpacker can produce, so values can be checked against them.
+# ext.ExtType and ext.Timestamp too, looked up when used: msgpack.ext
+# replaces them with the C implementations while it is imported.
+_CHECKED_TYPES = (
+    int,
+    float,
+    str,
+    bytes,
+    bool,
+    list,
+    tuple,
+    dict,
+    type(None),
+    datetime.datetime,
+)
+
+
+def compile_schema(cls):
+    """Return the decoding plan for *cls*, a dataclass or NamedTuple type."""
+    plan = _plans.get(cls)
+    if plan is None:
+        pending = {}
+        plan = _compile(cls, pending)
+        # Plans are published only when complete, since they are read
+        # without checks.
+        _plans.update(pending)
+    return plan
+
+
+def _compile(cls, pending):
+    plan = _plans.get(cls) or pending.get(cls)
+    if plan is not None:
+        return plan
+    if dataclasses.is_dataclass(cls) and isinstance(cls, type):
+        fields = [(f.name, f) for f in dataclasses.fields(cls) if f.init]
+    elif isinstance(cls, type) and issubclass(cls, tuple) and hasattr(cls, "_fields"):
+        fields = [(name, None) for name in cls._fields]
+    else:
+        raise TypeError("schema must be a dataclass or NamedTuple type, not %r" % (cls,))
+
+    plan = [RECORD, cls]
+    pending[cls] = plan  # before compiling fields, for recursive types
+    try:
+        hints = typing.get_type_hints(cls)
+    except Exception:
+        hints = getattr(cls, "__annotations__", {})
+
+    positional = [item for item in fields if item[1] is None or not item[1].kw_only]
+    keyword = [item for item in fields if item[1] is not None and item[1].kw_only]
+    fields = positional + keyword
+    nt_defaults = getattr(cls, "_field_defaults", {})
+
+    defaults = []
+    factories = []
+    for name, f in fields:
+        if f is None:
+            defaults.append((nt_defaults[name],) if name in nt_defaults else None)
+            factories.append(None)
+        else:
+            has_default = f.default is not dataclasses.MISSING
+            defaults.append((f.default,) if has_default else None)
+            has_factory = f.default_factory is not dataclasses.MISSING
+            factories.append(f.default_factory if has_factory else None)
+
+    checks = []
+    subplans = []
+    for name, f in fields:
+        check, subplan = _compile_hint(hints.get(name), pending)
+        checks.append(check)
+        subplans.append(subplan)
+
+    plan += [
+        {name: i for i, (name, f) in enumerate(fields)},
+        len(positional),
+        tuple(name for name, f in keyword) or None,
+        tuple(defaults),
+        tuple(factories),
+        tuple(checks),
+        tuple(subplans),
+        tuple(name for name, f in fields),
+    ]
+    return plan
+
+
+def _compile_hint(hint, pending):
+    # Return (types to check, plan to decode with) for a field annotation.
+    if hint is None or hint is typing.Any:
+        return None, None
+    origin = typing.get_origin(hint)
+    if origin is typing.Union or origin is types.UnionType:
+        checks = []
+        subplan = None
+        for arg in typing.get_args(hint):
+            check, plan = _compile_hint(arg, pending)
+            if check is None:
+                return None, None
+            checks.extend(check if isinstance(check, tuple) else (check,))
+            subplan = subplan or plan
+        return tuple(checks), subplan
+    if origin in (list, tuple, collections.abc.Sequence):
+        args = typing.get_args(hint)
+        item_plan = None
+        if origin is list and len(args) == 1:
+            item_plan = _compile_hint(args[0], pending)[1]
+        return (list, tuple), [LIST, item_plan] if item_plan is not None else None
+    if origin is dict:
+        return dict, None
+    if not isinstance(hint, type):
+        return None, None
+    if dataclasses.is_dataclass(hint) or (issubclass(hint, tuple) and hasattr(hint, "_fields")):
+        return hint, _compile(hint, pending)
+    if hint is float:
+        return (float, int), None
+    if hint in (list, tuple):
+        return (list, tuple), None
+    if hint in _CHECKED_TYPES or hint is ext.ExtType or hint is ext.Timestamp:
+        return hint, None
+    return None, None
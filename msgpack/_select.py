@@ -0,0 +1,84 @@
+"""Compiled paths for the ``select`` option of unpackb().
+
+A path is a tuple of map keys, where ``"*"`` matches every key of a map and
+every item of an array.  Paths are compiled into a tree of nodes, read by
+position by both implementations::
+
+    (keys, rest)
+
+- keys: dict mapping map keys to the node for their values.
+- rest: the node for the values of other keys and for array items.
+
+Paths do not check the types of the values: where a node has no wildcard
+(rest is False), an array has no selected items and is unpacked as an empty
+list, and a value that is neither a map nor an array is unpacked whole.
+
+A node is such a tuple, None to unpack the whole object, or False to skip
+it.  The wildcard is merged into *keys* when compiling, so that only one
+lookup is needed per key.
+"""
+
+ANY = "*"
+
+
+def _merge(a, b):
+    if a is False:
+        return b
+    if b is False:
+        return a
+    if a is None or b is None:
+        return None
+    keys = {k: _merge(v, b[1]) for k, v in a[0].items()}
+    for k, v in b[0].items():
+        keys[k] = _merge(a[0].get(k, a[1]), v)
+    return (keys, _merge(a[1], b[1]))
+
+
+def _compile_path(path, i):
+    if i == len(path):
+        return None
+    child = _compile_path(path, i + 1)
+    key = path[i]
+    if key == ANY:
+        return ({}, child)
+    hash(key)
+    return ({key: child}, False)
+
+
+class Selector:
+    """Compiled set of paths for the ``select`` option of :func:`unpackb`.
+
+    Compiling is done once, so pass a Selector rather than a list of paths
+    when unpacking many messages.
+
+    Only ``"*"`` selects the items of an array: an array found where a path
+    names a key is unpacked as an empty list.
+
+    >>> sel = Selector([("user", "id"), ("events", "*", "ts")])
+    >>> unpackb(data, select=sel)
+    {'user': {'id': 1}, 'events': [{'ts': 10}, {'ts': 11}]}
+    """
+
+    __slots__ = ("paths", "plan")
+
+    def __init__(self, paths):
+        plan = False
+        paths = tuple(paths)
+        for path in paths:
+            if not isinstance(path, (tuple, list)):
+                raise TypeError("path must be a tuple of keys, not %r" % (path,))
+            plan = _merge(plan, _compile_path(path, 0))
+        if not paths:
+            raise ValueError("select requires at least one path")
+        self.paths = paths
+        self.plan = plan
+
+    def __repr__(self):
+        return "Selector(%r)" % (list(self.paths),)
+
+
+def compile_select(select):
+    """Return the plan for *select*, a Selector or an iterable of paths."""
+    if not isinstance(select, Selector):
+        select = Selector(select)
+    return select.plan
@@ -0,0 +1,79 @@
+"""Map shapes for the ``map_records`` option of Unpacker.
+
+Maps whose keys are all ``str`` are unpacked to records, made by a
+constructor cached for each sequence of keys (shape).  Shapes are the nodes
+of a trie, followed from the root by the keys of a map.  A node is a list,
+so that both implementations can read and update it by position::
+
+    [keys, constructor, last_key, last_node, children]
+
+- keys: tuple of the keys leading to the node.
+- constructor: made by the factory from *keys* when the first map of this
+  shape ends, or None.
+- last_key, last_node: the child followed last, compared by identity first.
+- children: dict mapping keys to child nodes.
+
+The root node has one more item, the number of nodes of the trie.  At most
+MAX_SHAPES nodes are made: a map whose keys would need more is unpacked to
+a dict, so that maps of ever new keys cannot grow the trie without bound.
+"""
+
+import collections
+import functools
+
+TUPLE = 1
+NAMEDTUPLE = 2
+FACTORY = 3
+
+#: Maximum number of nodes of a trie (MSGPACK_MAX_SHAPES in unpack.h).
+MAX_SHAPES = 2048
+
+
+def new_shape(keys):
+    return [keys, None, None, None, {}]
+
+
+def new_root():
+    return [(), None, None, None, {}, 1]
+
+
+def compile_map_records(map_records):
+    """Return the mode and the constructor factory of *map_records*."""
+    if map_records == "tuple":
+        return TUPLE, None
+    if map_records == "namedtuple":
+        return NAMEDTUPLE, _namedtuple
+    if callable(map_records):
+        return FACTORY, map_records
+    raise TypeError(f"map_records must be 'tuple', 'namedtuple' or a callable, not {map_records!r}")
+
+
+@functools.lru_cache(maxsize=1024)
+def _namedtuple(keys):
+    return collections.namedtuple("Record", keys, rename=True)
+
+
+def next_shape(root, node, key):
+    """Follow *key* from *node*, or return None when the trie is full."""
+    if node[2] is key:
+        return node[3]
+    child = node[4].get(key)
+    if child is None:
+        if root[5] >= MAX_SHAPES:
+            return None
+        root[5] += 1
+        child = node[4][key] = new_shape(node[0] + (key,))
+    node[2] = key
+    node[3] = child
+    return child
+
+
+def make_record(node, values, mode, factory):
+    if mode == TUPLE:
+        return values
+    ctor = node[1]
+    if ctor is None:
+        ctor = node[1] = factory(node[0])
+    if mode == NAMEDTUPLE:
+        return tuple.__new__(ctor, values)
+    return ctor(*values)
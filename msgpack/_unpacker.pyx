@@ -1,12 +1,21 @@
 from cpython cimport *
 cdef extern from "Python.h":
     ctypedef struct PyObject
+    Py_ssize_t PY_SSIZE_T_MAX
     object PyMemoryView_GetContiguous(object obj, int buffertype, char order)
+    Py_buffer* PyMemoryView_GET_BUFFER(object mview)
+    object PyMemoryView_FromObject(object obj)
+    const char* PyUnicode_AsUTF8AndSize(object unicode, Py_ssize_t* size) except NULL
 
 from libc.stdlib cimport *
 from libc.string cimport *
 from libc.limits cimport *
 from libc.stdint cimport uint64_t
+from cpython cimport array as carray
+
+import array
+import io
+from io import UnsupportedOperation
 
 from .exceptions import (
     BufferFull,
@@ -15,13 +24,20 @@ from .exceptions import (
     FormatError,
     StackError,
 )
-from .ext import ExtType, Timestamp
+from ._schema import compile_schema
+from ._select import compile_select
+from ._shapes import compile_map_records, new_root
+from ._ndarray import ndarray_type, unpack_ndarray
+from ._lazy import LazyList, LazyMap, load as lazy_load
+from ._mmap import map_file
 
 cdef object giga = 1_000_000_000
+cdef Py_ssize_t DEFAULT_MAX_DEPTH = 1024
+cdef Py_ssize_t DEFAULT_KEY_CACHE = 256
 
 
 cdef extern from "unpack.h":
-    ctypedef struct msgpack_user:
+    ctypedef struct msgpack_user "unpack_user":
         bint use_list
         bint raw
         bint has_pairs_hook # call object_hook with k-v pairs
@@ -30,15 +46,27 @@ cdef extern from "unpack.h":
         PyObject* object_hook
         PyObject* list_hook
         PyObject* ext_hook
-        PyObject* timestamp_t
+        PyObject* ext_type
+        object (*new_timestamp)(int64_t seconds, uint32_t nanoseconds)
         PyObject *giga;
         PyObject *utc;
+        PyObject *schema;
+        PyObject *select
+        PyObject *ndarray_hook
+        int ndarray_ext_code
+        PyObject *buffer
+        bint bin_as_view
         const char *unicode_errors
         Py_ssize_t max_str_len
         Py_ssize_t max_bin_len
         Py_ssize_t max_array_len
         Py_ssize_t max_map_len
         Py_ssize_t max_ext_len
+        unsigned int max_depth
+        bint intern_keys
+        PyObject *shapes
+        int shape_mode
+        PyObject *shape_factory
 
     ctypedef struct unpack_context:
         msgpack_user user
@@ -55,6 +83,11 @@ cdef extern from "unpack.h":
     void unpack_init(unpack_context* ctx)
     object unpack_data(unpack_context* ctx)
     void unpack_clear(unpack_context* ctx)
+    int unpack_alloc_tables(msgpack_user* u, size_t key_cache, size_t dedup_values) except -1
+    void unpack_free_tables(msgpack_user* u)
+    int unpack_skip_objects(const unsigned char* p, const unsigned char* pe,
+                            const unsigned char** end, size_t n,
+                            unsigned int depth, unsigned int max_depth)
 
 cdef inline init_ctx(unpack_context *ctx,
                      object object_hook, object object_pairs_hook,
@@ -64,7 +97,11 @@ cdef inline init_ctx(unpack_context *ctx,
                      const char* unicode_errors,
                      Py_ssize_t max_str_len, Py_ssize_t max_bin_len,
                      Py_ssize_t max_array_len, Py_ssize_t max_map_len,
-                     Py_ssize_t max_ext_len):
+                     Py_ssize_t max_ext_len,
+                     object schema_plan=None,
+                     object ndarray_ext_code=None,
+                     Py_ssize_t max_depth=DEFAULT_MAX_DEPTH,
+                     bint intern_keys=True):
     unpack_init(ctx)
     ctx.user.use_list = use_list
     ctx.user.raw = raw
@@ -75,6 +112,11 @@ cdef inline init_ctx(unpack_context *ctx,
     ctx.user.max_array_len = max_array_len
     ctx.user.max_map_len = max_map_len
     ctx.user.max_ext_len = max_ext_len
+    if not 0 < max_depth <= UINT_MAX:
+        raise ValueError("max_depth must be between 1 and %d" % UINT_MAX)
+    ctx.user.max_depth = max_depth
+    ctx.user.intern_keys = intern_keys
+    unpack_alloc_tables(&ctx.user, 0, 0)
 
     if object_hook is not None and object_pairs_hook is not None:
         raise TypeError("object_pairs_hook and object_hook are mutually exclusive.")
@@ -102,15 +144,26 @@ cdef inline init_ctx(unpack_context *ctx,
             raise TypeError("ext_hook must be a callable.")
         ctx.user.ext_hook = <PyObject*>ext_hook
 
-    if timestamp < 0 or 3 < timestamp:
-        raise ValueError("timestamp must be 0..3")
+    if timestamp < 0 or 4 < timestamp:
+        raise ValueError("timestamp must be 0..4")
 
-    # Add Timestamp type to the user object so it may be used in unpack.h
+    # unpack.h makes ExtType and Timestamp without calling them.
     ctx.user.timestamp = timestamp
-    ctx.user.timestamp_t = <PyObject*>Timestamp
+    ctx.user.ext_type = <PyObject*>ext_type
+    ctx.user.new_timestamp = new_timestamp
     ctx.user.giga = <PyObject*>giga
     ctx.user.utc = <PyObject*>utc
     ctx.user.unicode_errors = unicode_errors
+    ctx.user.schema = NULL if schema_plan is None else <PyObject*>schema_plan
+    ctx.user.select = NULL
+    ctx.user.shapes = ctx.user.shape_factory = NULL
+    ctx.user.ndarray_hook = NULL
+    ctx.user.buffer = NULL
+    ctx.user.bin_as_view = False
+    if ndarray_ext_code is not None:
+        ndarray_type(ndarray_ext_code)
+        ctx.user.ndarray_hook = <PyObject*>unpack_ndarray
+        ctx.user.ndarray_ext_code = ndarray_ext_code
 
 def default_read_extended_type(typecode, data):
     raise NotImplementedError("Cannot decode extended type with typecode=%d" % typecode)
@@ -138,6 +191,46 @@ cdef inline int get_data_from_buffer(object obj,
     return 1
 
 
+cdef object file_readinto(object file_like):
+    # readinto() or recv_into() of file_like, or None to use read().
+    readinto = getattr(file_like, "readinto", None)
+    if readinto is None:
+        return getattr(file_like, "recv_into", None)
+    if getattr(type(file_like), "readinto", None) is io.RawIOBase.readinto:
+        # The io.RawIOBase default, which raises NotImplementedError.
+        return None
+    return readinto
+
+
+cdef object byte_view(object obj):
+    # Return a 1-dimensional memoryview of unsigned bytes over obj.
+    cdef object view = PyMemoryView_FromObject(obj)
+    if view.itemsize != 1:
+        raise BufferError("cannot unpack from multi-byte object")
+    if not view.c_contiguous:
+        view = PyMemoryView_FromObject(view.tobytes())
+    elif view.ndim != 1 or view.format != "B":
+        view = view.cast("B")
+    return view
+
+
+cdef object init_shapes(unpack_context* ctx, object map_records):
+    # Set up the map_records option, after init_ctx() and the select option.
+    # Returns what must be kept alive while ctx is used.
+    if map_records is None:
+        return None
+    if ctx.user.object_hook != NULL:
+        raise TypeError("map_records and object_hook/object_pairs_hook are mutually exclusive")
+    if ctx.user.schema != NULL or ctx.user.select != NULL:
+        raise ValueError("map_records is mutually exclusive with schema and select")
+    mode, factory = compile_map_records(map_records)
+    root = new_root()
+    ctx.user.shapes = <PyObject*>root
+    ctx.user.shape_mode = mode
+    ctx.user.shape_factory = <PyObject*>factory
+    return root, factory
+
+
 def unpackb(object packed, *, object object_hook=None, object list_hook=None,
             bint use_list=True, bint raw=False, int timestamp=0, bint strict_map_key=True,
             unicode_errors=None,
@@ -146,10 +239,27 @@ def unpackb(object packed, *, object object_hook=None, object list_hook=None,
             Py_ssize_t max_bin_len=-1,
             Py_ssize_t max_array_len=-1,
             Py_ssize_t max_map_len=-1,
-            Py_ssize_t max_ext_len=-1):
+            Py_ssize_t max_ext_len=-1,
+            Py_ssize_t max_depth=DEFAULT_MAX_DEPTH,
+            object schema=None,
+            object ndarray_ext_code=None,
+            bint bin_as_view=False,
+            object select=None,
+            bint intern_keys=True,
+            Py_ssize_t dedup_values=0,
+            object map_records=None):
     """
     Unpack packed_bytes to object. Returns an unpacked object.
 
+    *select* is a :class:`Selector` or a list of paths to unpack, like
+    ``[("user", "id"), ("events", "*", "ts")]``.  A path is a tuple of map
+    keys, where ``"*"`` matches every key or array item.  Only the selected
+    parts of maps are unpacked, along with the maps and arrays holding them;
+    everything else is skipped without creating objects.  Where a path
+    expects a map, an array is unpacked as an empty list (only ``"*"``
+    selects array items) and any other value is unpacked whole, so that
+    ``("*", "id")`` can be used on maps of mixed values.
+
     Raises ``ExtraData`` when *packed* contains extra bytes.
     Raises ``ValueError`` when *packed* is incomplete.
     Raises ``FormatError`` when *packed* is not valid msgpack.
@@ -161,16 +271,54 @@ def unpackb(object packed, *, object object_hook=None, object list_hook=None,
     *max_xxx_len* options are configured automatically from ``len(packed)``.
     """
     cdef unpack_context ctx
+    cdef const char* cerr = NULL
+    cdef object schema_plan = None
+    cdef object select_plan = None
+
+    if unicode_errors is not None:
+        cerr = unicode_errors
+    if select is not None:
+        if schema is not None:
+            raise ValueError("select and schema are mutually exclusive")
+        select_plan = compile_select(select)
+    if schema is not None:
+        schema_plan = compile_schema(schema)
+
+    init_ctx(&ctx, object_hook, object_pairs_hook, list_hook, ext_hook,
+             use_list, raw, timestamp, strict_map_key, cerr,
+             max_str_len, max_bin_len, max_array_len, max_map_len, max_ext_len,
+             schema_plan, ndarray_ext_code, max_depth, intern_keys)
+    ctx.user.bin_as_view = bin_as_view
+    if select_plan is not None:
+        ctx.user.select = <PyObject*>select_plan
+    shapes = init_shapes(&ctx, map_records)
+    if dedup_values < 0:
+        raise ValueError("dedup_values must be non-negative")
+    if not dedup_values:
+        return unpack_buffer(&ctx, packed, max_str_len, max_bin_len, max_array_len,
+                             max_map_len, max_ext_len)
+    unpack_alloc_tables(&ctx.user, 0, dedup_values)
+    try:
+        return unpack_buffer(&ctx, packed, max_str_len, max_bin_len, max_array_len,
+                             max_map_len, max_ext_len)
+    finally:
+        unpack_free_tables(&ctx.user)
+
+
+cdef object unpack_buffer(unpack_context* ctx, object packed,
+                          Py_ssize_t max_str_len, Py_ssize_t max_bin_len,
+                          Py_ssize_t max_array_len, Py_ssize_t max_map_len,
+                          Py_ssize_t max_ext_len):
+    # Unpack packed with ctx, which is set up by init_ctx() and reset here.
+    # max_xxx_len of -1 are configured from len(packed).
     cdef Py_ssize_t off = 0
     cdef int ret
-
     cdef Py_buffer view
     cdef char* buf = NULL
     cdef Py_ssize_t buf_len
-    cdef const char* cerr = NULL
 
-    if unicode_errors is not None:
-        cerr = unicode_errors
+    if ctx.user.bin_as_view:
+        packed = byte_view(packed)
 
     get_data_from_buffer(packed, &view, &buf, &buf_len)
 
@@ -186,21 +334,28 @@ def unpackb(object packed, *, object object_hook=None, object list_hook=None,
         max_ext_len = buf_len
 
     try:
-        init_ctx(&ctx, object_hook, object_pairs_hook, list_hook, ext_hook,
-                 use_list, raw, timestamp, strict_map_key, cerr,
-                 max_str_len, max_bin_len, max_array_len, max_map_len, max_ext_len)
-        ret = unpack_construct(&ctx, buf, buf_len, &off)
+        unpack_init(ctx)
+        ctx.user.max_str_len = max_str_len
+        ctx.user.max_bin_len = max_bin_len
+        ctx.user.max_array_len = max_array_len
+        ctx.user.max_map_len = max_map_len
+        ctx.user.max_ext_len = max_ext_len
+        # Arrays (and bin with bin_as_view) are unpacked as views of the input.
+        ctx.user.buffer = <PyObject*>view.obj
+        ret = unpack_construct(ctx, buf, buf_len, &off)
         if ret == 1:
-            obj = unpack_data(&ctx)
+            obj = unpack_data(ctx)
+            unpack_init(ctx)
             if off < buf_len:
                 # buf may point into a temporary contiguous copy owned by view,
                 # so the extra data must be copied out before releasing view.
                 raise ExtraData(obj, PyBytes_FromStringAndSize(buf+off, buf_len-off))
             return obj
     finally:
+        ctx.user.buffer = NULL
         PyBuffer_Release(&view);
 
-    unpack_clear(&ctx)
+    unpack_clear(ctx)
     if ret == 0:
         raise ValueError("Unpack failed: incomplete input")
     elif ret == -2:
@@ -211,6 +366,211 @@ def unpackb(object packed, *, object object_hook=None, object list_hook=None,
         raise ValueError("Unpack failed: error = %d" % (ret,))
 
 
+def unpackb_many(object payloads, *, str on_error="raise", object object_hook=None,
+                 object list_hook=None, bint use_list=True, bint raw=False,
+                 int timestamp=0, bint strict_map_key=True, unicode_errors=None,
+                 object_pairs_hook=None, ext_hook=ExtType,
+                 Py_ssize_t max_str_len=-1,
+                 Py_ssize_t max_bin_len=-1,
+                 Py_ssize_t max_array_len=-1,
+                 Py_ssize_t max_map_len=-1,
+                 Py_ssize_t max_ext_len=-1,
+                 Py_ssize_t max_depth=DEFAULT_MAX_DEPTH,
+                 object schema=None,
+                 object ndarray_ext_code=None,
+                 bint bin_as_view=False,
+                 object select=None,
+                 Py_ssize_t key_cache=DEFAULT_KEY_CACHE,
+                 bint intern_keys=True,
+                 Py_ssize_t dedup_values=0,
+                 object map_records=None):
+    """
+    Unpack each buffer of the iterable *payloads*, like :func:`unpackb`
+    with the same options, and return the list of objects.
+
+    Options are checked once, and the unpacking context is reused for every
+    buffer, so it is faster than calling :func:`unpackb` in a loop.
+
+    *on_error* tells what to do when a buffer can't be unpacked:
+    ``"raise"`` (default) raises the exception, ``"skip"`` leaves the
+    buffer out of the result, and ``"collect"`` puts the exception in the
+    result in place of the object, so that it lines up with *payloads*.
+
+    *key_cache*, *dedup_values* and *map_records* are like the options of
+    :class:`Unpacker`, with one table shared by all buffers.
+    """
+    cdef unpack_context ctx
+    cdef const char* cerr = NULL
+    cdef object schema_plan = None
+    cdef object select_plan = None
+    cdef int mode
+    cdef list result = []
+
+    if on_error == "raise":
+        mode = 0
+    elif on_error == "skip":
+        mode = 1
+    elif on_error == "collect":
+        mode = 2
+    else:
+        raise ValueError("on_error must be 'raise', 'skip' or 'collect', not %r" % (on_error,))
+    if unicode_errors is not None:
+        cerr = unicode_errors
+    if select is not None:
+        if schema is not None:
+            raise ValueError("select and schema are mutually exclusive")
+        select_plan = compile_select(select)
+    if schema is not None:
+        schema_plan = compile_schema(schema)
+
+    init_ctx(&ctx, object_hook, object_pairs_hook, list_hook, ext_hook,
+             use_list, raw, timestamp, strict_map_key, cerr,
+             max_str_len, max_bin_len, max_array_len, max_map_len, max_ext_len,
+             schema_plan, ndarray_ext_code, max_depth, intern_keys)
+    ctx.user.bin_as_view = bin_as_view
+    if select_plan is not None:
+        ctx.user.select = <PyObject*>select_plan
+    shapes = init_shapes(&ctx, map_records)
+    if key_cache < 0:
+        raise ValueError("key_cache must be non-negative")
+    if dedup_values < 0:
+        raise ValueError("dedup_values must be non-negative")
+    unpack_alloc_tables(&ctx.user, key_cache, dedup_values)
+    try:
+        for packed in payloads:
+            if mode == 0:
+                result.append(unpack_buffer(&ctx, packed, max_str_len, max_bin_len,
+                                            max_array_len, max_map_len, max_ext_len))
+                continue
+            try:
+                result.append(unpack_buffer(&ctx, packed, max_str_len, max_bin_len,
+                                            max_array_len, max_map_len, max_ext_len))
+            except Exception as e:
+                if mode == 2:
+                    result.append(e)
+    finally:
+        unpack_free_tables(&ctx.user)
+    return result
+
+
+cdef struct offset_list:
+    uint64_t* items
+    Py_ssize_t len
+    Py_ssize_t cap
+
+
+cdef int scan_objects(offset_list* offs, const char* buf, Py_ssize_t* head,
+                      Py_ssize_t tail, uint64_t base, unsigned int max_depth) except -1:
+    # Append the offsets of the complete objects in buf[head:tail] and move
+    # head past them.  Returns 0 when an incomplete object is left, else 1.
+    cdef const unsigned char* end
+    cdef uint64_t* items
+    cdef int ret
+    while head[0] < tail:
+        ret = unpack_skip_objects(<const unsigned char*>buf + head[0],
+                                  <const unsigned char*>buf + tail, &end, 1, 0, max_depth)
+        if ret == 0:
+            return 0
+        if ret == -1:
+            raise MemoryError
+        if ret == -2:
+            raise FormatError
+        if ret == -3:
+            raise StackError
+        if offs.len == offs.cap:
+            items = <uint64_t*>PyMem_Realloc(offs.items, max(offs.cap * 2, 1024) * sizeof(uint64_t))
+            if items == NULL:
+                raise MemoryError
+            offs.items = items
+            offs.cap = max(offs.cap * 2, 1024)
+        offs.items[offs.len] = base + head[0]
+        offs.len += 1
+        head[0] = <const char*>end - buf
+    return 1
+
+
+def scan_offsets(object data, *, Py_ssize_t read_size=64*1024,
+                 Py_ssize_t max_depth=DEFAULT_MAX_DEPTH):
+    """
+    Return the offsets of the objects in *data* as ``array('Q')``.
+
+    *data* is a buffer of concatenated msgpack objects, or a binary file of
+    them read with ``data.read(read_size)`` from its current position.
+    Offsets in a file count from its start when it has ``tell()``, so they
+    can be passed to :meth:`Unpacker.seek`.
+
+    Objects are skipped over without being unpacked, so only their framing
+    is checked.  Containers may be nested *max_depth* deep, as in
+    :class:`Unpacker`.
+
+    Raises ``ValueError`` when the last object is incomplete.
+    Raises ``FormatError`` when *data* is not valid msgpack.
+    Raises ``StackError`` when *data* contains too nested.
+    """
+    cdef offset_list offs
+    cdef Py_buffer view
+    cdef char* buf = NULL
+    cdef char* chunk
+    cdef Py_ssize_t buf_len, chunk_len, want
+    cdef Py_ssize_t head = 0, tail = 0, size = 0
+    cdef uint64_t base = 0
+    cdef int ret = 1
+    cdef carray.array result
+
+    if read_size <= 0:
+        raise ValueError("read_size must be positive")
+    if not 0 < max_depth <= UINT_MAX:
+        raise ValueError("max_depth must be between 1 and %d" % UINT_MAX)
+    offs.items = NULL
+    offs.len = offs.cap = 0
+    try:
+        if not hasattr(data, "read"):
+            get_data_from_buffer(data, &view, &chunk, &chunk_len)
+            try:
+                ret = scan_objects(&offs, chunk, &head, chunk_len, 0, max_depth)
+            finally:
+                PyBuffer_Release(&view)
+        else:
+            read = data.read
+            try:
+                base = data.tell()
+            except (AttributeError, OSError):
+                base = 0
+            want = read_size
+            while True:
+                next_bytes = read(want)
+                if not next_bytes:
+                    break
+                PyBytes_AsStringAndSize(next_bytes, &chunk, &chunk_len)
+                if head > 0:
+                    memmove(buf, buf + head, tail - head)
+                    base += head
+                    tail -= head
+                    head = 0
+                if tail + chunk_len > size:
+                    size = max(tail + chunk_len, size * 2)
+                    chunk = <char*>PyMem_Realloc(buf, size)
+                    if chunk == NULL:
+                        raise MemoryError
+                    buf = chunk
+                    PyBytes_AsStringAndSize(next_bytes, &chunk, &chunk_len)
+                memcpy(buf + tail, chunk, chunk_len)
+                tail += chunk_len
+                ret = scan_objects(&offs, buf, &head, tail, base, max_depth)
+                # Read a large incomplete object in growing chunks, so that
+                # it is not scanned again for every chunk.
+                want = read_size if ret else max(read_size, tail - head)
+        if ret == 0:
+            raise ValueError("Unpack failed: incomplete input")
+        result = carray.clone(array.array("Q"), offs.len, False)
+        if offs.len:
+            memcpy(result.data.as_ulonglongs, offs.items, offs.len * sizeof(uint64_t))
+        return result
+    finally:
+        PyMem_Free(offs.items)
+        PyMem_Free(buf)
+
+
 cdef class Unpacker:
     """Streaming unpacker.
 
@@ -219,6 +579,8 @@ cdef class Unpacker:
     :param file_like:
         File-like object having `.read(n)` method.
         If specified, unpacker reads serialized data from it and `.feed()` is not usable.
+        When it has `.readinto(b)`, or is a socket with `.recv_into(b)`, data is
+        read directly into the internal buffer instead.
 
     :param int read_size:
         Used as `file_like.read(read_size)`. Must be equal to or smaller than *max_buffer_size*.
@@ -238,6 +600,7 @@ cdef class Unpacker:
             1 - float  (Seconds from the EPOCH)
             2 - int  (Nanoseconds from the EPOCH)
             3 - datetime.datetime  (UTC).
+            4 - datetime.datetime  (naive, in UTC).
 
     :param bool strict_map_key:
         If true (default), only str or bytes are accepted for map (dict) keys.
@@ -257,6 +620,40 @@ cdef class Unpacker:
         This option should be used only when you have msgpack data which
         contains invalid UTF-8 string.
 
+    :param schema:
+        A dataclass or NamedTuple type.  When specified, top-level maps are
+        decoded directly into instances of it, matching keys to field names,
+        and arrays are decoded positionally.  Fields annotated with other
+        dataclasses or NamedTuples (or ``list[...]`` of them) are decoded
+        the same way.  Unknown keys are ignored, missing fields take their
+        defaults, and values which don't match a simple annotation (like
+        ``int``, ``str`` or ``Optional[float]``) raise ``ValueError``, as
+        do arrays with more items than fields and top-level values which
+        are neither maps nor arrays.
+        *object_hook* is not called for these maps.
+
+    :param int ndarray_ext_code:
+        Ext type code of NumPy arrays packed with the same option of
+        :class:`Packer`.  They are unpacked as read-only arrays.  With
+        :func:`unpackb` they view the input buffer without copying.
+        Requires NumPy.  (default: None, disabled)
+
+    :param bool bin_as_view:
+        If true, unpack msgpack bin to ``memoryview`` slices of the input
+        instead of copying them into ``bytes``.  The views keep the input
+        alive, and see changes made to it afterwards.  Implies *zero_copy*.
+        (default: False)
+
+    :param bool zero_copy:
+        If true, the Unpacker keeps a reference to the data passed to
+        :meth:`feed` and unpacks it in place instead of copying it into its
+        internal buffer, unless an incomplete object is left from the
+        previous data.  Use it to unpack a large ``mmap`` or other read-only
+        buffer; it must not change while the Unpacker uses it.
+        With *file_like*, which must then be a regular file, the file is
+        memory mapped and unpacked from its current position to its end.
+        (default: False)
+
     :param int max_buffer_size:
         Limits size of data waiting unpacked.  0 means 2**32-1.
         The default value is 100*1024*1024 (100MiB).
@@ -283,6 +680,39 @@ cdef class Unpacker:
         Deprecated, use *max_buffer_size* instead.
         Limits max size of ext type.  (default: max_buffer_size)
 
+    :param int max_depth:
+        Limits how deep arrays and maps can be nested.  Deeper data raises
+        ``StackError``.  (default: 1024)
+
+    :param int key_cache:
+        Number of decoded ``str`` map keys kept to be reused.  A key found
+        in the cache is not decoded again, so unpacking many maps with the
+        same keys gets faster.  Only ASCII keys up to 64 bytes are cached.
+        0 disables the cache.  (default: 256)
+
+    :param bool intern_keys:
+        If true, ``str`` map keys are interned with :func:`sys.intern`.
+        (default: True)
+
+    :param map_records:
+        Unpack maps whose keys are all ``str`` to records instead of dicts.
+        ``"tuple"`` unpacks them to tuples of their values, and
+        ``"namedtuple"`` to namedtuples with their keys as fields (renamed
+        when they are not valid field names).  A callable is called once
+        for each sequence of keys (shape) with the tuple of keys, and must
+        return the constructor to call with the values of the maps of this
+        shape, like a record class.  Shapes are kept for the lifetime of
+        the Unpacker, up to a limit on their number (maps of new shapes
+        are then unpacked to dicts).  Mutually exclusive with *object_hook*,
+        *object_pairs_hook* and *schema*.  (default: None)
+
+    :param int dedup_values:
+        Number of unpacked values kept to be shared.  A ``str`` (only ASCII)
+        or ``bytes`` value up to 64 bytes equal to one of them is not created
+        again, and neither is a tuple (with *use_list=False*) of up to 8
+        items holding the same objects.  Use it to save memory when
+        unpacking many repeated values.  0 disables it.  (default: 0)
+
     Example of streaming deserialize from file-like object::
 
         unpacker = Unpacker(file_like)
@@ -313,17 +743,30 @@ cdef class Unpacker:
     cdef Py_ssize_t buf_size, buf_head, buf_tail
     cdef object file_like
     cdef object file_like_read
+    cdef object file_like_readinto  # readinto or recv_into, or None
+    cdef object seekable  # file_like, kept after EOF so that seek() can go back
     cdef Py_ssize_t read_size
     # To maintain refcnt.
     cdef object object_hook, object_pairs_hook, list_hook, ext_hook
     cdef object unicode_errors
+    cdef object schema_plan
+    cdef object shapes  # kept alive for ctx.user.shapes
+    cdef object input_view  # fed data, in zero_copy mode
+    cdef object write_view  # returned by get_buffer(), until buffer_updated()
+    cdef Py_ssize_t write_len  # length of the free space exported by __getbuffer__
+    cdef Py_ssize_t exports  # number of exported buffers
+    cdef bint zero_copy
+    cdef bint mapped  # input_view maps the file given as file_like
     cdef Py_ssize_t max_buffer_size
     cdef uint64_t stream_offset
     cdef bint _unpacking
 
     def __dealloc__(self):
         unpack_clear(&self.ctx)
-        PyMem_Free(self.buf)
+        unpack_free_tables(&self.ctx.user)
+        # Exported buffers keep the Unpacker alive, so nothing uses self.buf.
+        if not self.zero_copy:
+            PyMem_Free(self.buf)
         self.buf = NULL
 
     @cython.critical_section
@@ -336,25 +779,63 @@ cdef class Unpacker:
                  Py_ssize_t max_bin_len=-1,
                  Py_ssize_t max_array_len=-1,
                  Py_ssize_t max_map_len=-1,
-                 Py_ssize_t max_ext_len=-1):
+                 Py_ssize_t max_ext_len=-1,
+                 Py_ssize_t max_depth=DEFAULT_MAX_DEPTH,
+                 object schema=None,
+                 object ndarray_ext_code=None,
+                 bint bin_as_view=False,
+                 bint zero_copy=False,
+                 Py_ssize_t key_cache=DEFAULT_KEY_CACHE,
+                 bint intern_keys=True,
+                 Py_ssize_t dedup_values=0,
+                 object map_records=None):
         cdef const char *cerr=NULL
+        cdef object mapping = None
+        cdef Py_ssize_t start = 0
 
         unpack_clear(&self.ctx)
+        unpack_free_tables(&self.ctx.user)
         unpack_init(&self.ctx)
+        self.release_write_view()
+        self.check_exports()
+        if self.zero_copy:
+            # self.buf points into input_view.
+            self.buf = NULL
+            self.input_view = None
         if self.buf != NULL:
             PyMem_Free(self.buf)
             self.buf = NULL
+        self.zero_copy = False
+        self.mapped = False
+
+        if bin_as_view:
+            zero_copy = True
+        if zero_copy and file_like is not None:
+            mapping = map_file(file_like)
+            if mapping is None:
+                raise ValueError("zero_copy and bin_as_view require file_like to be a regular file")
+            start = file_like.tell()
+            file_like = None
 
         self.object_hook = object_hook
         self.object_pairs_hook = object_pairs_hook
         self.list_hook = list_hook
         self.ext_hook = ext_hook
+        self.schema_plan = None if schema is None else compile_schema(schema)
 
         self.file_like = file_like
+        self.seekable = None
+        self.file_like_readinto = None
         if file_like:
-            self.file_like_read = file_like.read
-            if not PyCallable_Check(self.file_like_read):
-                raise TypeError("`file_like.read` must be a callable.")
+            self.file_like_readinto = file_readinto(file_like)
+            if self.file_like_readinto is not None:
+                self.file_like_read = getattr(file_like, "read", None)
+            else:
+                self.file_like_read = file_like.read
+                if not PyCallable_Check(self.file_like_read):
+                    raise TypeError("`file_like.read` must be a callable.")
+            if hasattr(file_like, "seek"):
+                self.seekable = file_like
 
         if not max_buffer_size:
             max_buffer_size = INT_MAX
@@ -376,10 +857,13 @@ cdef class Unpacker:
 
         self.max_buffer_size = max_buffer_size
         self.read_size = read_size
-        self.buf = <char*>PyMem_Malloc(read_size)
-        if self.buf == NULL:
-            raise MemoryError("Unable to allocate internal buffer.")
-        self.buf_size = read_size
+        if zero_copy:
+            self.buf_size = 0
+        else:
+            self.buf = <char*>PyMem_Malloc(read_size)
+            if self.buf == NULL:
+                raise MemoryError("Unable to allocate internal buffer.")
+            self.buf_size = read_size
         self.buf_head = 0
         self.buf_tail = 0
         self.stream_offset = 0
@@ -392,7 +876,22 @@ cdef class Unpacker:
         init_ctx(&self.ctx, object_hook, object_pairs_hook, list_hook,
                  ext_hook, use_list, raw, timestamp, strict_map_key, cerr,
                  max_str_len, max_bin_len, max_array_len,
-                 max_map_len, max_ext_len)
+                 max_map_len, max_ext_len, self.schema_plan, ndarray_ext_code, max_depth,
+                 intern_keys)
+        if key_cache < 0:
+            raise ValueError("key_cache must be non-negative")
+        if dedup_values < 0:
+            raise ValueError("dedup_values must be non-negative")
+        unpack_alloc_tables(&self.ctx.user, key_cache, dedup_values)
+        self.shapes = init_shapes(&self.ctx, map_records)
+        self.ctx.user.bin_as_view = bin_as_view
+        self.zero_copy = zero_copy
+        if mapping is not None:
+            # A mapped file does not take memory, so it is not limited
+            # by max_buffer_size.
+            self.set_input(mapping, False)
+            self.buf_head = min(start, self.buf_tail)
+            self.mapped = True
 
     @cython.critical_section
     def feed(self, object next_bytes):
@@ -406,17 +905,122 @@ cdef class Unpacker:
                 "Unpacker.feed() cannot be called while unpacking is in progress"
             )
 
-        if self.file_like is not None:
+        if self.file_like is not None or self.mapped:
             raise AssertionError(
                     "unpacker.feed() is not be able to use with `file_like`.")
 
+        if self.zero_copy:
+            self.set_input(next_bytes)
+            return
+
         get_data_from_buffer(next_bytes, &pybuff, &buf, &buf_len)
         try:
             self.append_buffer(buf, buf_len)
         finally:
             PyBuffer_Release(&pybuff)
 
-    cdef append_buffer(self, void* _buf, Py_ssize_t _buf_len):
+    @cython.critical_section
+    def get_buffer(self, Py_ssize_t sizehint=-1):
+        """Return a writable memoryview of the free space of the internal buffer.
+
+        Write received data into it, e.g. with ``sock.recv_into()``, then call
+        :meth:`buffer_updated` with the number of bytes written.  This is
+        `feed()` without copying, with the interface of
+        ``asyncio.BufferedProtocol``.  The view is at least *sizehint* bytes
+        long (*read_size* when it is not positive), unless *max_buffer_size*
+        allows less.  It is released by ``buffer_updated()`` and by the next
+        call to ``get_buffer()`` or ``feed()``, which raise ``BufferError``
+        while a slice of it is still in use.
+
+        Raises ``BufferFull`` when the buffer already holds *max_buffer_size*
+        bytes.
+        """
+        cdef Py_ssize_t remains = self.max_buffer_size - (self.buf_tail - self.buf_head)
+        cdef Py_ssize_t n
+
+        if self._unpacking:
+            raise RuntimeError(
+                "Unpacker.get_buffer() cannot be called while unpacking is in progress"
+            )
+        if self.file_like is not None or self.zero_copy:
+            raise AssertionError(
+                "unpacker.get_buffer() can not be used with `file_like` or `zero_copy`.")
+        if remains <= 0:
+            raise BufferFull
+
+        n = min(sizehint if sizehint > 0 else self.read_size, remains)
+        self.reserve_buffer(n)
+        self.write_view = self.tail_view(min(self.buf_size - self.buf_tail, remains))
+        return self.write_view
+
+    @cython.critical_section
+    def buffer_updated(self, Py_ssize_t nbytes):
+        """Tell that *nbytes* bytes were written to the view returned by
+        :meth:`get_buffer`, and append them to the data to unpack."""
+        if self.write_view is None:
+            raise ValueError("buffer_updated() called without get_buffer()")
+        if not 0 <= nbytes <= len(self.write_view):
+            raise ValueError(
+                "nbytes must be between 0 and %d, got %d" % (len(self.write_view), nbytes))
+        self.release_write_view()
+        self.buf_tail += nbytes
+
+    cdef int release_write_view(self) except -1:
+        # Release the view returned by get_buffer().  Its slices are still
+        # counted by self.exports until they are released too.
+        if self.write_view is not None:
+            try:
+                self.write_view.release()
+            except BufferError:
+                pass  # Exported in turn; released with its last export.
+            self.write_view = None
+        return 0
+
+    cdef int check_exports(self) except -1:
+        if self.exports > 0:
+            raise BufferError("Existing exports of data: Unpacker cannot be changed")
+        return 0
+
+    cdef object tail_view(self, Py_ssize_t n):
+        # Writable memoryview of n bytes at buf_tail, counted in self.exports.
+        self.write_len = n
+        try:
+            return memoryview(self)
+        finally:
+            self.write_len = 0
+
+    @cython.critical_section
+    def __getbuffer__(self, Py_buffer *buffer, int flags):
+        # Only tail_view() exports the internal buffer; otherwise the view is empty.
+        PyBuffer_FillInfo(buffer, self, self.buf + self.buf_tail, self.write_len, 0, flags)
+        self.exports += 1
+
+    @cython.critical_section
+    def __releasebuffer__(self, Py_buffer *buffer):
+        self.exports -= 1
+
+    cdef set_input(self, object next_bytes, bint check_size=True):
+        # Unpack from next_bytes in place, after what is left of the previous input.
+        cdef object view = byte_view(next_bytes)
+        cdef Py_ssize_t pending = self.buf_tail - self.buf_head
+        cdef Py_ssize_t view_len = len(view)
+        cdef object data
+
+        if check_size and pending + view_len > self.max_buffer_size:
+            raise BufferFull
+        if pending:
+            data = PyBytes_FromStringAndSize(NULL, pending + view_len)
+            memcpy(PyBytes_AS_STRING(data), self.buf + self.buf_head, pending)
+            memcpy(PyBytes_AS_STRING(data) + pending, PyMemoryView_GET_BUFFER(view).buf, view_len)
+            view = PyMemoryView_FromObject(data)
+        self.input_view = view
+        self.buf = <char*>PyMemoryView_GET_BUFFER(view).buf
+        self.buf_head = 0
+        self.buf_tail = self.buf_size = pending + view_len
+        self.ctx.user.buffer = <PyObject*>view
+
+    cdef int reserve_buffer(self, Py_ssize_t n) except -1:
+        # Make room for n bytes at buf_tail.
         cdef:
             char* buf = self.buf
             char* new_buf
@@ -425,15 +1029,17 @@ cdef class Unpacker:
             Py_ssize_t buf_size = self.buf_size
             Py_ssize_t new_size
 
-        if tail + _buf_len > buf_size:
-            if ((tail - head) + _buf_len) <= buf_size:
+        self.release_write_view()
+        self.check_exports()
+        if tail + n > buf_size:
+            if ((tail - head) + n) <= buf_size:
                 # move to front.
                 memmove(buf, buf + head, tail - head)
                 tail -= head
                 head = 0
             else:
                 # expand buffer.
-                new_size = (tail-head) + _buf_len
+                new_size = (tail-head) + n
                 if new_size > self.max_buffer_size:
                     raise BufferFull
                 new_size = min(new_size*2, self.max_buffer_size)
@@ -450,22 +1056,56 @@ cdef class Unpacker:
                 tail -= head
                 head = 0
 
-        memcpy(buf + tail, <char*>(_buf), _buf_len)
         self.buf = buf
         self.buf_head = head
         self.buf_size = buf_size
-        self.buf_tail = tail + _buf_len
+        self.buf_tail = tail
+        return 0
+
+    cdef append_buffer(self, void* _buf, Py_ssize_t _buf_len):
+        self.reserve_buffer(_buf_len)
+        memcpy(self.buf + self.buf_tail, <char*>(_buf), _buf_len)
+        self.buf_tail += _buf_len
 
     cdef int read_from_file(self) except -1:
         cdef Py_ssize_t remains = self.max_buffer_size - (self.buf_tail - self.buf_head)
+        cdef Py_ssize_t n, nread
         if remains <= 0:
             raise BufferFull
 
-        next_bytes = self.file_like_read(min(self.read_size, remains))
-        if next_bytes:
-            self.append_buffer(PyBytes_AsString(next_bytes), PyBytes_Size(next_bytes))
-        else:
+        n = min(self.read_size, remains)
+        if self.file_like_readinto is None:
+            next_bytes = self.file_like_read(n)
+            if next_bytes:
+                self.append_buffer(PyBytes_AsString(next_bytes), PyBytes_Size(next_bytes))
+            else:
+                self.file_like = None
+            return 0
+
+        # Read into the buffer directly.  The view is released afterwards;
+        # the buffer is not moved while file_like keeps an export of it.
+        self.reserve_buffer(n)
+        view = self.tail_view(n)
+        try:
+            ret = self.file_like_readinto(view)
+        except NotImplementedError:
+            if self.file_like_read is None:
+                raise
+            self.file_like_readinto = None
+        finally:
+            try:
+                view.release()
+            except BufferError:
+                pass
+        if self.file_like_readinto is None:
+            return self.read_from_file()
+        if not ret:
             self.file_like = None
+            return 0
+        nread = ret
+        if not 0 < nread <= n:
+            raise ValueError("readinto() returned %d for a buffer of %d bytes" % (nread, n))
+        self.buf_tail += nread
         return 0
 
     cdef object _unpack(self, execute_fn execute, bint iter=0):
@@ -514,7 +1154,12 @@ cdef class Unpacker:
         ret = PyBytes_FromStringAndSize(self.buf + self.buf_head, nread)
         self.buf_head += nread
         if nread < nbytes and self.file_like is not None:
-            ret += self.file_like.read(nbytes - nread)
+            if self.file_like_read is not None:
+                ret += self.file_like_read(nbytes - nread)
+            else:
+                data = bytearray(nbytes - nread)
+                del data[self.file_like_readinto(data) or 0:]
+                ret += data
             nread = len(ret)
         self.stream_offset += nread
         return ret
@@ -527,6 +1172,109 @@ cdef class Unpacker:
         """
         return self._unpack(unpack_construct)
 
+    cdef list _unpack_many(self, Py_ssize_t max_objects, Py_ssize_t max_bytes):
+        cdef list objs = []
+        cdef int ret
+        cdef Py_ssize_t prev_head = self.buf_head
+        cdef uint64_t prev_offset = self.stream_offset
+        cdef uint64_t start = self.stream_offset
+
+        self._unpacking = True
+        try:
+            while len(objs) < max_objects and <Py_ssize_t>(self.stream_offset - start) < max_bytes:
+                prev_head = self.buf_head
+                prev_offset = self.stream_offset
+                if prev_head < self.buf_tail:
+                    ret = unpack_construct(&self.ctx, self.buf, self.buf_tail, &self.buf_head)
+                    self.stream_offset += self.buf_head - prev_head
+                else:
+                    ret = 0
+
+                if ret == 1:
+                    objs.append(unpack_data(&self.ctx))
+                    unpack_init(&self.ctx)
+                    continue
+                if ret == 0:
+                    # The file is read only when nothing is buffered, so
+                    # that a failing object can be rewound below.
+                    if objs or self.file_like is None:
+                        break
+                    self.read_from_file()
+                    continue
+
+                unpack_clear(&self.ctx)
+                if ret == -2:
+                    raise FormatError
+                elif ret == -3:
+                    raise StackError
+                else:
+                    raise ValueError("Unpack failed: error = %d" % (ret,))
+        except Exception:
+            if not objs:
+                raise
+            # Return what was unpacked, and leave the error to the next call.
+            # The failing object started at prev_head since the buffer isn't
+            # refilled once objs is not empty.
+            unpack_clear(&self.ctx)
+            self.buf_head = prev_head
+            self.stream_offset = prev_offset
+        finally:
+            self._unpacking = False
+        return objs
+
+    @cython.critical_section
+    def unpack_many(self, max_objects=None, max_bytes=None):
+        """Unpack the complete objects held by the buffer in one call.
+
+        Stops after *max_objects* objects, or once the objects unpacked
+        take *max_bytes* bytes of input or more.  With *file_like*, it is
+        read only when no complete object is buffered, so fewer objects
+        can be returned before the end of the file.
+
+        Returns an empty list when there are no more objects.  When an
+        object can't be unpacked, the objects before it are returned and
+        the error is raised by the next call.
+        """
+        cdef Py_ssize_t n = PY_SSIZE_T_MAX, nbytes = PY_SSIZE_T_MAX
+        if max_objects is not None:
+            n = max_objects
+            if n < 0:
+                raise ValueError("max_objects must be >= 0")
+        if max_bytes is not None:
+            nbytes = max_bytes
+            if nbytes < 0:
+                raise ValueError("max_bytes must be >= 0")
+        return self._unpack_many(n, nbytes)
+
+    def iter_batches(self, Py_ssize_t size):
+        """Iterate over lists of *size* unpacked objects, with a shorter
+        last list when there are no more objects.
+
+        Like iterating over the Unpacker, but unpacks the objects of a
+        batch with :meth:`unpack_many`.
+        """
+        if size < 1:
+            raise ValueError("size must be >= 1")
+        batch = []
+        while True:
+            try:
+                objs = self.unpack_many(size - len(batch))
+            except Exception:
+                if batch:
+                    yield batch
+                raise
+            if not objs:
+                if batch:
+                    yield batch
+                return
+            if batch:
+                batch += objs
+            else:
+                batch = objs
+            if len(batch) == size:
+                yield batch
+                batch = []
+
     @cython.critical_section
     def skip(self):
         """Read and ignore one object, returning None
@@ -561,6 +1309,39 @@ cdef class Unpacker:
         """
         return self.stream_offset
 
+    @cython.critical_section
+    def seek(self, offset):
+        """Move to *offset* in *file_like* and discard buffered data.
+
+        *offset* is passed to ``file_like.seek()`` and :meth:`tell` returns
+        it afterwards.  With offsets from :func:`scan_offsets`, the N-th
+        object of a file can be read without reading the ones before it.
+
+        Raises ``io.UnsupportedOperation`` when *file_like* has no ``seek()``.
+        """
+        if self._unpacking:
+            raise RuntimeError(
+                "Unpacker.seek() cannot be called while unpacking is in progress"
+            )
+        if self.mapped:
+            if offset < 0:
+                raise ValueError("negative seek position %r" % (offset,))
+            unpack_clear(&self.ctx)
+            self.buf_head = min(offset, self.buf_tail)
+            self.stream_offset = offset
+            return
+        if self.seekable is None:
+            raise UnsupportedOperation("Unpacker.seek() requires a seekable file_like")
+        if offset < 0:
+            raise ValueError("negative seek position %r" % (offset,))
+        self.seekable.seek(offset)
+        # An object unpacked partially before is abandoned.
+        unpack_clear(&self.ctx)
+        self.file_like = self.seekable
+        self.buf_head = 0
+        self.buf_tail = 0
+        self.stream_offset = offset
+
     def __iter__(self):
         return self
 
@@ -574,3 +1355,218 @@ cdef class Unpacker:
 
     #def _off(self):
     #    return self.buf_head
+
+
+cdef class LazyReader:
+    """Random access to the objects of a packed message, for unpackb_lazy().
+
+    See msgpack/_lazy.py for the interface.
+    """
+    cdef unpack_context ctx
+    cdef Py_buffer view
+    cdef bint has_view
+    cdef char* buf
+    cdef Py_ssize_t buf_len
+    # To maintain refcnt.
+    cdef object map_type, list_type, ext_hook, unicode_errors
+
+    def __dealloc__(self):
+        unpack_clear(&self.ctx)
+        if self.has_view:
+            PyBuffer_Release(&self.view)
+
+    def __init__(self, object packed, object map_type, object list_type, *,
+                 bint raw=False, int timestamp=0, bint strict_map_key=True,
+                 unicode_errors=None, object ext_hook=ExtType):
+        cdef const char* cerr = NULL
+
+        if self.has_view:
+            raise RuntimeError("LazyReader is already initialized")
+        if unicode_errors is not None:
+            self.unicode_errors = unicode_errors
+            cerr = unicode_errors
+        self.map_type = map_type
+        self.list_type = list_type
+        self.ext_hook = ext_hook
+        get_data_from_buffer(packed, &self.view, &self.buf, &self.buf_len)
+        self.has_view = True
+        init_ctx(&self.ctx, None, None, None, ext_hook, True, raw, timestamp,
+                 strict_map_key, cerr, self.buf_len, self.buf_len, self.buf_len,
+                 self.buf_len // 2, self.buf_len)
+
+    cdef int _check(self, int ret) except -1:
+        if ret == 1:
+            return 0
+        unpack_clear(&self.ctx)
+        if ret == 0:
+            raise ValueError("Unpack failed: incomplete input")
+        elif ret == -2:
+            raise FormatError
+        elif ret == -3:
+            raise StackError
+        raise ValueError("Unpack failed: error = %d" % (ret,))
+
+    cdef object _construct(self, Py_ssize_t* off):
+        cdef int ret = 0
+        if 0 <= off[0] < self.buf_len:
+            ret = unpack_construct(&self.ctx, self.buf, self.buf_len, off)
+        self._check(ret)
+        obj = unpack_data(&self.ctx)
+        unpack_init(&self.ctx)
+        return obj
+
+    cdef int _skip(self, Py_ssize_t* off) except -1:
+        cdef int ret = 0
+        if 0 <= off[0] < self.buf_len:
+            ret = unpack_skip(&self.ctx, self.buf, self.buf_len, off)
+        self._check(ret)
+        unpack_init(&self.ctx)
+        return 0
+
+    def get(self, Py_ssize_t off):
+        cdef unsigned char c
+        cdef Py_ssize_t n
+        if not 0 <= off < self.buf_len:
+            raise ValueError("Unpack failed: incomplete input")
+        c = <unsigned char>self.buf[off]
+        if 0x80 <= c <= 0x8f or c == 0xde or c == 0xdf:
+            self._check(read_map_header(&self.ctx, self.buf, self.buf_len, &off))
+            n = unpack_data(&self.ctx)
+            unpack_init(&self.ctx)
+            if n > self.ctx.user.max_map_len:
+                raise ValueError("%d exceeds max_map_len(%d)" % (n, self.ctx.user.max_map_len))
+            return self.map_type(self, off, n)
+        if 0x90 <= c <= 0x9f or c == 0xdc or c == 0xdd:
+            self._check(read_array_header(&self.ctx, self.buf, self.buf_len, &off))
+            n = unpack_data(&self.ctx)
+            unpack_init(&self.ctx)
+            if n > self.ctx.user.max_array_len:
+                raise ValueError("%d exceeds max_array_len(%d)" % (n, self.ctx.user.max_array_len))
+            return self.list_type(self, off, n)
+        return self._construct(&off)
+
+    def index_map(self, Py_ssize_t off, Py_ssize_t n):
+        # Entries are (key offset, value offset) pairs, in a bytes object so
+        # that indexing a map creates no Python object per item.
+        cdef bytes entries = PyBytes_FromStringAndSize(NULL, 2 * n * sizeof(Py_ssize_t))
+        cdef Py_ssize_t* e = <Py_ssize_t*>PyBytes_AS_STRING(entries)
+        cdef unsigned char c
+        cdef Py_ssize_t i
+        for i in range(n):
+            e[2*i] = off
+            c = <unsigned char>self.buf[off] if 0 <= off < self.buf_len else 0
+            if 0xa0 <= c <= 0xbf and off + 1 + (c & 0x1f) < self.buf_len:
+                off += 1 + (c & 0x1f)
+            else:
+                self._skip(&off)
+            e[2*i+1] = off
+            self._skip(&off)
+        return entries, off
+
+    def find(self, bytes entries, key):
+        cdef const Py_ssize_t* e = <const Py_ssize_t*>PyBytes_AS_STRING(entries)
+        cdef Py_ssize_t i = PyBytes_GET_SIZE(entries) // sizeof(Py_ssize_t)
+        cdef Py_ssize_t k, h, n
+        cdef const char* s
+        cdef unsigned char c
+        cdef bint want_str = PyUnicode_CheckExact(key)
+        cdef bint is_str
+        if want_str:
+            # Keys decoded with an error handler may not match their bytes.
+            if self.ctx.user.raw or self.ctx.user.unicode_errors != NULL:
+                return None
+            try:
+                s = PyUnicode_AsUTF8AndSize(key, &n)
+            except UnicodeEncodeError:
+                return None
+        else:
+            s = PyBytes_AS_STRING(key)
+            n = PyBytes_GET_SIZE(key)
+        # Search backwards, since the last of duplicate keys wins.
+        while i > 0:
+            i -= 2
+            k = e[i]
+            c = <unsigned char>self.buf[k]
+            is_str = True
+            if 0xa0 <= c <= 0xbf:
+                h = 1
+            elif c == 0xd9:
+                h = 2
+            elif c == 0xda:
+                h = 3
+            elif c == 0xdb:
+                h = 5
+            else:
+                is_str = False
+                if c == 0xc4:
+                    h = 2
+                elif c == 0xc5:
+                    h = 3
+                elif c == 0xc6:
+                    h = 5
+                else:
+                    continue
+            # str keys are unpacked as bytes when raw=True.
+            if is_str != want_str and not (is_str and self.ctx.user.raw):
+                continue
+            if e[i+1] - k - h == n and memcmp(self.buf + k + h, s, n) == 0:
+                return e[i+1]
+        return -1
+
+    def index_keys(self, bytes entries):
+        cdef const Py_ssize_t* e = <const Py_ssize_t*>PyBytes_AS_STRING(entries)
+        cdef Py_ssize_t n = PyBytes_GET_SIZE(entries) // sizeof(Py_ssize_t)
+        cdef Py_ssize_t i, k
+        cdef dict index = {}
+        for i in range(0, n, 2):
+            k = e[i]
+            key = self._construct(&k)
+            if (self.ctx.user.strict_map_key and not PyUnicode_CheckExact(key)
+                    and not PyBytes_CheckExact(key)):
+                raise ValueError("%.100s is not allowed for map key when strict_map_key=True"
+                                 % type(key).__name__)
+            index[key] = e[i+1]
+        return index
+
+    def index_array(self, Py_ssize_t off, Py_ssize_t n):
+        cdef list offsets = [None] * n
+        cdef Py_ssize_t i
+        for i in range(n):
+            offsets[i] = off
+            self._skip(&off)
+        return offsets, off
+
+    def skip(self, Py_ssize_t off):
+        self._skip(&off)
+        return off
+
+    def extra_data(self, Py_ssize_t off):
+        return PyBytes_FromStringAndSize(self.buf + off, self.buf_len - off)
+
+
+def unpackb_lazy(object packed, *, bint raw=False, int timestamp=0, bint strict_map_key=True,
+                 unicode_errors=None, object ext_hook=ExtType):
+    """
+    Unpack *packed* lazily.
+
+    Maps and arrays are returned as read-only :class:`LazyMap` and
+    :class:`LazyList` proxies over *packed*, which decode their items when
+    they are accessed.  Other objects are returned as by :func:`unpackb`.
+    Reading a few fields of a large message is much faster this way.
+
+    The whole message is checked to be well-formed up front, but errors in
+    items (e.g. invalid UTF-8) are raised only when they are accessed.
+    *packed* is kept alive (and locked if it's a ``bytearray``) while
+    proxies are in use.
+
+    Raises ``ExtraData`` when *packed* contains extra bytes.
+    Raises ``ValueError`` when *packed* is incomplete.
+    Raises ``FormatError`` when *packed* is not valid msgpack.
+    Raises ``StackError`` when *packed* contains too nested.
+
+    See :class:`Unpacker` for options.
+    """
+    reader = LazyReader(packed, LazyMap, LazyList, raw=raw, timestamp=timestamp,
+                        strict_map_key=strict_map_key, unicode_errors=unicode_errors,
+                        ext_hook=ext_hook)
+    return lazy_load(reader)
@@ -1,4 +1,5 @@
 import datetime
+import os
 import struct
 from collections import namedtuple
 
@@ -49,6 +50,8 @@ class Timestamp:
             raise TypeError("nanoseconds must be an integer")
         if not (0 <= nanoseconds < 10**9):
             raise ValueError("nanoseconds must be a non-negative integer less than 999999999.")
+        if not (-(2**63) <= seconds < 2**63):
+            raise ValueError("seconds must be a 64-bit signed integer.")
         self.seconds = seconds
         self.nanoseconds = nanoseconds
 
@@ -182,3 +185,11 @@ class Timestamp:
             seconds=delta.days * 86400 + delta.seconds,
             nanoseconds=delta.microseconds * 1000,
         )
+
+
+if not os.environ.get("MSGPACK_PUREPYTHON"):
+    # Use the C implementations, with the same API, when they are available.
+    try:
+        from ._cmsgpack import ExtType, Timestamp  # noqa: F401, F811
+    except ImportError:
+        pass
@@ -1,8 +1,14 @@
 """Fallback pure Python implementation of msgpack"""
 
+import array
+import io
 import struct
 import sys
+import threading
+from datetime import date as _Date
 from datetime import datetime as _DateTime
+from datetime import timezone as _TimeZone
+from io import UnsupportedOperation
 
 if hasattr(sys, "pypy_version_info"):
     from __pypy__ import newlist_hint
@@ -28,6 +34,9 @@ if hasattr(sys, "pypy_version_info"):
         def getvalue(self):
             return self.builder.build()
 
+        def tell(self):
+            return self.builder.getlength()
+
 else:
     from io import BytesIO
 
@@ -37,6 +46,15 @@ else:
         return []
 
 
+from . import _shapes
+from ._lazy import LazyList, LazyMap
+from ._lazy import load as _lazy_load
+from ._mmap import map_file as _map_file
+from ._ndarray import ndarray_type as _ndarray_type
+from ._ndarray import pack_ndarray as _pack_ndarray
+from ._ndarray import unpack_ndarray as _unpack_ndarray
+from ._schema import compile_schema
+from ._select import Selector, compile_select
 from .exceptions import BufferFull, ExtraData, FormatError, OutOfData, StackError
 from .ext import ExtType, Timestamp
 
@@ -53,6 +71,50 @@ TYPE_BIN = 4
 TYPE_EXT = 5
 
 DEFAULT_RECURSE_LIMIT = 1024
+_DEFAULT_TYPES_LIMIT = 256
+
+# Marks record fields not decoded yet, unset slots and missing options.
+_MISSING = object()
+
+# date(1970, 1, 1).toordinal(), for packing dates with naive_utc.
+_EPOCH_ORDINAL = 719163
+
+
+def _object_fields(cls):
+    # Return the names of the fields to pack for instances of *cls*, and
+    # whether they are slots which may be unset.  None when *cls* is not a
+    # dataclass, a NamedTuple or a class using __slots__ which opts in with
+    # __msgpack_slots__.
+    if hasattr(cls, "__dataclass_fields__"):
+        import dataclasses
+
+        return tuple([f.name for f in dataclasses.fields(cls)]), False
+    if issubclass(cls, tuple):
+        fields = getattr(cls, "_fields", None)
+        return (tuple(fields), False) if fields is not None else None
+    if not getattr(cls, "__msgpack_slots__", False):
+        return None
+    names = []
+    for c in reversed(cls.__mro__[:-1]):
+        slots = c.__dict__.get("__slots__")
+        if slots is None or "__dict__" in c.__dict__:
+            return None  # instances have a __dict__
+        if isinstance(slots, str):
+            slots = (slots,)
+        for name in slots:
+            if name == "__weakref__":
+                continue
+            if name.startswith("__") and not name.endswith("__"):
+                name = "_%s%s" % (c.__name__.lstrip("_"), name)
+            names.append(name)
+    return (tuple(names), True) if names else None
+
+
+def _type_names(t):
+    # "int" or "int | NoneType", for error messages.
+    if isinstance(t, tuple):
+        return " | ".join(x.__name__ for x in t)
+    return t.__name__
 
 
 def _check_type_strict(obj, t, type=type, tuple=tuple):
@@ -62,6 +124,17 @@ def _check_type_strict(obj, t, type=type, tuple=tuple):
         return type(obj) is t
 
 
+def _file_readinto(file_like):
+    # readinto() or recv_into() of file_like, or None to use read().
+    readinto = getattr(file_like, "readinto", None)
+    if readinto is None:
+        return getattr(file_like, "recv_into", None)
+    if getattr(type(file_like), "readinto", None) is io.RawIOBase.readinto:
+        # The io.RawIOBase default, which raises NotImplementedError.
+        return None
+    return readinto
+
+
 def _get_data_from_buffer(obj):
     view = memoryview(obj)
     if view.itemsize != 1:
@@ -81,10 +154,28 @@ def unpackb(packed, **kwargs):
 
     See :class:`Unpacker` for options.
     """
+    return _unpackb(packed, None, **kwargs)
+
+
+def _unpackb(packed, shared, *, select=None, **kwargs):
+    # shared is an Unpacker whose dedup_values and map_records tables are
+    # used, or None.
+    if select is not None:
+        if kwargs.get("schema") is not None:
+            raise ValueError("select and schema are mutually exclusive")
+        if kwargs.get("map_records") is not None:
+            raise ValueError("map_records is mutually exclusive with schema and select")
+        select = compile_select(select)
     unpacker = Unpacker(None, max_buffer_size=len(packed), **kwargs)
+    if shared is not None:
+        unpacker._dedup = shared._dedup
+        unpacker._shapes = shared._shapes
     unpacker.feed(packed)
     try:
-        ret = unpacker._unpack()
+        if select is None:
+            ret = unpacker._unpack_object()
+        else:
+            ret = unpacker._unpack_selected(select)
     except OutOfData:
         raise ValueError("Unpack failed: incomplete input")
     except RecursionError:
@@ -94,6 +185,190 @@ def unpackb(packed, **kwargs):
     return ret
 
 
+def unpackb_many(payloads, *, on_error="raise", **kwargs):
+    """
+    Unpack each buffer of the iterable *payloads* with :func:`unpackb` and
+    return the list of objects.
+
+    *on_error* tells what to do when a buffer can't be unpacked:
+    ``"raise"`` (default) raises the exception, ``"skip"`` leaves the
+    buffer out of the result, and ``"collect"`` puts the exception in the
+    result in place of the object, so that it lines up with *payloads*.
+
+    The tables of the *dedup_values* and *map_records* options are shared
+    by all buffers.
+    """
+    if on_error not in ("raise", "skip", "collect"):
+        raise ValueError(f"on_error must be 'raise', 'skip' or 'collect', not {on_error!r}")
+    select = kwargs.get("select")
+    if select is not None:
+        if kwargs.get("schema") is not None:
+            raise ValueError("select and schema are mutually exclusive")
+        if not isinstance(select, Selector):
+            kwargs["select"] = Selector(select)
+        if kwargs.get("map_records") is not None:
+            raise ValueError("map_records is mutually exclusive with schema and select")
+    # Check the other options before unpacking anything.
+    shared = Unpacker(None, **{k: v for k, v in kwargs.items() if k != "select"})
+    result = []
+    for packed in payloads:
+        if on_error == "raise":
+            result.append(_unpackb(packed, shared, **kwargs))
+            continue
+        try:
+            result.append(_unpackb(packed, shared, **kwargs))
+        except Exception as e:
+            if on_error == "collect":
+                result.append(e)
+    return result
+
+
+def scan_offsets(data, *, read_size=64 * 1024, max_depth=1024):
+    """
+    Return the offsets of the objects in *data* as ``array('Q')``.
+
+    *data* is a buffer of concatenated msgpack objects, or a binary file of
+    them read with ``data.read(read_size)`` from its current position.
+    Offsets in a file count from its start when it has ``tell()``, so they
+    can be passed to :meth:`Unpacker.seek`.  Containers may be nested
+    *max_depth* deep, as in :class:`Unpacker`.
+
+    Raises ``ValueError`` when the last object is incomplete.
+    Raises ``FormatError`` when *data* is not valid msgpack.
+    Raises ``StackError`` when *data* contains too nested.
+    """
+    if read_size <= 0:
+        raise ValueError("read_size must be positive")
+    if hasattr(data, "read"):
+        try:
+            base = data.tell()
+        except (AttributeError, OSError):
+            base = 0
+        unpacker = Unpacker(
+            data, read_size=read_size, max_buffer_size=sys.maxsize, max_depth=max_depth
+        )
+    else:
+        base = 0
+        unpacker = Unpacker(None, max_buffer_size=len(data), max_depth=max_depth)
+        unpacker.feed(data)
+    offsets = array.array("Q")
+    while True:
+        offset = unpacker.tell()
+        try:
+            unpacker.skip()
+        except OutOfData:
+            break
+        offsets.append(base + offset)
+    if unpacker._buff_i < len(unpacker._buffer):
+        raise ValueError("Unpack failed: incomplete input")
+    return offsets
+
+
+def unpackb_lazy(
+    packed, *, raw=False, timestamp=0, strict_map_key=True, unicode_errors=None, ext_hook=ExtType
+):
+    """
+    Unpack *packed* lazily.
+
+    Maps and arrays are returned as read-only :class:`LazyMap` and
+    :class:`LazyList` proxies over *packed*, which decode their items when
+    they are accessed.  Other objects are returned as by :func:`unpackb`.
+    Reading a few fields of a large message is much faster this way.
+
+    The whole message is checked to be well-formed up front, but errors in
+    items (e.g. invalid UTF-8) are raised only when they are accessed.
+
+    Raises ``ExtraData`` when *packed* contains extra bytes.
+    Raises ``ValueError`` when *packed* is incomplete.
+    Raises ``FormatError`` when *packed* is not valid msgpack.
+    Raises ``StackError`` when *packed* contains too nested.
+
+    See :class:`Unpacker` for options.
+    """
+    reader = LazyReader(
+        packed,
+        LazyMap,
+        LazyList,
+        raw=raw,
+        timestamp=timestamp,
+        strict_map_key=strict_map_key,
+        unicode_errors=unicode_errors,
+        ext_hook=ext_hook,
+    )
+    return _lazy_load(reader)
+
+
+# Packers reused by packb(), per thread and per option set.
+_packer_pool = threading.local()
+_PACKER_POOL_SIZE = 8
+
+
+def _pool_options(kwargs):
+    # Return the options to match later calls against, or None when they
+    # can't be pooled.  Dicts (type_encoders) are copied by Packer, so a copy
+    # is kept to notice changes; callables are matched by identity, since
+    # they can hold state.
+    options = {}
+    for k, v in kwargs.items():
+        if type(v) is dict:
+            v = dict(v)
+        elif not (v is None or type(v) in (bool, int, float, str) or callable(v)):
+            return None
+        options[k] = v
+    return options
+
+
+def _same_options(options, kwargs):
+    if len(options) != len(kwargs):
+        return False
+    for k, v in options.items():
+        w = kwargs.get(k, _MISSING)
+        if v is w:
+            continue
+        if type(v) is not type(w) or type(v) not in (bool, int, float, str, dict) or v != w:
+            return False
+    return True
+
+
+def packb(o, **kwargs):
+    """
+    Pack object `o` and return packed bytes
+
+    See :class:`Packer` for options.
+    """
+    if kwargs and not kwargs.get("autoreset", True):
+        return Packer(**kwargs).pack(o)
+    pool = getattr(_packer_pool, "packers", None)
+    if pool is None:
+        pool = _packer_pool.packers = []
+    # The pool holds (options, packer) entries.  A slot is None while its
+    # packer is in use, so that nested packb() calls (e.g. from `default`)
+    # don't share it.  Unlike the C Packer, these packers don't keep their
+    # buffer between calls, so they need no retain limit.
+    for i, entry in enumerate(pool):
+        if entry is not None and _same_options(entry[0], kwargs):
+            break
+    else:
+        options = _pool_options(kwargs)
+        if options is None:
+            return Packer(**kwargs).pack(o)
+        entry = (options, Packer(**kwargs))
+        if len(pool) < _PACKER_POOL_SIZE:
+            i = len(pool)
+            pool.append(None)
+        else:
+            for i in range(len(pool) - 1, -1, -1):
+                if pool[i] is not None:
+                    break
+            else:
+                return entry[1].pack(o)
+    pool[i] = None
+    try:
+        return entry[1].pack(o)
+    finally:
+        pool[i] = entry
+
+
 _NO_FORMAT_USED = ""
 _MSGPACK_HEADERS = {
     0xC4: (1, _NO_FORMAT_USED, TYPE_BIN),
@@ -154,6 +429,7 @@ class Unpacker:
             1 - float  (Seconds from the EPOCH)
             2 - int  (Nanoseconds from the EPOCH)
             3 - datetime.datetime  (UTC).
+            4 - datetime.datetime  (naive, in UTC).
 
     :param bool strict_map_key:
         If true (default), only str or bytes are accepted for map (dict) keys.
@@ -173,6 +449,33 @@ class Unpacker:
         This option should be used only when you have msgpack data which
         contains invalid UTF-8 string.
 
+    :param schema:
+        A dataclass or NamedTuple type.  When specified, top-level maps are
+        decoded directly into instances of it, matching keys to field names,
+        and arrays are decoded positionally.  Fields annotated with other
+        dataclasses or NamedTuples (or ``list[...]`` of them) are decoded
+        the same way.  Unknown keys are ignored, missing fields take their
+        defaults, and values which don't match a simple annotation (like
+        ``int``, ``str`` or ``Optional[float]``) raise ``ValueError``, as
+        do arrays with more items than fields and top-level values which
+        are neither maps nor arrays.
+        *object_hook* is not called for these maps.
+
+    :param int ndarray_ext_code:
+        Ext type code of NumPy arrays packed with the same option of
+        :class:`Packer`.  They are unpacked as read-only arrays.  With
+        :func:`unpackb` they view the input buffer without copying.
+        Requires NumPy.  (default: None, disabled)
+
+    :param bool bin_as_view:
+        If true, unpack msgpack bin to ``memoryview`` slices of the input
+        instead of copying them into ``bytes``.  The views keep the input
+        alive, and see changes made to it afterwards.
+        The Unpacker then keeps a reference to the data passed to
+        :meth:`feed` instead of copying it into its internal buffer, unless
+        an incomplete object is left from the previous data.  Can not be
+        used with *file_like*.  (default: False)
+
     :param int max_buffer_size:
         Limits size of data waiting unpacked.  0 means 2**32-1.
         The default value is 100*1024*1024 (100MiB).
@@ -199,6 +502,38 @@ class Unpacker:
         Deprecated, use *max_buffer_size* instead.
         Limits max size of ext type.  (default: max_buffer_size)
 
+    :param int max_depth:
+        Limits how deep arrays and maps can be nested.  Deeper data raises
+        ``StackError``, as does reaching the Python recursion limit.
+        (default: 1024)
+
+    :param int key_cache:
+        Number of decoded ``str`` map keys kept to be reused.
+        This option is used only for C implementation.  (default: 256)
+
+    :param bool intern_keys:
+        If true, ``str`` map keys are interned with :func:`sys.intern`.
+        (default: True)
+
+    :param map_records:
+        Unpack maps whose keys are all ``str`` to records instead of dicts.
+        ``"tuple"`` unpacks them to tuples of their values, and
+        ``"namedtuple"`` to namedtuples with their keys as fields (renamed
+        when they are not valid field names).  A callable is called once
+        for each sequence of keys (shape) with the tuple of keys, and must
+        return the constructor to call with the values of the maps of this
+        shape, like a record class.  Shapes are kept for the lifetime of
+        the Unpacker, up to a limit on their number (maps of new shapes
+        are then unpacked to dicts).  Mutually exclusive with *object_hook*,
+        *object_pairs_hook* and *schema*.  (default: None)
+
+    :param int dedup_values:
+        Number of unpacked values kept to be shared.  A ``str`` or ``bytes``
+        value up to 64 bytes equal to one of them is not created again, and
+        neither is a tuple (with *use_list=False*) of up to 8 items holding
+        the same objects.  Use it to save memory when unpacking many
+        repeated values.  0 disables it.  (default: 0)
+
     Example of streaming deserialize from file-like object::
 
         unpacker = Unpacker(file_like)
@@ -243,14 +578,34 @@ class Unpacker:
         max_array_len=-1,
         max_map_len=-1,
         max_ext_len=-1,
+        max_depth=1024,
+        schema=None,
+        ndarray_ext_code=None,
+        bin_as_view=False,
+        zero_copy=False,
+        key_cache=256,
+        intern_keys=True,
+        dedup_values=0,
+        map_records=None,
     ):
         if unicode_errors is None:
             unicode_errors = "strict"
 
+        self._bin_as_view = bool(bin_as_view)
+        self._zero_copy = bool(zero_copy or bin_as_view)
+        mapping = None
+        if self._zero_copy and file_like is not None:
+            mapping = _map_file(file_like)
+            if mapping is None:
+                raise ValueError("zero_copy and bin_as_view require file_like to be a regular file")
+            start = file_like.tell()
+            file_like = None
+        self._mapped = mapping is not None
         if file_like is None:
             self._feeding = True
         else:
-            if not callable(file_like.read):
+            self._readinto = _file_readinto(file_like)
+            if self._readinto is None and not callable(file_like.read):
                 raise TypeError("`file_like.read` must be callable")
             self.file_like = file_like
             self._feeding = False
@@ -286,12 +641,18 @@ class Unpacker:
         if read_size > self._max_buffer_size:
             raise ValueError("read_size must be smaller than max_buffer_size")
         self._read_size = read_size or min(self._max_buffer_size, 16 * 1024)
+        # Room appended to the buffer to read into, allocated on first use.
+        self._zeros = None
+        # Returned by get_buffer(), until buffer_updated().
+        self._write_view = None
+        # Memory of the last view returned by get_buffer().
+        self._write_buffer = None
         self._raw = bool(raw)
         self._strict_map_key = bool(strict_map_key)
         self._unicode_errors = unicode_errors
         self._use_list = use_list
-        if not (0 <= timestamp <= 3):
-            raise ValueError("timestamp must be 0..3")
+        if not (0 <= timestamp <= 4):
+            raise ValueError("timestamp must be 0..4")
         self._timestamp = timestamp
         self._list_hook = list_hook
         self._object_hook = object_hook
@@ -302,7 +663,23 @@ class Unpacker:
         self._max_array_len = max_array_len
         self._max_map_len = max_map_len
         self._max_ext_len = max_ext_len
+        if max_depth < 1:
+            raise ValueError("max_depth must be positive")
+        self._max_depth = max_depth
+        self._depth = 0
+        if key_cache < 0:
+            raise ValueError("key_cache must be non-negative")
+        self._intern_keys = bool(intern_keys)
+        if dedup_values < 0:
+            raise ValueError("dedup_values must be non-negative")
+        self._dedup_values = dedup_values
+        #: values to share, by themselves or by the ids of their items for tuples.
+        self._dedup = {}
         self._stream_offset = 0
+        self._schema = None if schema is None else compile_schema(schema)
+        if ndarray_ext_code is not None:
+            _ndarray_type(ndarray_ext_code)
+        self._ndarray_ext_code = ndarray_ext_code
 
         if list_hook is not None and not callable(list_hook):
             raise TypeError("`list_hook` is not callable")
@@ -314,10 +691,30 @@ class Unpacker:
             raise TypeError("object_pairs_hook and object_hook are mutually exclusive")
         if not callable(ext_hook):
             raise TypeError("`ext_hook` is not callable")
+        #: root shape of the map_records option, or None.
+        self._shapes = None
+        if map_records is not None:
+            if object_hook is not None or object_pairs_hook is not None:
+                raise TypeError(
+                    "map_records and object_hook/object_pairs_hook are mutually exclusive"
+                )
+            if schema is not None:
+                raise ValueError("map_records is mutually exclusive with schema and select")
+            self._shape_mode, self._shape_factory = _shapes.compile_map_records(map_records)
+            self._shapes = _shapes.new_root()
+
+        if mapping is not None:
+            # A mapped file does not take memory, so it is not limited by
+            # max_buffer_size.
+            self._set_input(mapping, check_size=False)
+            self._buff_i = self._buf_checkpoint = min(start, len(mapping))
 
     def feed(self, next_bytes):
-        assert self._feeding
+        assert self._feeding and not self._mapped
+        self._release_write_buffer()
         view = _get_data_from_buffer(next_bytes)
+        if self._zero_copy:
+            return self._set_input(view)
         if len(self._buffer) - self._buff_i + len(view) > self._max_buffer_size:
             raise BufferFull
 
@@ -331,6 +728,62 @@ class Unpacker:
         self._buffer.extend(view if view.contiguous else view.tobytes())
         view.release()
 
+    def get_buffer(self, sizehint=-1):
+        assert self._feeding and not self._zero_copy
+        remains = self._max_buffer_size - (len(self._buffer) - self._buff_i)
+        if remains <= 0:
+            raise BufferFull
+        self._release_write_buffer()
+        # bytearray can't be resized while exported, so data is written
+        # into a separate buffer and appended by buffer_updated().
+        n = min(sizehint if sizehint > 0 else self._read_size, remains)
+        self._write_buffer = bytearray(n)
+        self._write_view = memoryview(self._write_buffer)
+        return self._write_view
+
+    def buffer_updated(self, nbytes):
+        view = self._write_view
+        if view is None:
+            raise ValueError("buffer_updated() called without get_buffer()")
+        if not 0 <= nbytes <= len(view):
+            raise ValueError(f"nbytes must be between 0 and {len(view)}, got {nbytes}")
+        self._write_view = None
+        buffer, self._write_buffer = self._write_buffer, None
+        with view:
+            self.feed(view[:nbytes])
+        # Slices of the view still in use are detected by the next call.
+        self._write_buffer = buffer
+
+    def _release_write_buffer(self):
+        # Like the C Unpacker, raise BufferError rather than dropping what
+        # is written to a slice of a view returned by get_buffer().
+        if self._write_view is not None:
+            try:
+                self._write_view.release()
+            except BufferError:
+                pass  # Exported in turn; checked below.
+            self._write_view = None
+        if self._write_buffer is not None:
+            try:
+                self._write_buffer.clear()
+            except BufferError:
+                raise BufferError("Existing exports of data: Unpacker cannot be changed")
+            self._write_buffer = None
+
+    def _set_input(self, view, check_size=True):
+        # Unpack from view in place, after what is left of the previous input.
+        if not view.c_contiguous:
+            view = memoryview(view.tobytes())
+        elif view.ndim != 1 or view.format != "B":
+            view = view.cast("B")
+        pending = self._buffer[self._buf_checkpoint :]
+        if check_size and len(pending) + len(view) > self._max_buffer_size:
+            raise BufferFull
+        if pending:
+            view = memoryview(bytes(pending) + view)
+        self._buffer = view
+        self._buff_i = self._buf_checkpoint = 0
+
     def _consume(self):
         """Gets rid of the used parts of the buffer."""
         self._stream_offset += self._buff_i - self._buf_checkpoint
@@ -345,7 +798,7 @@ class Unpacker:
     def read_bytes(self, n):
         ret = self._read(n, raise_outofdata=False)
         self._consume()
-        return ret
+        return bytes(ret)
 
     def _read(self, n, raise_outofdata=True):
         # (int) -> bytearray
@@ -378,17 +831,49 @@ class Unpacker:
             raise BufferFull
         while remain_bytes > 0:
             to_read_bytes = max(self._read_size, remain_bytes)
-            read_data = self.file_like.read(to_read_bytes)
-            if not read_data:
+            nread = None
+            if self._readinto is not None:
+                nread = self._read_into_buffer(to_read_bytes)
+            if nread is None:
+                read_data = self.file_like.read(to_read_bytes)
+                if not read_data:
+                    break
+                assert isinstance(read_data, bytes)
+                self._buffer += read_data
+                nread = len(read_data)
+            elif not nread:
                 break
-            assert isinstance(read_data, bytes)
-            self._buffer += read_data
-            remain_bytes -= len(read_data)
+            remain_bytes -= nread
 
         if len(self._buffer) < n + self._buff_i and raise_outofdata:
             self._buff_i = 0  # rollback
             raise OutOfData
 
+    def _read_into_buffer(self, n):
+        # Read up to n bytes from file_like directly at the end of the buffer.
+        # Return None when file_like doesn't implement readinto().
+        buffer = self._buffer
+        end = len(buffer)
+        if self._zeros is None or len(self._zeros) < n:
+            self._zeros = memoryview(bytes(n))
+        buffer += self._zeros[:n]
+        try:
+            with memoryview(buffer)[end:] as view:
+                nread = self._readinto(view) or 0
+            if not 0 <= nread <= n:
+                raise ValueError(f"readinto() returned {nread} for a buffer of {n} bytes")
+        except NotImplementedError:
+            del buffer[end:]
+            if not callable(getattr(self.file_like, "read", None)):
+                raise
+            self._readinto = None
+            return None
+        except BaseException:
+            del buffer[end:]
+            raise
+        del buffer[end + nread :]
+        return nread
+
     def _read_header(self):
         typ = TYPE_IMMEDIATE
         n = 0
@@ -485,7 +970,7 @@ class Unpacker:
             raise FormatError("Unknown header: 0x%x" % b)
         return typ, n, obj
 
-    def _unpack(self, execute=EX_CONSTRUCT):
+    def _unpack(self, execute=EX_CONSTRUCT, plan=None):
         typ, n, obj = self._read_header()
 
         if execute == EX_READ_ARRAY_HEADER:
@@ -496,6 +981,69 @@ class Unpacker:
             if typ != TYPE_MAP:
                 raise ValueError("Expected map")
             return n
+        if typ == TYPE_ARRAY or typ == TYPE_MAP:
+            if self._depth >= self._max_depth:
+                raise StackError
+            self._depth += 1
+            try:
+                return self._unpack_container(execute, typ, n, plan)
+            finally:
+                self._depth -= 1
+        if execute == EX_SKIP:
+            return
+        if typ == TYPE_RAW:
+            if self._raw:
+                obj = bytes(obj)
+            elif self._zero_copy:
+                obj = str(obj, "utf_8", self._unicode_errors)
+            else:
+                obj = obj.decode("utf_8", self._unicode_errors)
+            if self._dedup_values and n <= 64:
+                obj = self._dedup_value(obj, obj)
+            return obj
+        if typ == TYPE_BIN:
+            if self._bin_as_view:
+                return obj
+            obj = bytes(obj)
+            if self._dedup_values and n <= 64:
+                obj = self._dedup_value(obj, obj)
+            return obj
+        if typ == TYPE_EXT:
+            if n == -1:  # timestamp
+                ts = Timestamp.from_bytes(bytes(obj))
+                if self._timestamp == 1:
+                    return ts.to_unix()
+                elif self._timestamp == 2:
+                    return ts.to_unix_nano()
+                elif self._timestamp == 3:
+                    return ts.to_datetime()
+                elif self._timestamp == 4:
+                    return ts.to_datetime().replace(tzinfo=None)
+                else:
+                    return ts
+            elif n == self._ndarray_ext_code:
+                return _unpack_ndarray(obj, 0, len(obj))
+            else:
+                return self._ext_hook(n, bytes(obj))
+        assert typ == TYPE_IMMEDIATE
+        return obj
+
+    def _dedup_value(self, key, obj):
+        dedup = self._dedup
+        found = dedup.get(key)
+        if found is not None:
+            return found
+        if len(dedup) >= self._dedup_values:
+            del dedup[next(iter(dedup))]
+        dedup[key] = obj
+        return obj
+
+    def _unpack_container(self, execute, typ, n, plan):
+        if plan is not None and execute == EX_CONSTRUCT:
+            if len(plan) > 2:
+                return self._unpack_record(typ, n, plan)
+            elif typ != TYPE_ARRAY:
+                plan = None
         # TODO should we eliminate the recursion?
         if typ == TYPE_ARRAY:
             if execute == EX_SKIP:
@@ -504,10 +1052,15 @@ class Unpacker:
                     self._unpack(EX_SKIP)
                 return
             ret = newlist_hint(n)
+            item_plan = None if plan is None else plan[1]
             for i in range(n):
-                ret.append(self._unpack(EX_CONSTRUCT))
+                ret.append(self._unpack(EX_CONSTRUCT, item_plan))
             if self._list_hook is not None:
                 ret = self._list_hook(ret)
+            elif self._dedup_values and not self._use_list and 0 < n <= 8:
+                # Items are compared by identity, not to mix up 1, 1.0 and True.
+                ret = tuple(ret)
+                return self._dedup_value(tuple(map(id, ret)), ret)
             # TODO is the interaction between `list_hook` and `use_list` ok?
             return ret if self._use_list else tuple(ret)
         if typ == TYPE_MAP:
@@ -517,6 +1070,8 @@ class Unpacker:
                     self._unpack(EX_SKIP)
                     self._unpack(EX_SKIP)
                 return
+            if self._shapes is not None:
+                return self._unpack_shape(n)
             if self._object_pairs_hook is not None:
 
                 def _gen():
@@ -533,44 +1088,146 @@ class Unpacker:
                     key = self._unpack(EX_CONSTRUCT)
                     if self._strict_map_key and type(key) not in (str, bytes):
                         raise ValueError("%s is not allowed for map key" % str(type(key)))
-                    if isinstance(key, str):
+                    if self._intern_keys and isinstance(key, str):
                         key = sys.intern(key)
                     ret[key] = self._unpack(EX_CONSTRUCT)
                 if self._object_hook is not None:
                     ret = self._object_hook(ret)
             return ret
-        if execute == EX_SKIP:
-            return
-        if typ == TYPE_RAW:
-            if self._raw:
-                obj = bytes(obj)
+
+    def _unpack_shape(self, n):
+        # Unpack a map with map_records.  See msgpack/_shapes.py.
+        node = self._shapes
+        values = []
+        ret = None
+        for _ in range(n):
+            key = self._unpack(EX_CONSTRUCT)
+            if ret is None:
+                if type(key) is str:
+                    if self._intern_keys:
+                        key = sys.intern(key)
+                    child = _shapes.next_shape(self._shapes, node, key)
+                    if child is not None:
+                        node = child
+                        values.append(self._unpack(EX_CONSTRUCT))
+                        continue
+                # Not a str, or too many shapes: unpack the map into a dict.
+                ret = dict(zip(node[0], values))
+            if self._strict_map_key and type(key) not in (str, bytes):
+                raise ValueError("%s is not allowed for map key" % str(type(key)))
+            ret[key] = self._unpack(EX_CONSTRUCT)
+        if ret is not None:
+            return ret
+        return _shapes.make_record(node, tuple(values), self._shape_mode, self._shape_factory)
+
+    def _unpack_selected(self, node):
+        # See msgpack/_select.py for the node layout.
+        start = self._buff_i
+        typ, n, _ = self._read_header()
+        if typ == TYPE_ARRAY:
+            rest = node[1]
+            if rest is False:
+                for _ in range(n):
+                    self._unpack(EX_SKIP)
+                ret = []
+            elif rest is None:
+                ret = [self._unpack(EX_CONSTRUCT) for _ in range(n)]
             else:
-                obj = obj.decode("utf_8", self._unicode_errors)
-            return obj
-        if typ == TYPE_BIN:
-            return bytes(obj)
-        if typ == TYPE_EXT:
-            if n == -1:  # timestamp
-                ts = Timestamp.from_bytes(bytes(obj))
-                if self._timestamp == 1:
-                    return ts.to_unix()
-                elif self._timestamp == 2:
-                    return ts.to_unix_nano()
-                elif self._timestamp == 3:
-                    return ts.to_datetime()
+                ret = [self._unpack_selected(rest) for _ in range(n)]
+            if self._list_hook is not None:
+                ret = self._list_hook(ret)
+            return ret if self._use_list else tuple(ret)
+        if typ == TYPE_MAP:
+            keys, rest = node
+            pairs = []
+            for _ in range(n):
+                key = self._unpack(EX_CONSTRUCT)
+                sub = keys.get(key, rest)
+                if sub is False:
+                    self._unpack(EX_SKIP)
+                    continue
+                if self._strict_map_key and type(key) not in (str, bytes):
+                    raise ValueError("%s is not allowed for map key" % str(type(key)))
+                if self._intern_keys and isinstance(key, str):
+                    key = sys.intern(key)
+                if sub is None:
+                    pairs.append((key, self._unpack(EX_CONSTRUCT)))
                 else:
-                    return ts
-            else:
-                return self._ext_hook(n, bytes(obj))
-        assert typ == TYPE_IMMEDIATE
+                    pairs.append((key, self._unpack_selected(sub)))
+            if self._object_pairs_hook is not None:
+                return self._object_pairs_hook(pairs)
+            ret = dict(pairs)
+            if self._object_hook is not None:
+                ret = self._object_hook(ret)
+            return ret
+        self._buff_i = start
+        return self._unpack(EX_CONSTRUCT)
+
+    def _unpack_object(self):
+        # Unpack a top-level object, checked against the schema option.
+        obj = self._unpack(EX_CONSTRUCT, self._schema)
+        if self._schema is not None and not isinstance(obj, self._schema[1]):
+            cls = self._schema[1]
+            raise ValueError(
+                f"{cls.__name__}: expected a map or an array, got {type(obj).__name__}"
+            )
         return obj
 
+    def _unpack_record(self, typ, n, plan):
+        # See msgpack/_schema.py for the plan layout.
+        _, cls, index, npositional, kwnames, defaults, factories, types, subplans, names = plan
+        nfields = len(names)
+        if typ == TYPE_ARRAY and n > nfields:
+            raise ValueError(f"{cls.__name__}: expected at most {nfields} items, got {n}")
+        unpack = self._unpack
+        values = [_MISSING] * nfields
+        filled = 0
+        for i in range(n):
+            if typ == TYPE_MAP:
+                key = unpack(EX_CONSTRUCT)
+                if type(key) is not str:
+                    if type(key) is bytes:
+                        key = key.decode("utf_8", "surrogateescape")
+                    elif self._strict_map_key:
+                        raise ValueError("%s is not allowed for map key" % str(type(key)))
+                    else:
+                        key = None
+                pos = index.get(key)
+            else:
+                pos = i
+            if pos is None:
+                unpack(EX_CONSTRUCT)
+                continue
+            value = unpack(EX_CONSTRUCT, subplans[pos])
+            t = types[pos]
+            if t is not None and type(value) is not t and not isinstance(value, t):
+                raise ValueError(
+                    f"{cls.__name__}.{names[pos]}: expected {_type_names(t)}, "
+                    f"got {type(value).__name__}"
+                )
+            if values[pos] is _MISSING:
+                filled += 1
+            values[pos] = value
+
+        if filled < nfields:
+            for i, value in enumerate(values):
+                if value is _MISSING:
+                    if defaults[i] is not None:
+                        values[i] = defaults[i][0]
+                    elif factories[i] is not None:
+                        values[i] = factories[i]()
+                    else:
+                        raise ValueError(f"{cls.__name__}: missing field {names[i]!r}")
+        if kwnames is None:
+            return cls(*values)
+        return cls(*values[:npositional], **dict(zip(kwnames, values[npositional:])))
+
     def __iter__(self):
         return self
 
     def __next__(self):
         try:
-            ret = self._unpack(EX_CONSTRUCT)
+            ret = self._unpack_object()
             self._consume()
             return ret
         except OutOfData:
@@ -590,12 +1247,64 @@ class Unpacker:
 
     def unpack(self):
         try:
-            ret = self._unpack(EX_CONSTRUCT)
+            ret = self._unpack_object()
         except RecursionError:
             raise StackError
         self._consume()
         return ret
 
+    def unpack_many(self, max_objects=None, max_bytes=None):
+        if max_objects is None:
+            max_objects = sys.maxsize
+        elif max_objects < 0:
+            raise ValueError("max_objects must be >= 0")
+        if max_bytes is None:
+            max_bytes = sys.maxsize
+        elif max_bytes < 0:
+            raise ValueError("max_bytes must be >= 0")
+        objs = []
+        start = self._stream_offset
+        while len(objs) < max_objects and self._stream_offset - start < max_bytes:
+            try:
+                obj = self._unpack_object()
+            except OutOfData:
+                self._consume()
+                break
+            except Exception as e:
+                if not objs:
+                    if isinstance(e, RecursionError):
+                        raise StackError
+                    raise
+                # Return what was unpacked, and leave the error to the next call.
+                self._buff_i = self._buf_checkpoint
+                break
+            self._consume()
+            objs.append(obj)
+        return objs
+
+    def iter_batches(self, size):
+        if size < 1:
+            raise ValueError("size must be >= 1")
+        batch = []
+        while True:
+            try:
+                objs = self.unpack_many(size - len(batch))
+            except Exception:
+                if batch:
+                    yield batch
+                raise
+            if not objs:
+                if batch:
+                    yield batch
+                return
+            if batch:
+                batch += objs
+            else:
+                batch = objs
+            if len(batch) == size:
+                yield batch
+                batch = []
+
     def read_array_header(self):
         ret = self._unpack(EX_READ_ARRAY_HEADER)
         self._consume()
@@ -609,6 +1318,96 @@ class Unpacker:
     def tell(self):
         return self._stream_offset
 
+    def seek(self, offset):
+        if self._mapped:
+            if offset < 0:
+                raise ValueError("negative seek position %r" % (offset,))
+            self._buff_i = self._buf_checkpoint = min(offset, len(self._buffer))
+            self._stream_offset = offset
+            return
+        if self._feeding or not hasattr(self.file_like, "seek"):
+            raise UnsupportedOperation("Unpacker.seek() requires a seekable file_like")
+        if offset < 0:
+            raise ValueError("negative seek position %r" % (offset,))
+        self.file_like.seek(offset)
+        self._buffer = bytearray()
+        self._buff_i = self._buf_checkpoint = 0
+        self._stream_offset = offset
+
+
+class LazyReader:
+    """Random access to the objects of a packed message, for unpackb_lazy().
+
+    See msgpack/_lazy.py for the interface.
+    """
+
+    def __init__(self, packed, map_type, list_type, **kwargs):
+        self._unpacker = Unpacker(None, max_buffer_size=len(packed), **kwargs)
+        self._unpacker.feed(packed)
+        self._size = len(self._unpacker._buffer)
+        self._map_type = map_type
+        self._list_type = list_type
+
+    def _unpack(self, off, execute=EX_CONSTRUCT):
+        # Return the object at off and the offset following it.
+        unpacker = self._unpacker
+        if not 0 <= off < self._size:
+            raise ValueError("Unpack failed: incomplete input")
+        unpacker._buff_i = off
+        try:
+            obj = unpacker._unpack(execute)
+        except OutOfData:
+            raise ValueError("Unpack failed: incomplete input")
+        except RecursionError:
+            raise StackError
+        return obj, unpacker._buff_i
+
+    def get(self, off):
+        unpacker = self._unpacker
+        if not 0 <= off < self._size:
+            raise ValueError("Unpack failed: incomplete input")
+        unpacker._buff_i = off
+        try:
+            typ, n, _ = unpacker._read_header()
+        except OutOfData:
+            raise ValueError("Unpack failed: incomplete input")
+        if typ == TYPE_MAP:
+            return self._map_type(self, unpacker._buff_i, n)
+        if typ == TYPE_ARRAY:
+            return self._list_type(self, unpacker._buff_i, n)
+        return self._unpack(off)[0]
+
+    def index_map(self, off, n):
+        # Keys are decoded up front, so the entries are the decoded index.
+        strict_map_key = self._unpacker._strict_map_key
+        index = {}
+        for _ in range(n):
+            key, off = self._unpack(off)
+            if strict_map_key and type(key) not in (str, bytes):
+                raise ValueError("%s is not allowed for map key" % str(type(key)))
+            index[key] = off
+            off = self._unpack(off, EX_SKIP)[1]
+        return index, off
+
+    def find(self, entries, key):
+        return entries.get(key, -1)
+
+    def index_keys(self, entries):
+        return entries
+
+    def index_array(self, off, n):
+        offsets = [None] * n
+        for i in range(n):
+            offsets[i] = off
+            off = self._unpack(off, EX_SKIP)[1]
+        return offsets, off
+
+    def skip(self, off):
+        return self._unpack(off, EX_SKIP)[1]
+
+    def extra_data(self, off):
+        return bytes(self._unpacker._buffer[off:])
+
 
 class Packer:
     """
@@ -651,12 +1450,55 @@ class Packer:
         Note that the tzinfo is stripped in the timestamp.
         You can get UTC datetime with `timestamp=3` option of the Unpacker.
 
+    :param bool naive_utc:
+        If set to true, `datetime` also packs naive datetime as UTC time and
+        datetime.date as midnight UTC, instead of raising ValueError and
+        calling default respectively.  Requires `datetime=True`.
+        You can get naive UTC datetime with `timestamp=4` option of the Unpacker.
+
     :param str unicode_errors:
         The error handler for encoding unicode. (default: 'strict')
         DO NOT USE THIS!!  This option is kept for very specific usage.
 
     :param int buf_size:
         Internal buffer size. This option is used only for C implementation.
+
+    :param float buf_growth:
+        Growth factor of the internal buffer. This option is used only for C implementation.
+
+    :param int buf_retain:
+        Maximum internal buffer capacity kept between messages.
+        This option is used only for C implementation.
+
+    :param dict type_encoders:
+        Mapping from types to callables converting their instances into
+        packable objects, like *default*.  The lookup is by exact type and
+        happens before the builtin types are checked.  Types which turn out
+        to be handled by *default* are remembered the same way.
+
+    :param str pack_objects:
+        If set to ``"map"``, instances of dataclasses, ``NamedTuple`` and
+        classes using ``__slots__`` with a true ``__msgpack_slots__``
+        attribute are packed as maps from field names to values, leaving out
+        unset slots.  If set to ``"array"``, they are packed as arrays of the
+        values in field order, with nil for unset slots.  *type_encoders* and
+        *default* take precedence.  (default: None, disabled)
+
+    :param int key_cache:
+        Maximum number of map keys whose encoded form is cached.  Only keys of
+        exact ``str`` type shorter than 256 bytes are cached.  Disabled when
+        *type_encoders* has an encoder for ``str``. (default: 0, disabled)
+
+    :param bool zero_copy:
+        Pack into a bytes object which is returned without copying.
+        Requires ``autoreset=True``.  This option is used only for C implementation.
+
+    :param int ndarray_ext_code:
+        If set, NumPy arrays (of exact type ``numpy.ndarray``) are packed as
+        ext type with this code, holding their dtype, shape and raw data.
+        The data is written straight from the array.  Arrays of object or
+        structured dtypes are not supported.  Requires NumPy.
+        (default: None, disabled)
     """
 
     def __init__(
@@ -668,19 +1510,61 @@ class Packer:
         use_bin_type=True,
         strict_types=False,
         datetime=False,
+        naive_utc=False,
         unicode_errors=None,
         buf_size=None,
+        buf_growth=2.0,
+        buf_retain=16 * 1024 * 1024,
+        key_cache=0,
+        zero_copy=False,
+        type_encoders=None,
+        pack_objects=None,
+        ndarray_ext_code=None,
     ):
+        if zero_copy and not autoreset:
+            raise ValueError("zero_copy requires autoreset=True")
+        if naive_utc and not datetime:
+            raise ValueError("naive_utc requires datetime=True")
+        if not buf_growth >= 1.0:
+            raise ValueError("buf_growth must be at least 1.0")
+        if buf_retain < 0:
+            raise ValueError("buf_retain must be non-negative")
+        if key_cache < 0:
+            raise ValueError("key_cache must be non-negative")
+        if type_encoders and str in type_encoders:
+            key_cache = 0
+        self._key_cache_size = key_cache
+        self._key_cache = {} if key_cache else None
         self._strict_types = strict_types
         self._use_float = use_single_float
         self._autoreset = autoreset
         self._use_bin_type = use_bin_type
         self._buffer = BytesIO()
         self._datetime = bool(datetime)
+        self._naive_utc = bool(naive_utc)
         self._unicode_errors = unicode_errors or "strict"
         if default is not None and not callable(default):
             raise TypeError("default must be callable")
         self._default = default
+        self._encoders = None
+        if type_encoders:
+            self._encoders = dict(type_encoders)
+            if not all(map(callable, self._encoders.values())):
+                raise TypeError("type_encoders values must be callable")
+        elif default is not None:
+            self._encoders = {}
+        if self._encoders is not None:
+            self._encoders_limit = len(self._encoders) + _DEFAULT_TYPES_LIMIT
+        self._object_plans = None
+        if pack_objects is not None:
+            if pack_objects not in ("map", "array"):
+                raise ValueError("pack_objects must be None, 'map' or 'array'")
+            self._object_plans = {}
+            self._objects_as_map = pack_objects == "map"
+        self._ndarray_type = None
+        if ndarray_ext_code is not None:
+            self._ndarray_type = _ndarray_type(ndarray_ext_code)
+            self._ndarray_ext_code = ndarray_ext_code
 
     def _pack(
         self,
@@ -695,6 +1579,11 @@ class Packer:
             list_types = list
         else:
             list_types = (list, tuple)
+        if self._encoders is not None:
+            encoder = self._encoders.get(type(obj))
+            if encoder is not None:
+                obj = encoder(obj)
+                default_used = True
         while True:
             if nest_limit < 0:
                 raise ValueError("recursion limit exceeded")
@@ -762,26 +1651,27 @@ class Packer:
                     data = obj.data
                 assert isinstance(code, int)
                 assert isinstance(data, bytes)
-                L = len(data)
-                if L == 1:
-                    self._buffer.write(b"\xd4")
-                elif L == 2:
-                    self._buffer.write(b"\xd5")
-                elif L == 4:
-                    self._buffer.write(b"\xd6")
-                elif L == 8:
-                    self._buffer.write(b"\xd7")
-                elif L == 16:
-                    self._buffer.write(b"\xd8")
-                elif L <= 0xFF:
-                    self._buffer.write(struct.pack(">BB", 0xC7, L))
-                elif L <= 0xFFFF:
-                    self._buffer.write(struct.pack(">BH", 0xC8, L))
-                else:
-                    self._buffer.write(struct.pack(">BI", 0xC9, L))
-                self._buffer.write(struct.pack("b", code))
+                self._pack_ext_header(code, len(data))
                 self._buffer.write(data)
                 return
+            if self._ndarray_type is not None and type(obj) is self._ndarray_type:
+                header, data = _pack_ndarray(obj)
+                n = len(header) + data.nbytes
+                if n >= 2**32:
+                    raise ValueError("ndarray is too large")
+                self._pack_ext_header(self._ndarray_ext_code, n)
+                self._buffer.write(header)
+                return self._buffer.write(memoryview(data))
+            if (
+                self._object_plans is not None
+                and type(obj) is not list
+                and type(obj) is not tuple
+                and (default_used or self._default is None or isinstance(obj, tuple))
+                and self._pack_object(obj, nest_limit - 1)
+            ):
+                # This should be before tuple because of NamedTuple.  Other
+                # objects are packed by fields after default has been called.
+                return
             if check(obj, list_types):
                 n = len(obj)
                 self._pack_array_header(n)
@@ -791,12 +1681,25 @@ class Packer:
             if check(obj, dict):
                 return self._pack_map_pairs(len(obj), obj.items(), nest_limit - 1)
 
-            if self._datetime and check(obj, _DateTime) and obj.tzinfo is not None:
-                obj = Timestamp.from_datetime(obj)
+            if self._datetime and check(obj, _DateTime):
+                if obj.tzinfo is not None:
+                    obj = Timestamp.from_datetime(obj)
+                    default_used = 1
+                    continue
+                if self._naive_utc:
+                    obj = Timestamp.from_datetime(obj.replace(tzinfo=_TimeZone.utc))
+                    default_used = 1
+                    continue
+            elif self._naive_utc and check(obj, _Date):
+                obj = Timestamp((obj.toordinal() - _EPOCH_ORDINAL) * 86400)
                 default_used = 1
                 continue
 
             if not default_used and self._default is not None:
+                if not (self._datetime and check(obj, _DateTime)):
+                    # Any instance of this type would end up here; skip the checks next time.
+                    if len(self._encoders) < self._encoders_limit:
+                        self._encoders[type(obj)] = self._default
                 obj = self._default(obj)
                 default_used = 1
                 continue
@@ -817,8 +1720,64 @@ class Packer:
             self._buffer = BytesIO()
             return ret
 
+    def pack_many(self, objs):
+        """Pack the objects of the iterable *objs* one after another.
+
+        Returns ``(data, offsets)``, where *data* is the packed objects as
+        one ``bytes`` and *offsets* is an ``array('Q')`` of the position of
+        each object in it.
+
+        With ``autoreset=False``, the objects are appended to the internal
+        buffer, *data* is None and *offsets* are positions in the buffer.
+        """
+        offsets = array.array("Q")
+        try:
+            for obj in objs:
+                offsets.append(self._buffer.tell())
+                self._pack(obj)
+        except:
+            self._buffer = BytesIO()  # force reset
+            raise
+        if self._autoreset:
+            ret = self._buffer.getvalue()
+            self._buffer = BytesIO()
+            return ret, offsets
+        return None, offsets
+
+    def pack_into(self, obj, buffer, offset=0):
+        """Pack *obj* into writable *buffer* at *offset* and return the number of bytes written.
+
+        Raises ``ValueError`` when *buffer* is too small.  The required size
+        is reported in the message.
+        """
+        saved = self._buffer
+        self._buffer = BytesIO()
+        try:
+            self._pack(obj)
+            data = self._buffer.getvalue()
+        finally:
+            self._buffer = saved
+
+        with memoryview(buffer) as mv, mv.cast("B") as view:
+            if view.readonly:
+                raise BufferError("buffer is not writable")
+            if not 0 <= offset <= len(view):
+                raise ValueError("offset is out of range")
+            n = len(data)
+            avail = len(view) - offset
+            if n > avail:
+                raise ValueError(
+                    "buffer is too small: %d bytes required, %d bytes available" % (n, avail)
+                )
+            view[offset : offset + n] = data
+        return n
+
     def pack_map_pairs(self, pairs):
-        self._pack_map_pairs(len(pairs), pairs)
+        try:
+            self._pack_map_pairs(len(pairs), pairs)
+        except:
+            self._buffer = BytesIO()  # force reset
+            raise
         if self._autoreset:
             ret = self._buffer.getvalue()
             self._buffer = BytesIO()
@@ -852,28 +1811,31 @@ class Packer:
         L = len(data)
         if L > 0xFFFFFFFF:
             raise ValueError("Too large data")
-        if L == 1:
+        self._pack_ext_header(typecode, L)
+        self._buffer.write(data)
+        if self._autoreset:
+            ret = self._buffer.getvalue()
+            self._buffer = BytesIO()
+            return ret
+
+    def _pack_ext_header(self, code, n):
+        if n == 1:
             self._buffer.write(b"\xd4")
-        elif L == 2:
+        elif n == 2:
             self._buffer.write(b"\xd5")
-        elif L == 4:
+        elif n == 4:
             self._buffer.write(b"\xd6")
-        elif L == 8:
+        elif n == 8:
             self._buffer.write(b"\xd7")
-        elif L == 16:
+        elif n == 16:
             self._buffer.write(b"\xd8")
-        elif L <= 0xFF:
-            self._buffer.write(b"\xc7" + struct.pack("B", L))
-        elif L <= 0xFFFF:
-            self._buffer.write(b"\xc8" + struct.pack(">H", L))
+        elif n <= 0xFF:
+            self._buffer.write(struct.pack(">BB", 0xC7, n))
+        elif n <= 0xFFFF:
+            self._buffer.write(struct.pack(">BH", 0xC8, n))
         else:
-            self._buffer.write(b"\xc9" + struct.pack(">I", L))
-        self._buffer.write(struct.pack("B", typecode))
-        self._buffer.write(data)
-        if self._autoreset:
-            ret = self._buffer.getvalue()
-            self._buffer = BytesIO()
-            return ret
+            self._buffer.write(struct.pack(">BI", 0xC9, n))
+        self._buffer.write(struct.pack("b", code))
 
     def _pack_array_header(self, n):
         if n <= 0x0F:
@@ -893,12 +1855,91 @@ class Packer:
             return self._buffer.write(struct.pack(">BI", 0xDF, n))
         raise ValueError("Dict is too large")
 
+    def _pack_object(self, obj, nest_limit):
+        # Pack a dataclass, NamedTuple or __slots__ instance field by field.
+        # Returns False without writing when *obj* is not such an object.
+        cls = type(obj)
+        try:
+            plan = self._object_plans[cls]
+        except KeyError:
+            info = _object_fields(cls)
+            if info is None:
+                plan = None
+            else:
+                fields, slotted = info
+                keys = None
+                if self._objects_as_map:
+                    keys = tuple(self._encode_str(name) for name in fields)
+                plan = (fields, keys, slotted)
+            if len(self._object_plans) < _DEFAULT_TYPES_LIMIT:
+                self._object_plans[cls] = plan
+        if plan is None:
+            return False
+        names, keys, slotted = plan
+        if slotted:
+            values = [getattr(obj, name, _MISSING) for name in names]
+            if keys is None:
+                self._pack_array_header(len(names))
+                for value in values:
+                    self._pack(None if value is _MISSING else value, nest_limit)
+            else:
+                self._pack_map_header(sum(value is not _MISSING for value in values))
+                for key, value in zip(keys, values):
+                    if value is not _MISSING:
+                        self._buffer.write(key)
+                        self._pack(value, nest_limit)
+        elif keys is None:
+            self._pack_array_header(len(names))
+            for name in names:
+                self._pack(getattr(obj, name), nest_limit)
+        else:
+            self._pack_map_header(len(names))
+            for name, key in zip(names, keys):
+                self._buffer.write(key)
+                self._pack(getattr(obj, name), nest_limit)
+        return True
+
     def _pack_map_pairs(self, n, pairs, nest_limit=DEFAULT_RECURSE_LIMIT):
         self._pack_map_header(n)
+        cache = self._key_cache
         for k, v in pairs:
-            self._pack(k, nest_limit - 1)
+            if cache is not None and type(k) is str:
+                encoded = cache.get(k)
+                if encoded is None:
+                    encoded = self._encode_key(k)
+                if encoded is not None:
+                    self._buffer.write(encoded)
+                else:
+                    self._pack(k, nest_limit - 1)
+            else:
+                self._pack(k, nest_limit - 1)
             self._pack(v, nest_limit - 1)
 
+    def _encode_str(self, s, max_len=None):
+        # Return str *s* packed as bytes, or None when its encoded body is
+        # longer than *max_len* bytes.
+        data = s.encode("utf-8", self._unicode_errors)
+        if max_len is not None and len(data) > max_len:
+            return None
+        buffer = self._buffer
+        self._buffer = BytesIO()
+        try:
+            self._pack_raw_header(len(data))
+            return self._buffer.getvalue() + data
+        finally:
+            self._buffer = buffer
+
+    def _encode_key(self, key):
+        # Encode str *key* and add it to the key cache, or return None when
+        # it is too long to be cached.
+        encoded = self._encode_str(key, 255)
+        if encoded is None:
+            return None
+        if len(self._key_cache) >= self._key_cache_size:
+            self._key_cache.clear()
+        self._key_cache[key] = encoded
+        return encoded
+
     def _pack_raw_header(self, n):
         if n <= 0x1F:
             self._buffer.write(struct.pack("B", 0xA0 + n))
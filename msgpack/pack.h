@@ -27,15 +27,80 @@
 extern "C" {
 #endif
 
-typedef struct msgpack_packer {
+typedef struct msgpack_chunk {
     char *buf;
-    size_t length;
-    size_t buf_size;
+    size_t size;
+} msgpack_chunk;
+
+typedef struct msgpack_packer {
+    char *buf;  /* current segment */
+    size_t length;  /* bytes used in the current segment */
+    size_t buf_size;  /* capacity of the current segment */
     bool use_bin_type;
+    bool fixed;  /* buf is borrowed from the caller and cannot grow */
+    PyObject *obj;  /* bytes object owning buf in zero_copy mode, or NULL */
+    msgpack_chunk *chunks;  /* full segments written before buf */
+    size_t nchunks;
+    size_t chunks_cap;
+    size_t chunked;  /* total bytes in chunks */
+    double growth;  /* size of a new segment relative to the previous one */
 } msgpack_packer;
 
 typedef struct Packer Packer;
 
+/* Smallest segment started by msgpack_pack_grow(), so that a tiny buf_size
+ * (even 0) doesn't make every write allocate a segment of its own. */
+#define MSGPACK_MIN_SEGMENT 256
+
+/* Start a new segment when the current one is full.  Data already written
+ * never moves; the segments are joined when the result is taken. */
+static int msgpack_pack_grow(msgpack_packer* pk, const char *data, size_t l)
+{
+    size_t room = pk->buf_size - pk->length;
+    size_t rest = l - room;
+    size_t size;
+    char *buf;
+
+    if (pk->nchunks == pk->chunks_cap) {
+        size_t cap = pk->chunks_cap ? pk->chunks_cap * 2 : 8;
+        msgpack_chunk *chunks = (msgpack_chunk*)PyMem_Realloc(pk->chunks, cap * sizeof(msgpack_chunk));
+        if (!chunks) {
+            PyErr_NoMemory();
+            return -1;
+        }
+        pk->chunks = chunks;
+        pk->chunks_cap = cap;
+    }
+    if (pk->buf_size * pk->growth < (double)PY_SSIZE_T_MAX) {
+        size = (size_t)(pk->buf_size * pk->growth);
+    } else {
+        size = 0;
+    }
+    if (size < MSGPACK_MIN_SEGMENT) {
+        size = MSGPACK_MIN_SEGMENT;
+    }
+    if (size < rest) {
+        size = rest;
+    }
+    buf = (char*)PyMem_Malloc(size);
+    if (!buf) {
+        PyErr_NoMemory();
+        return -1;
+    }
+
+    memcpy(pk->buf + pk->length, data, room);
+    pk->chunks[pk->nchunks].buf = pk->buf;
+    pk->chunks[pk->nchunks].size = pk->buf_size;
+    pk->nchunks++;
+    pk->chunked += pk->buf_size;
+
+    memcpy(buf, data + room, rest);
+    pk->buf = buf;
+    pk->buf_size = size;
+    pk->length = rest;
+    return 0;
+}
+
 static inline int msgpack_pack_write(msgpack_packer* pk, const char *data, size_t l)
 {
     char* buf = pk->buf;
@@ -43,12 +108,22 @@ static inline int msgpack_pack_write(msgpack_packer* pk, const char *data, size_
     size_t len = pk->length;
 
     if (len + l > bs) {
+        if (pk->fixed) {
+            /* Keep counting without writing so the required size can be reported. */
+            pk->length = len + l;
+            return 0;
+        }
+        if (!pk->obj) {
+            return msgpack_pack_grow(pk, data, l);
+        }
         bs = (len + l) * 2;
-        buf = (char*)PyMem_Realloc(buf, bs);
-        if (!buf) {
-            PyErr_NoMemory();
+        if (_PyBytes_Resize(&pk->obj, bs) < 0) {
+            pk->buf = NULL;
+            pk->buf_size = 0;
+            pk->length = 0;
             return -1;
         }
+        buf = PyBytes_AS_STRING(pk->obj);
     }
     memcpy(buf + len, data, l);
     len += l;
@@ -59,6 +134,72 @@ static inline int msgpack_pack_write(msgpack_packer* pk, const char *data, size_
     return 0;
 }
 
+/* Total number of bytes written. */
+static inline size_t msgpack_pack_size(const msgpack_packer* pk)
+{
+    return pk->chunked + pk->length;
+}
+
+/* Copy all written bytes to dst, which must hold msgpack_pack_size() bytes. */
+static void msgpack_pack_copy(const msgpack_packer* pk, char *dst)
+{
+    size_t i;
+    for (i = 0; i < pk->nchunks; i++) {
+        memcpy(dst, pk->chunks[i].buf, pk->chunks[i].size);
+        dst += pk->chunks[i].size;
+    }
+    memcpy(dst, pk->buf, pk->length);
+}
+
+/* Join all segments into one, so that the data can be exported as a single buffer. */
+static int msgpack_pack_join(msgpack_packer* pk)
+{
+    size_t i;
+    size_t size;
+    char *buf;
+
+    if (pk->nchunks == 0) {
+        return 0;
+    }
+    size = msgpack_pack_size(pk);
+    buf = (char*)PyMem_Malloc(size);
+    if (!buf) {
+        PyErr_NoMemory();
+        return -1;
+    }
+    msgpack_pack_copy(pk, buf);
+    for (i = 0; i < pk->nchunks; i++) {
+        PyMem_Free(pk->chunks[i].buf);
+    }
+    PyMem_Free(pk->buf);
+    pk->nchunks = 0;
+    pk->chunked = 0;
+    pk->buf = buf;
+    pk->buf_size = size;
+    pk->length = size;
+    return 0;
+}
+
+/* Discard written data.  Only the last segment is kept, and it is shrunk
+ * to `base` bytes when it is larger than `retain` bytes. */
+static void msgpack_pack_clear(msgpack_packer* pk, size_t base, size_t retain)
+{
+    size_t i;
+    for (i = 0; i < pk->nchunks; i++) {
+        PyMem_Free(pk->chunks[i].buf);
+    }
+    pk->nchunks = 0;
+    pk->chunked = 0;
+    pk->length = 0;
+    if (pk->buf_size > retain && pk->buf_size > base && !pk->obj && !pk->fixed) {
+        char *buf = (char*)PyMem_Realloc(pk->buf, base);
+        if (buf) {  /* keep the larger buffer if shrinking fails */
+            pk->buf = buf;
+            pk->buf_size = base;
+        }
+    }
+}
+
 #define msgpack_pack_append_buffer(user, buf, len) \
         return msgpack_pack_write(user, (const char*)buf, len)
 
@@ -16,7 +16,8 @@
  *    limitations under the License.
  */
 
-#define MSGPACK_EMBED_STACK_SIZE  (1024)
+/* Containers nested deeper than this spill to a stack on the heap. */
+#define MSGPACK_EMBED_STACK_SIZE  (32)
 #include "unpack_define.h"
 
 typedef struct unpack_user {
@@ -28,13 +29,41 @@ typedef struct unpack_user {
     PyObject *object_hook;
     PyObject *list_hook;
     PyObject *ext_hook;
-    PyObject *timestamp_t;
+    PyObject *ext_type;       /* ExtType, made without calling it when it is ext_hook */
+    PyObject* (*new_timestamp)(int64_t seconds, uint32_t nanoseconds);
     PyObject *giga;
     PyObject *utc;
+    PyObject *schema;
+    PyObject *select;         /* node of the select option, or NULL */
+    PyObject *ndarray_hook;   /* unpacks ndarray ext data, or NULL */
+    int ndarray_ext_code;
+    PyObject *buffer;         /* object the input points into, or NULL when it is transient */
+    bool bin_as_view;         /* buffer is a memoryview of the input and bin is sliced from it */
     const char *unicode_errors;
     Py_ssize_t max_str_len, max_bin_len, max_array_len, max_map_len, max_ext_len;
+    unsigned int max_depth;   /* containers nested deeper raise StackError */
+    bool intern_keys;         /* intern str map keys */
+    PyObject **key_cache;     /* decoded str map keys, or NULL */
+    size_t key_cache_mask;    /* number of slots in key_cache - 1 */
+    PyObject **dedup;         /* str, bytes and tuple values to share, or NULL */
+    size_t dedup_mask;        /* number of slots in dedup - 1 */
+    PyObject *shapes;         /* root shape of the map_records option, or NULL */
+    int shape_mode;           /* TUPLE, NAMEDTUPLE or FACTORY of msgpack/_shapes.py */
+    PyObject *shape_factory;  /* makes the constructor of a shape */
 } unpack_user;
 
+#define MSGPACK_SHAPE_TUPLE       1
+#define MSGPACK_SHAPE_NAMEDTUPLE  2
+/* Maximum number of nodes of the shape trie, MAX_SHAPES of msgpack/_shapes.py */
+#define MSGPACK_MAX_SHAPES        2048
+
+/* Only str and bytes up to this length are kept in key_cache and dedup,
+ * and only tuples up to this size in dedup. */
+#define MSGPACK_TABLE_MAX_LEN    64
+#define MSGPACK_TABLE_MAX_TUPLE  8
+/* Number of slots an object is looked up in. */
+#define MSGPACK_TABLE_PROBES     4
+
 typedef PyObject* msgpack_unpack_object;
 struct unpack_context;
 typedef struct unpack_context unpack_context;
@@ -146,6 +175,8 @@ static inline int unpack_callback_array_item(unpack_user* u, unsigned int curren
     return 0;
 }
 
+static inline int unpack_dedup_tuple(unpack_user* u, msgpack_unpack_object* c);
+
 static inline int unpack_callback_array_end(unpack_user* u, msgpack_unpack_object* c)
 {
     if (u->list_hook) {
@@ -155,6 +186,9 @@ static inline int unpack_callback_array_end(unpack_user* u, msgpack_unpack_objec
         Py_DECREF(*c);
         *c = new_c;
     }
+    else if (u->dedup != NULL && PyTuple_CheckExact(*c)) {
+        return unpack_dedup_tuple(u, c);
+    }
     return 0;
 }
 
@@ -183,9 +217,6 @@ static inline int unpack_callback_map_item(unpack_user* u, unsigned int current,
         PyErr_Format(PyExc_ValueError, "%.100s is not allowed for map key when strict_map_key=True", Py_TYPE(k)->tp_name);
         return -1;
     }
-    if (PyUnicode_CheckExact(k)) {
-        PyUnicode_InternInPlace(&k);
-    }
     if (u->has_pairs_hook) {
         msgpack_unpack_object item = PyTuple_Pack(2, k, v);
         if (!item)
@@ -216,13 +247,264 @@ static inline int unpack_callback_map_end(unpack_user* u, msgpack_unpack_object*
     return 0;
 }
 
-static inline int unpack_callback_raw(unpack_user* u, const char* b, const char* p, unsigned int l, msgpack_unpack_object* o)
+/*
+ * Unpacking maps with str keys into records, with the map_records option.
+ * The layout of shapes is described in msgpack/_shapes.py.
+ */
+#define shape_keys(s)       PyList_GET_ITEM(s, 0)
+#define shape_ctor(s)       PyList_GET_ITEM(s, 1)
+#define shape_last_key(s)   PyList_GET_ITEM(s, 2)
+#define shape_last_node(s)  PyList_GET_ITEM(s, 3)
+#define shape_children(s)   PyList_GET_ITEM(s, 4)
+#define shape_count(root)   PyList_GET_ITEM(root, 5)
+
+static inline int unpack_callback_shape_map(unpack_user* u, unsigned int n, msgpack_unpack_object* o)
 {
-    if (l > u->max_str_len) {
-        PyErr_Format(PyExc_ValueError, "%u exceeds max_str_len(%zd)", l, u->max_str_len);
+    if (n > u->max_map_len) {
+        PyErr_Format(PyExc_ValueError, "%u exceeds max_map_len(%zd)", n, u->max_map_len);
+        return -1;
+    }
+    PyObject *p = PyTuple_New(n);
+    if (!p)
+        return -1;
+    *o = p;
+    return 0;
+}
+
+static PyObject* unpack_new_shape(PyObject* parent, PyObject* key)
+{
+    PyObject *parent_keys = shape_keys(parent);
+    Py_ssize_t n = PyTuple_GET_SIZE(parent_keys);
+    PyObject *keys = PyTuple_New(n + 1);
+    if (!keys)
+        return NULL;
+    for (Py_ssize_t i = 0; i < n; i++) {
+        PyObject *k = PyTuple_GET_ITEM(parent_keys, i);
+        Py_INCREF(k);
+        PyTuple_SET_ITEM(keys, i, k);
+    }
+    Py_INCREF(key);
+    PyTuple_SET_ITEM(keys, n, key);
+    PyObject *children = PyDict_New();
+    if (!children) {
+        Py_DECREF(keys);
+        return NULL;
+    }
+    PyObject *node = PyList_New(5);
+    if (!node) {
+        Py_DECREF(keys);
+        Py_DECREF(children);
+        return NULL;
+    }
+    PyList_SET_ITEM(node, 0, keys);
+    for (Py_ssize_t i = 1; i < 4; i++) {
+        Py_INCREF(Py_None);
+        PyList_SET_ITEM(node, i, Py_None);
+    }
+    PyList_SET_ITEM(node, 4, children);
+    return node;
+}
+
+/* Follow key k from the shape *node, consuming k.
+ * Returns 1, leaving k, when k is not a str or the trie is full: the map is
+ * not a record. */
+static inline int unpack_callback_shape_key(unpack_user* u, PyObject** node, msgpack_unpack_object k)
+{
+    if (!PyUnicode_CheckExact(k))
+        return 1;
+    PyObject *n = *node;
+    PyObject *next = shape_last_node(n);
+    if (shape_last_key(n) != k) {
+        next = PyDict_GetItemWithError(shape_children(n), k);
+        if (!next) {
+            if (PyErr_Occurred())
+                return -1;
+            Py_ssize_t count = PyLong_AsSsize_t(shape_count(u->shapes));
+            if (count < 0)
+                return -1;
+            if (count >= MSGPACK_MAX_SHAPES)
+                return 1;
+            PyObject *c = PyLong_FromSsize_t(count + 1);
+            if (!c)
+                return -1;
+            PyList_SetItem(u->shapes, 5, c);
+            next = unpack_new_shape(n, k);
+            if (!next)
+                return -1;
+            if (PyDict_SetItem(shape_children(n), k, next) < 0) {
+                Py_DECREF(next);
+                return -1;
+            }
+            Py_DECREF(next);  /* children keeps it alive */
+        }
+        Py_INCREF(k);
+        Py_INCREF(next);
+        PyList_SetItem(n, 2, k);
+        PyList_SetItem(n, 3, next);
+    }
+    Py_DECREF(k);
+    *node = next;
+    return 0;
+}
+
+/* The map turned out not to be a record: move its first n values, with the
+ * keys of node, into a dict. */
+static int unpack_callback_shape_to_dict(unpack_user* u, PyObject* node, Py_ssize_t n, msgpack_unpack_object* c)
+{
+    PyObject *d = PyDict_New();
+    if (!d)
+        return -1;
+    for (Py_ssize_t i = 0; i < n; i++) {
+        if (PyDict_SetItem(d, PyTuple_GET_ITEM(shape_keys(node), i), PyTuple_GET_ITEM(*c, i)) < 0) {
+            Py_DECREF(d);
+            return -1;
+        }
+    }
+    Py_DECREF(*c);
+    *c = d;
+    return 0;
+}
+
+/* Make the record of shape node from the tuple of values *c. */
+static inline int unpack_callback_shape_end(unpack_user* u, PyObject* node, msgpack_unpack_object* c)
+{
+    if (u->shape_mode == MSGPACK_SHAPE_TUPLE)
+        return 0;
+    PyObject *ctor = shape_ctor(node);
+    if (ctor == Py_None) {
+        ctor = PyObject_CallOneArg(u->shape_factory, shape_keys(node));
+        if (!ctor)
+            return -1;
+        PyList_SetItem(node, 1, ctor);
+    }
+    PyObject *rec;
+    if (u->shape_mode == MSGPACK_SHAPE_NAMEDTUPLE) {
+        /* tuple.__new__(ctor, values), skipping the __new__ of namedtuple */
+        PyObject *args = PyTuple_Pack(1, *c);
+        if (!args)
+            return -1;
+        rec = PyTuple_Type.tp_new((PyTypeObject*)ctor, args, NULL);
+        Py_DECREF(args);
+    }
+    else {
+        rec = PyObject_Call(ctor, *c, NULL);
+    }
+    if (!rec)
+        return -1;
+    Py_DECREF(*c);
+    *c = rec;
+    return 0;
+}
+
+/* End a map some items of were skipped by the select option, leaving n. */
+static inline int unpack_callback_select_map_end(unpack_user* u, Py_ssize_t n, msgpack_unpack_object* c)
+{
+    if (u->has_pairs_hook) {
+        /* The list of pairs was allocated for all items; drop the empty slots. */
+        Py_SET_SIZE((PyVarObject*)*c, n);
+    }
+    return unpack_callback_map_end(u, c);
+}
+
+/*
+ * Tables of objects to reuse instead of creating equal ones again: the
+ * cache of str map keys and the dedup_values table.  str (only ASCII, whose
+ * characters are their UTF-8 bytes) and bytes are looked up by content,
+ * tuples by the identity of their items.
+ */
+
+/* Allocate a table of at least n slots, or none if n is 0. */
+static int unpack_alloc_table(PyObject*** table, size_t* mask, size_t n)
+{
+    size_t size = 1;
+    *table = NULL;
+    *mask = 0;
+    if (n == 0)
+        return 0;
+    while (size < n)
+        size <<= 1;
+    *table = (PyObject**)PyMem_Calloc(size, sizeof(PyObject*));
+    if (*table == NULL) {
+        PyErr_NoMemory();
+        return -1;
+    }
+    *mask = size - 1;
+    return 0;
+}
+
+static void unpack_free_table(PyObject*** table, size_t* mask)
+{
+    if (*table == NULL)
+        return;
+    for (size_t i = 0; i <= *mask; i++) {
+        Py_XDECREF((*table)[i]);
+    }
+    PyMem_Free(*table);
+    *table = NULL;
+    *mask = 0;
+}
+
+static int unpack_alloc_tables(unpack_user* u, size_t key_cache, size_t dedup_values)
+{
+    if (unpack_alloc_table(&u->key_cache, &u->key_cache_mask, key_cache) < 0)
+        return -1;
+    if (unpack_alloc_table(&u->dedup, &u->dedup_mask, dedup_values) < 0) {
+        unpack_free_table(&u->key_cache, &u->key_cache_mask);
         return -1;
     }
+    return 0;
+}
+
+static void unpack_free_tables(unpack_user* u)
+{
+    unpack_free_table(&u->key_cache, &u->key_cache_mask);
+    unpack_free_table(&u->dedup, &u->dedup_mask);
+}
+
+/* Look up the str (or bytes if is_bytes) of p[0:l] in table.  Returns a new
+ * reference to it, or NULL with *slot set to the slot to store it in. */
+static inline PyObject* unpack_table_find(PyObject** table, size_t mask, bool is_bytes,
+                                          const char* p, unsigned int l, size_t* slot)
+{
+    /* FNV-1a */
+    size_t h = is_bytes ? 2166136261u : 2166136261u ^ 0x5a;
+    for (unsigned int i = 0; i < l; i++) {
+        h = (h ^ (unsigned char)p[i]) * 16777619u;
+    }
+    size_t start = h & mask;
+    for (size_t i = 0; i < MSGPACK_TABLE_PROBES; i++) {
+        size_t s = (start + i) & mask;
+        PyObject *obj = table[s];
+        if (obj == NULL) {
+            *slot = s;
+            return NULL;
+        }
+        if (is_bytes) {
+            if (PyBytes_CheckExact(obj) && PyBytes_GET_SIZE(obj) == (Py_ssize_t)l &&
+                memcmp(PyBytes_AS_STRING(obj), p, l) == 0) {
+                Py_INCREF(obj);
+                return obj;
+            }
+        }
+        else if (PyUnicode_CheckExact(obj) && PyUnicode_GET_LENGTH(obj) == (Py_ssize_t)l &&
+                 memcmp(PyUnicode_1BYTE_DATA(obj), p, l) == 0) {
+            Py_INCREF(obj);
+            return obj;
+        }
+    }
+    *slot = start;  /* all slots are taken; replace the first one */
+    return NULL;
+}
+
+static inline void unpack_table_store(PyObject** table, size_t slot, PyObject* obj)
+{
+    Py_INCREF(obj);
+    Py_XDECREF(table[slot]);
+    table[slot] = obj;
+}
 
+static inline int unpack_decode_raw(unpack_user* u, const char* p, unsigned int l, msgpack_unpack_object* o)
+{
     PyObject *py;
 
     if (u->raw) {
@@ -236,6 +518,97 @@ static inline int unpack_callback_raw(unpack_user* u, const char* b, const char*
     return 0;
 }
 
+static inline int unpack_callback_raw(unpack_user* u, const char* b, const char* p, unsigned int l, msgpack_unpack_object* o)
+{
+    if (l > u->max_str_len) {
+        PyErr_Format(PyExc_ValueError, "%u exceeds max_str_len(%zd)", l, u->max_str_len);
+        return -1;
+    }
+    if (u->dedup == NULL || l > MSGPACK_TABLE_MAX_LEN)
+        return unpack_decode_raw(u, p, l, o);
+
+    size_t slot;
+    PyObject *py = unpack_table_find(u->dedup, u->dedup_mask, u->raw, p, l, &slot);
+    if (py) {
+        *o = py;
+        return 0;
+    }
+    if (unpack_decode_raw(u, p, l, o) < 0)
+        return -1;
+    if (u->raw || PyUnicode_IS_ASCII(*o))
+        unpack_table_store(u->dedup, slot, *o);
+    return 0;
+}
+
+/* Decode a str map key.  ASCII keys are kept in key_cache, so that the
+ * same key is not decoded (and interned) again. */
+static inline int unpack_callback_map_key_raw(unpack_user* u, const char* b, const char* p, unsigned int l, msgpack_unpack_object* o)
+{
+    if (l > u->max_str_len) {
+        PyErr_Format(PyExc_ValueError, "%u exceeds max_str_len(%zd)", l, u->max_str_len);
+        return -1;
+    }
+    if (u->raw || u->key_cache == NULL || l > MSGPACK_TABLE_MAX_LEN) {
+        if (unpack_decode_raw(u, p, l, o) < 0)
+            return -1;
+        if (u->intern_keys && !u->raw)
+            PyUnicode_InternInPlace(o);
+        return 0;
+    }
+
+    size_t slot;
+    PyObject *key = unpack_table_find(u->key_cache, u->key_cache_mask, false, p, l, &slot);
+    if (key) {
+        *o = key;
+        return 0;
+    }
+    if (unpack_decode_raw(u, p, l, o) < 0)
+        return -1;
+    if (u->intern_keys)
+        PyUnicode_InternInPlace(o);
+    if (PyUnicode_IS_ASCII(*o))
+        unpack_table_store(u->key_cache, slot, *o);
+    return 0;
+}
+
+/* Replace the tuple *c by an earlier one holding the same objects.  Items
+ * are compared by identity, which is enough for the shared str and bytes
+ * values, small ints and singletons, and never mixes up 1, 1.0 and True. */
+static inline int unpack_dedup_tuple(unpack_user* u, msgpack_unpack_object* c)
+{
+    Py_ssize_t n = PyTuple_GET_SIZE(*c);
+    if (n == 0 || n > MSGPACK_TABLE_MAX_TUPLE)
+        return 0;
+    size_t h = 2166136261u ^ (size_t)n;
+    for (Py_ssize_t i = 0; i < n; i++) {
+        h = (h ^ (size_t)PyTuple_GET_ITEM(*c, i)) * 16777619u;
+        h ^= h >> 15;
+    }
+    size_t start = h & u->dedup_mask;
+    size_t slot = start;
+    for (size_t i = 0; i < MSGPACK_TABLE_PROBES; i++) {
+        size_t s = (start + i) & u->dedup_mask;
+        PyObject *obj = u->dedup[s];
+        if (obj == NULL) {
+            slot = s;
+            break;
+        }
+        if (PyTuple_CheckExact(obj) && PyTuple_GET_SIZE(obj) == n) {
+            Py_ssize_t j = 0;
+            while (j < n && PyTuple_GET_ITEM(obj, j) == PyTuple_GET_ITEM(*c, j))
+                j++;
+            if (j == n) {
+                Py_INCREF(obj);
+                Py_DECREF(*c);
+                *c = obj;
+                return 0;
+            }
+        }
+    }
+    unpack_table_store(u->dedup, slot, *c);
+    return 0;
+}
+
 static inline int unpack_callback_bin(unpack_user* u, const char* b, const char* p, unsigned int l, msgpack_unpack_object* o)
 {
     if (l > u->max_bin_len) {
@@ -243,7 +616,24 @@ static inline int unpack_callback_bin(unpack_user* u, const char* b, const char*
         return -1;
     }
 
-    PyObject *py = PyBytes_FromStringAndSize(p, l);
+    PyObject *py;
+    size_t slot = 0;
+    if (u->bin_as_view) {
+        py = PySequence_GetSlice(u->buffer, p - b, p - b + l);
+    }
+    else if (u->dedup != NULL && l <= MSGPACK_TABLE_MAX_LEN) {
+        py = unpack_table_find(u->dedup, u->dedup_mask, true, p, l, &slot);
+        if (py) {
+            *o = py;
+            return 0;
+        }
+        py = PyBytes_FromStringAndSize(p, l);
+        if (py)
+            unpack_table_store(u->dedup, slot, py);
+    }
+    else {
+        py = PyBytes_FromStringAndSize(p, l);
+    }
     if (!py)
         return -1;
     *o = py;
@@ -285,6 +675,59 @@ static int unpack_timestamp(const char* buf, unsigned int buflen, msgpack_timest
 
 #include "datetime.h"
 
+/* UTC datetime of a timestamp, with the date computed from the days since
+ * the epoch (civil_from_days of http://howardhinnant.github.io/date_algorithms.html)
+ * instead of adding a timedelta to the epoch. */
+static PyObject* unpack_datetime(int64_t sec, uint32_t nsec, PyObject* tz)
+{
+    int64_t days = sec / 86400;
+    int64_t rem = sec % 86400;
+    if (rem < 0) {
+        rem += 86400;
+        days--;
+    }
+    // 0001-01-01 and 9999-12-31 in days since the epoch.
+    if (days < -719162 || days > 2932896) {
+        PyErr_SetString(PyExc_OverflowError, "date value out of range");
+        return NULL;
+    }
+    int z = (int)days + 719468;  // days since 0000-03-01
+    int era = (z >= 0 ? z : z - 146096) / 146097;
+    int doe = z - era * 146097;
+    int yoe = (doe - doe/1460 + doe/36524 - doe/146096) / 365;
+    int doy = doe - (365*yoe + yoe/4 - yoe/100);
+    int mp = (5*doy + 2) / 153;
+    int day = doy - (153*mp + 2)/5 + 1;
+    int month = mp < 10 ? mp + 3 : mp - 9;
+    int year = yoe + era * 400 + (month <= 2);
+    return PyDateTimeAPI->DateTime_FromDateAndTime(
+            year, month, day, (int)(rem / 3600), (int)(rem / 60 % 60), (int)(rem % 60),
+            (int)(nsec / 1000), tz, PyDateTimeAPI->DateTimeType);
+}
+
+/* ExtType(code, data), skipping the checks of ExtType.__new__: the
+ * namedtuple is filled like tuple.__new__(ExtType, (code, data)) does. */
+static PyObject* unpack_new_ext_type(PyTypeObject* type, int code, const char* data, Py_ssize_t len)
+{
+    PyObject *c = PyLong_FromLong(code);
+    if (!c)
+        return NULL;
+    PyObject *d = PyBytes_FromStringAndSize(data, len);
+    if (!d) {
+        Py_DECREF(c);
+        return NULL;
+    }
+    PyObject *obj = type->tp_alloc(type, 2);
+    if (!obj) {
+        Py_DECREF(c);
+        Py_DECREF(d);
+        return NULL;
+    }
+    PyTuple_SET_ITEM(obj, 0, c);
+    PyTuple_SET_ITEM(obj, 1, d);
+    return obj;
+}
+
 static int unpack_callback_ext(unpack_user* u, const char* base, const char* pos,
                                unsigned int length, msgpack_unpack_object* o)
 {
@@ -327,32 +770,10 @@ static int unpack_callback_ext(unpack_user* u, const char* base, const char* pos
             Py_DECREF(b);
         }
         else if (u->timestamp == 0) {  // Timestamp
-            py = PyObject_CallFunction(u->timestamp_t, "(Lk)", ts.tv_sec, ts.tv_nsec);
+            py = u->new_timestamp(ts.tv_sec, ts.tv_nsec);
         }
-        else if (u->timestamp == 3) {  // datetime
-            // Calculate datetime using epoch + delta
-            // due to limitations PyDateTime_FromTimestamp on Windows with negative timestamps
-            int64_t days = ts.tv_sec / (24*3600);
-            if (days < INT_MIN || days > INT_MAX) {
-                PyErr_Format(PyExc_OverflowError,
-                            "days=%lld; too large to convert to C int", days);
-                return -1;
-            }
-            PyObject *epoch = PyDateTimeAPI->DateTime_FromDateAndTime(1970, 1, 1, 0, 0, 0, 0, u->utc, PyDateTimeAPI->DateTimeType);
-            if (epoch == NULL) {
-                return -1;
-            }
-
-            PyObject* d = PyDelta_FromDSU((int)days, ts.tv_sec%(24*3600), ts.tv_nsec / 1000);
-            if (d == NULL) {
-                Py_DECREF(epoch);
-                return -1;
-            }
-
-            py = PyNumber_Add(epoch, d);
-
-            Py_DECREF(epoch);
-            Py_DECREF(d);
+        else if (u->timestamp >= 3) {  // datetime, aware (3) or naive (4)
+            py = unpack_datetime(ts.tv_sec, ts.tv_nsec, u->timestamp == 3 ? u->utc : Py_None);
         }
         else { // float
             PyObject *a = PyFloat_FromDouble((double)ts.tv_nsec);
@@ -373,6 +794,18 @@ static int unpack_callback_ext(unpack_user* u, const char* base, const char* pos
             Py_DECREF(c);
             py = a;
         }
+    } else if (u->ndarray_hook && typecode == u->ndarray_ext_code) {
+        if (u->buffer) {  // view the input
+            py = PyObject_CallFunction(u->ndarray_hook, "(Onn)", u->buffer, (Py_ssize_t)(pos - base), (Py_ssize_t)length-1);
+        }
+        else {
+            PyObject *data = PyBytes_FromStringAndSize(pos, (Py_ssize_t)length-1);
+            if (data == NULL) return -1;
+            py = PyObject_CallFunction(u->ndarray_hook, "(Onn)", data, (Py_ssize_t)0, (Py_ssize_t)length-1);
+            Py_DECREF(data);
+        }
+    } else if (u->ext_hook == u->ext_type) {
+        py = unpack_new_ext_type((PyTypeObject*)u->ext_type, typecode, pos, (Py_ssize_t)length-1);
     } else {
         py = PyObject_CallFunction(u->ext_hook, "(iy#)", (int)typecode, pos, (Py_ssize_t)length-1);
     }
@@ -382,4 +815,195 @@ static int unpack_callback_ext(unpack_user* u, const char* base, const char* pos
     return 0;
 }
 
+/*
+ * Decoding maps and arrays into records with the schema option.
+ * The layout of plans is described in msgpack/_schema.py.
+ */
+#define schema_is_record(s)     (PyList_GET_SIZE(s) > 2)
+#define schema_item(s)          PyList_GET_ITEM(s, 1)
+#define schema_cls(s)           PyList_GET_ITEM(s, 1)
+#define schema_index(s)         PyList_GET_ITEM(s, 2)
+#define schema_npositional(s)   PyList_GET_ITEM(s, 3)
+#define schema_kwnames(s)       PyList_GET_ITEM(s, 4)
+#define schema_defaults(s)      PyList_GET_ITEM(s, 5)
+#define schema_factories(s)     PyList_GET_ITEM(s, 6)
+#define schema_types(s)         PyList_GET_ITEM(s, 7)
+#define schema_subplans(s)      PyList_GET_ITEM(s, 8)
+#define schema_names(s)         PyList_GET_ITEM(s, 9)
+#define schema_nfields(s)       PyTuple_GET_SIZE(schema_names(s))
+
+/* "int" or "int | NoneType", for error messages. */
+static PyObject* schema_type_names(PyObject* t)
+{
+    PyObject *names, *sep, *joined;
+
+    if (PyType_Check(t))
+        return PyUnicode_FromString(((PyTypeObject*)t)->tp_name);
+    names = PyList_New(PyTuple_GET_SIZE(t));
+    if (!names)
+        return NULL;
+    for (Py_ssize_t i = 0; i < PyTuple_GET_SIZE(t); i++) {
+        PyObject *name = PyUnicode_FromString(((PyTypeObject*)PyTuple_GET_ITEM(t, i))->tp_name);
+        if (!name) {
+            Py_DECREF(names);
+            return NULL;
+        }
+        PyList_SET_ITEM(names, i, name);
+    }
+    sep = PyUnicode_FromString(" | ");
+    joined = sep ? PyUnicode_Join(sep, names) : NULL;
+    Py_XDECREF(sep);
+    Py_DECREF(names);
+    return joined;
+}
+
+static inline int unpack_callback_record(unpack_user* u, PyObject* schema, msgpack_unpack_object* o)
+{
+    /* Field values are collected in a list, in field order. */
+    PyObject *p = PyList_New(schema_nfields(schema));
+    if (!p)
+        return -1;
+    *o = p;
+    return 0;
+}
+
+static inline int unpack_callback_record_array(unpack_user* u, PyObject* schema, unsigned int n, msgpack_unpack_object* o)
+{
+    if (n > u->max_array_len) {
+        PyErr_Format(PyExc_ValueError, "%u exceeds max_array_len(%zd)", n, u->max_array_len);
+        return -1;
+    }
+    if (n > schema_nfields(schema)) {
+        PyErr_Format(PyExc_ValueError, "%s: expected at most %zd items, got %u",
+                     ((PyTypeObject*)schema_cls(schema))->tp_name, schema_nfields(schema), n);
+        return -1;
+    }
+    return unpack_callback_record(u, schema, o);
+}
+
+static inline int unpack_callback_record_map(unpack_user* u, PyObject* schema, unsigned int n, msgpack_unpack_object* o)
+{
+    if (n > u->max_map_len) {
+        PyErr_Format(PyExc_ValueError, "%u exceeds max_map_len(%zd)", n, u->max_map_len);
+        return -1;
+    }
+    return unpack_callback_record(u, schema, o);
+}
+
+/* Look up the position of field k.  Unknown keys get -1 and their value is dropped. */
+static inline int unpack_callback_record_key(unpack_user* u, PyObject* schema, msgpack_unpack_object k, Py_ssize_t* field)
+{
+    PyObject *name = k;
+    PyObject *pos;
+
+    *field = -1;
+    if (PyBytes_CheckExact(k)) {  /* raw=True */
+        name = PyUnicode_DecodeUTF8(PyBytes_AS_STRING(k), PyBytes_GET_SIZE(k), "surrogateescape");
+        Py_DECREF(k);
+        if (!name)
+            return -1;
+    }
+    else if (!PyUnicode_CheckExact(k)) {
+        if (u->strict_map_key) {
+            PyErr_Format(PyExc_ValueError, "%.100s is not allowed for map key when strict_map_key=True", Py_TYPE(k)->tp_name);
+            Py_DECREF(k);
+            return -1;
+        }
+        Py_DECREF(k);
+        return 0;
+    }
+    pos = PyDict_GetItemWithError(schema_index(schema), name);
+    Py_DECREF(name);
+    if (pos) {
+        *field = PyLong_AsSsize_t(pos);
+    }
+    else if (PyErr_Occurred()) {
+        return -1;
+    }
+    return 0;
+}
+
+static inline int unpack_callback_record_item(unpack_user* u, PyObject* schema, Py_ssize_t field, msgpack_unpack_object* c, msgpack_unpack_object o)
+{
+    PyObject *t, *old;
+
+    if (field < 0 || field >= schema_nfields(schema)) {
+        Py_DECREF(o);
+        return 0;
+    }
+    t = PyTuple_GET_ITEM(schema_types(schema), field);
+    if (t != Py_None && Py_TYPE(o) != (PyTypeObject*)t) {
+        int r = PyObject_IsInstance(o, t);
+        if (r <= 0) {
+            if (r == 0) {
+                PyObject *expected = schema_type_names(t);
+                if (expected) {
+                    PyErr_Format(PyExc_ValueError, "%s.%U: expected %U, got %.100s",
+                                 ((PyTypeObject*)schema_cls(schema))->tp_name,
+                                 PyTuple_GET_ITEM(schema_names(schema), field),
+                                 expected, Py_TYPE(o)->tp_name);
+                    Py_DECREF(expected);
+                }
+            }
+            Py_DECREF(o);
+            return -1;
+        }
+    }
+    old = PyList_GET_ITEM(*c, field);
+    PyList_SET_ITEM(*c, field, o);
+    Py_XDECREF(old);
+    return 0;
+}
+
+/* Check that the top-level object o was decoded as a record of schema. */
+static inline int unpack_callback_record_top(unpack_user* u, PyObject* schema, msgpack_unpack_object o)
+{
+    PyTypeObject *cls = (PyTypeObject*)schema_cls(schema);
+    if (PyObject_TypeCheck(o, cls))
+        return 0;
+    PyErr_Format(PyExc_ValueError, "%s: expected a map or an array, got %.100s",
+                 cls->tp_name, Py_TYPE(o)->tp_name);
+    return -1;
+}
+
+static inline int unpack_callback_record_end(unpack_user* u, PyObject* schema, msgpack_unpack_object* c)
+{
+    PyObject *values = *c;
+    Py_ssize_t n = schema_nfields(schema);
+    PyObject *kwnames = schema_kwnames(schema);
+    PyObject *obj;
+
+    for (Py_ssize_t i = 0; i < n; i++) {
+        if (PyList_GET_ITEM(values, i))
+            continue;
+        PyObject *v;
+        PyObject *d = PyTuple_GET_ITEM(schema_defaults(schema), i);
+        PyObject *f = PyTuple_GET_ITEM(schema_factories(schema), i);
+        if (d != Py_None) {
+            v = PyTuple_GET_ITEM(d, 0);
+            Py_INCREF(v);
+        }
+        else if (f != Py_None) {
+            v = PyObject_CallNoArgs(f);
+            if (!v)
+                return -1;
+        }
+        else {
+            PyErr_Format(PyExc_ValueError, "%s: missing field %R",
+                         ((PyTypeObject*)schema_cls(schema))->tp_name,
+                         PyTuple_GET_ITEM(schema_names(schema), i));
+            return -1;
+        }
+        PyList_SET_ITEM(values, i, v);
+    }
+    obj = PyObject_Vectorcall(schema_cls(schema), ((PyListObject*)values)->ob_item,
+                              PyLong_AsSsize_t(schema_npositional(schema)),
+                              kwnames == Py_None ? NULL : kwnames);
+    if (!obj)
+        return -1;
+    Py_DECREF(values);
+    *c = obj;
+    return 0;
+}
+
 #include "unpack_template.h"
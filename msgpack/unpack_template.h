@@ -28,6 +28,11 @@ typedef struct unpack_stack {
     Py_ssize_t count;
     unsigned int ct;
     PyObject* map_key;
+    PyObject* schema;  /* plan this container is decoded with, or NULL */
+    Py_ssize_t field;  /* record field of the map value being read */
+    PyObject* select;  /* select node of this container, or NULL */
+    PyObject* select_value;  /* select node of the item being read, or NULL */
+    PyObject* shape;   /* shape of the keys read so far with map_records, or NULL */
 } unpack_stack;
 
 struct unpack_context {
@@ -35,18 +40,57 @@ struct unpack_context {
     unsigned int cs;
     unsigned int trail;
     unsigned int top;
-    unpack_stack stack[MSGPACK_EMBED_STACK_SIZE];
+    unsigned int stack_size;
+    unpack_stack* stack;  /* embed_stack, or a larger copy on the heap */
+    unpack_stack embed_stack[MSGPACK_EMBED_STACK_SIZE];
 };
 
 
+/* Reset ctx.  The heap stack must have been freed, by unpack_clear(). */
 static inline void unpack_init(unpack_context* ctx)
 {
     ctx->cs = CS_HEADER;
     ctx->trail = 0;
     ctx->top = 0;
+    ctx->stack = ctx->embed_stack;
+    ctx->stack_size = MSGPACK_EMBED_STACK_SIZE;
     ctx->stack[0].obj = NULL;
 }
 
+/* Free the heap stack of ctx, if any. */
+static inline void unpack_free_stack(unpack_context* ctx)
+{
+    if (ctx->stack != ctx->embed_stack) {
+        PyMem_Free(ctx->stack);
+        ctx->stack = ctx->embed_stack;
+        ctx->stack_size = MSGPACK_EMBED_STACK_SIZE;
+    }
+}
+
+/* Double the stack of ctx, up to max_depth.  Returns -1 on memory error. */
+static int unpack_grow_stack(unpack_context* ctx)
+{
+    unsigned int size = ctx->stack_size;
+    unpack_stack* stack;
+
+    size = size > ctx->user.max_depth / 2 ? ctx->user.max_depth : size * 2;
+    if (ctx->stack == ctx->embed_stack) {
+        stack = (unpack_stack*)PyMem_Malloc(size * sizeof(unpack_stack));
+        if (stack != NULL) {
+            memcpy(stack, ctx->embed_stack, sizeof(ctx->embed_stack));
+        }
+    } else {
+        stack = (unpack_stack*)PyMem_Realloc(ctx->stack, size * sizeof(unpack_stack));
+    }
+    if (stack == NULL) {
+        PyErr_NoMemory();
+        return -1;
+    }
+    ctx->stack = stack;
+    ctx->stack_size = size;
+    return 0;
+}
+
 static inline PyObject* unpack_data(unpack_context* ctx)
 {
     return (ctx)->stack[0].obj;
@@ -61,9 +105,162 @@ static inline void unpack_clear(unpack_context *ctx)
         }
         Py_CLEAR(ctx->stack[i].obj);
     }
+    unpack_free_stack(ctx);
     unpack_init(ctx);
 }
 
+/* Return the plan to decode the container starting at stack[top] with, or NULL. */
+static inline PyObject* unpack_next_schema(unpack_user* u, unpack_stack* stack, unsigned int top)
+{
+    unpack_stack* c;
+    Py_ssize_t field;
+    PyObject* sub;
+
+    if (top == 0)
+        return u->schema;
+    c = &stack[top-1];
+    if (!c->schema)
+        return NULL;
+    if (!schema_is_record(c->schema))
+        return schema_item(c->schema);
+    if (c->ct == CT_MAP_VALUE)
+        field = c->field;
+    else if (c->ct == CT_ARRAY_ITEM)
+        field = c->count;
+    else
+        return NULL;
+    if (field < 0 || field >= schema_nfields(c->schema))
+        return NULL;
+    sub = PyTuple_GET_ITEM(schema_subplans(c->schema), field);
+    return sub == Py_None ? NULL : sub;
+}
+
+/* Return the select node to unpack the container starting at stack[top] with, or NULL. */
+static inline PyObject* unpack_next_select(unpack_user* u, unpack_stack* stack, unsigned int top)
+{
+    if (top == 0)
+        return u->select;
+    return stack[top-1].select ? stack[top-1].select_value : NULL;
+}
+
+/*
+ * Skip n objects starting at p, which are nested in `depth` containers.
+ * Only the objects still to skip in each enclosing container are stacked.
+ * Sets *end past them and returns 1, or returns 0 when the input is
+ * incomplete, -2 on invalid input, -3 when containers are nested deeper
+ * than max_depth and -1 on memory error.
+ */
+static inline int unpack_skip_objects(const unsigned char* p, const unsigned char* pe,
+                                      const unsigned char** end, size_t n,
+                                      unsigned int depth, unsigned int max_depth)
+{
+    size_t embed_outer[MSGPACK_EMBED_STACK_SIZE];
+    size_t* outer = embed_outer;  /* objects left in the enclosing containers */
+    size_t outer_size = MSGPACK_EMBED_STACK_SIZE;
+    size_t level = 0;
+    size_t size, count;
+    int ret = 1;
+
+    for (;;) {
+        while (n == 0 && level)
+            n = outer[--level];
+        if (n == 0)
+            break;
+        if (p >= pe) {
+            ret = 0;
+            break;
+        }
+        unsigned int b = *p;
+        --n;
+        if (b <= 0x7f || b >= 0xe0) {
+            ++p;
+            continue;
+        }
+        count = 0;
+        if (b >= 0xa0 && b <= 0xbf) {
+            size = 1 + (b & 0x1f);
+        } else if (b >= 0x90 && b <= 0x9f) {
+            count = b & 0x0f;
+            size = 1;
+        } else if (b <= 0x8f) {
+            count = 2 * (b & 0x0f);
+            size = 1;
+        } else {
+            /* Length fields are read only when the header is complete. */
+            switch (b) {
+            case 0xc0: case 0xc2: case 0xc3: size = 1; break;
+            case 0xcc: case 0xd0: size = 2; break;
+            case 0xcd: case 0xd1: case 0xd4: size = 3; break;
+            case 0xd5: size = 4; break;
+            case 0xca: case 0xce: case 0xd2: size = 5; break;
+            case 0xd6: size = 6; break;
+            case 0xcb: case 0xcf: case 0xd3: size = 9; break;
+            case 0xd7: size = 10; break;
+            case 0xd8: size = 18; break;
+            case 0xc4: case 0xd9: case 0xc7: size = 2; break;
+            case 0xc5: case 0xda: case 0xc8: case 0xdc: case 0xde: size = 3; break;
+            case 0xc6: case 0xdb: case 0xc9: case 0xdd: case 0xdf: size = 5; break;
+            default: ret = -2; goto _end;
+            }
+            if ((size_t)(pe - p) < size) {
+                ret = 0;
+                break;
+            }
+            switch (b) {
+            case 0xc4: case 0xd9: size += p[1]; break;
+            case 0xc5: case 0xda: size += _msgpack_load16(uint16_t, p+1); break;
+            case 0xc6: case 0xdb: size += _msgpack_load32(uint32_t, p+1); break;
+            case 0xc7: size += 1 + (size_t)p[1]; break;
+            case 0xc8: size += 1 + (size_t)_msgpack_load16(uint16_t, p+1); break;
+            case 0xc9: size += 1 + (size_t)_msgpack_load32(uint32_t, p+1); break;
+            case 0xdc: count = _msgpack_load16(uint16_t, p+1); break;
+            case 0xdd: count = _msgpack_load32(uint32_t, p+1); break;
+            case 0xde: count = 2 * (size_t)_msgpack_load16(uint16_t, p+1); break;
+            case 0xdf: count = 2 * (size_t)_msgpack_load32(uint32_t, p+1); break;
+            }
+        }
+        if ((b >= 0x80 && b <= 0x9f) || (b >= 0xdc && b <= 0xdf)) {
+            /* As in start_container, empty containers count too. */
+            if (depth + level >= max_depth) {
+                ret = -3;
+                break;
+            }
+            if (count) {
+                if (level == outer_size) {
+                    size_t* grown;
+                    outer_size *= 2;
+                    if (outer == embed_outer) {
+                        grown = (size_t*)PyMem_Malloc(outer_size * sizeof(size_t));
+                        if (grown != NULL)
+                            memcpy(grown, embed_outer, sizeof(embed_outer));
+                    } else {
+                        grown = (size_t*)PyMem_Realloc(outer, outer_size * sizeof(size_t));
+                    }
+                    if (grown == NULL) {
+                        PyErr_NoMemory();
+                        ret = -1;
+                        break;
+                    }
+                    outer = grown;
+                }
+                outer[level++] = n;
+                n = count;
+            }
+        }
+        if ((size_t)(pe - p) < size) {
+            ret = 0;
+            break;
+        }
+        p += size;
+    }
+_end:
+    if (outer != embed_outer)
+        PyMem_Free(outer);
+    if (ret == 1)
+        *end = p;
+    return ret;
+}
+
 static inline int unpack_execute(bool construct, unpack_context* ctx, const char* data, Py_ssize_t len, Py_ssize_t* off)
 {
     assert(len >= *off);
@@ -79,6 +276,11 @@ static inline int unpack_execute(bool construct, unpack_context* ctx, const char
     unpack_user* user = &ctx->user;
 
     PyObject* obj = NULL;
+    PyObject* schema = NULL;
+    PyObject* select = NULL;
+    PyObject* sub = NULL;
+    PyObject* shape = NULL;
+    const unsigned char* q = NULL;
     unpack_stack* c = NULL;
 
     int ret;
@@ -108,14 +310,54 @@ static inline int unpack_execute(bool construct, unpack_context* ctx, const char
     goto _fixed_trail_again
 
 #define start_container(func, count_, ct_) \
-    if(top >= MSGPACK_EMBED_STACK_SIZE) { ret = -3; goto _end; } \
-    if(construct_cb(func)(user, count_, &stack[top].obj) < 0) { goto _failed; } \
-    if((count_) == 0) { obj = stack[top].obj; \
-        if (construct_cb(func##_end)(user, &obj) < 0) { goto _failed; } \
-        goto _push; } \
+    if(top >= user->max_depth) { ret = -3; goto _end; } \
+    if(top >= ctx->stack_size) { \
+        if(unpack_grow_stack(ctx) < 0) { goto _failed; } \
+        stack = ctx->stack; \
+    } \
+    /* Not set when skipping, and the heap stack is not zeroed. */ \
+    stack[top].obj = NULL; \
+    shape = NULL; \
+    select = construct ? unpack_next_select(user, stack, top) : NULL; \
+    if(select && (ct_) == CT_ARRAY_ITEM && PyTuple_GET_ITEM(select, 1) == Py_False) { \
+        /* No item is selected: skip them all. */ \
+        ret = unpack_skip_objects(p + 1, pe, &q, count_, top + 1, user->max_depth); \
+        if(ret != 1) { goto _end; } \
+        p = q - 1; \
+        if(construct_cb(func)(user, 0, &obj) < 0) { goto _failed; } \
+        if(construct_cb(func##_end)(user, &obj) < 0) { goto _failed; } \
+        goto _push; \
+    } \
+    schema = construct ? unpack_next_schema(user, stack, top) : NULL; \
+    if(schema && !schema_is_record(schema) && (ct_) != CT_ARRAY_ITEM) { schema = NULL; } \
+    if(schema && schema_is_record(schema)) { \
+        if(unpack_callback_record##func(user, schema, count_, &stack[top].obj) < 0) { goto _failed; } \
+        if((count_) == 0) { obj = stack[top].obj; \
+            if (unpack_callback_record_end(user, schema, &obj) < 0) { goto _failed; } \
+            goto _push; } \
+    } else if((ct_) == CT_MAP_KEY && construct && user->shapes) { \
+        if(unpack_callback_shape_map(user, count_, &stack[top].obj) < 0) { goto _failed; } \
+        if((count_) == 0) { obj = stack[top].obj; \
+            if (unpack_callback_shape_end(user, user->shapes, &obj) < 0) { goto _failed; } \
+            goto _push; } \
+        shape = user->shapes; \
+    } else { \
+        if(construct_cb(func)(user, count_, &stack[top].obj) < 0) { goto _failed; } \
+        if((count_) == 0) { obj = stack[top].obj; \
+            if (construct_cb(func##_end)(user, &obj) < 0) { goto _failed; } \
+            goto _push; } \
+    } \
+    stack[top].schema = schema; \
+    stack[top].shape = shape; \
+    stack[top].field = -1; \
     stack[top].ct = ct_; \
     stack[top].size  = count_; \
     stack[top].count = 0; \
+    stack[top].select = select; \
+    if(select && (ct_) == CT_ARRAY_ITEM) { \
+        sub = PyTuple_GET_ITEM(select, 1); \
+        stack[top].select_value = sub == Py_None ? NULL : sub; \
+    } \
     ++top; \
     goto _header_again
 
@@ -279,6 +521,9 @@ static inline int unpack_execute(bool construct, unpack_context* ctx, const char
                 again_fixed_trail_if_zero(ACS_RAW_VALUE, _msgpack_load32(uint32_t,n), _raw_zero);
             case ACS_RAW_VALUE:
             _raw_zero:
+                if(top && stack[top-1].ct == CT_MAP_KEY) {
+                    push_variable_value(_map_key_raw, data, n, trail);
+                }
                 push_variable_value(_raw, data, n, trail);
 
             case ACS_EXT_VALUE:
@@ -304,10 +549,23 @@ static inline int unpack_execute(bool construct, unpack_context* ctx, const char
         }
 
 _push:
-    if(top == 0) { goto _finish; }
+    if(top == 0) {
+        if(construct && user->schema && unpack_callback_record_top(user, user->schema, obj) < 0) { Py_DECREF(obj); goto _failed; }
+        goto _finish;
+    }
     c = &stack[top-1];
     switch(c->ct) {
     case CT_ARRAY_ITEM:
+        if(c->schema && schema_is_record(c->schema)) {
+            if(unpack_callback_record_item(user, c->schema, c->count, &c->obj, obj) < 0) { goto _failed; }
+            if(++c->count == c->size) {
+                obj = c->obj;
+                if (unpack_callback_record_end(user, c->schema, &obj) < 0) { goto _failed; }
+                --top;
+                goto _push;
+            }
+            goto _header_again;
+        }
         if(construct_cb(_array_item)(user, c->count, &c->obj, obj) < 0) { goto _failed; }
         if(++c->count == c->size) {
             obj = c->obj;
@@ -318,15 +576,81 @@ _push:
         }
         goto _header_again;
     case CT_MAP_KEY:
+        if(c->shape) {
+            ret = unpack_callback_shape_key(user, &c->shape, obj);
+            if(ret < 0) { Py_DECREF(obj); goto _failed; }
+            if(ret == 0) {
+                c->map_key = NULL;
+                c->ct = CT_MAP_VALUE;
+                goto _header_again;
+            }
+            /* Not a str, or too many shapes: unpack the map into a dict. */
+            if(unpack_callback_shape_to_dict(user, c->shape, c->count, &c->obj) < 0) { Py_DECREF(obj); goto _failed; }
+            c->shape = NULL;
+        }
+        if(c->schema) {
+            c->map_key = NULL;
+            c->ct = CT_MAP_VALUE;
+            if(unpack_callback_record_key(user, c->schema, obj, &c->field) < 0) { goto _failed; }
+            goto _header_again;
+        }
+        if(c->select) {
+            sub = PyDict_GetItemWithError(PyTuple_GET_ITEM(c->select, 0), obj);
+            if(!sub) {
+                if(PyErr_Occurred()) { Py_DECREF(obj); goto _failed; }
+                sub = PyTuple_GET_ITEM(c->select, 1);
+            }
+            if(sub == Py_False) {
+                /* The value is not selected: skip it and drop the key.
+                 * The map shrinks, so that pairs are stored contiguously. */
+                Py_DECREF(obj);
+                ret = unpack_skip_objects(p + 1, pe, &q, 1, top, user->max_depth);
+                if(ret != 1) { goto _end; }
+                p = q - 1;
+                if(c->count == --c->size) {
+                    obj = c->obj;
+                    if (unpack_callback_select_map_end(user, c->size, &obj) < 0) { goto _failed; }
+                    --top;
+                    goto _push;
+                }
+                goto _header_again;
+            }
+            c->select_value = sub == Py_None ? NULL : sub;
+        }
         c->map_key = obj;
         c->ct = CT_MAP_VALUE;
         goto _header_again;
     case CT_MAP_VALUE:
+        if(c->shape) {
+            PyTuple_SET_ITEM(c->obj, c->count, obj);
+            if(++c->count == c->size) {
+                obj = c->obj;
+                if (unpack_callback_shape_end(user, c->shape, &obj) < 0) { goto _failed; }
+                --top;
+                goto _push;
+            }
+            c->ct = CT_MAP_KEY;
+            goto _header_again;
+        }
+        if(c->schema) {
+            if(unpack_callback_record_item(user, c->schema, c->field, &c->obj, obj) < 0) { goto _failed; }
+            if(++c->count == c->size) {
+                obj = c->obj;
+                if (unpack_callback_record_end(user, c->schema, &obj) < 0) { goto _failed; }
+                --top;
+                goto _push;
+            }
+            c->ct = CT_MAP_KEY;
+            goto _header_again;
+        }
         if(construct_cb(_map_item)(user, c->count, &c->obj, c->map_key, obj) < 0) { goto _failed; }
         c->map_key = NULL;
         if(++c->count == c->size) {
             obj = c->obj;
-            if (construct_cb(_map_end)(user, &obj) < 0) { goto _failed; }
+            if(c->select) {
+                if (unpack_callback_select_map_end(user, c->size, &obj) < 0) { goto _failed; }
+            }
+            else if (construct_cb(_map_end)(user, &obj) < 0) { goto _failed; }
             --top;
             /*printf("stack pop %d\n", top);*/
             goto _push;
@@ -349,7 +673,8 @@ _header_again:
 _finish:
     if (!construct)
         unpack_callback_nil(user, &obj);
-    stack[0].obj = obj;
+    unpack_free_stack(ctx);
+    ctx->stack[0].obj = obj;
     ++p;
     ret = 1;
     /*printf("-- finish --\n"); */
@@ -0,0 +1,70 @@
+from io import BytesIO
+
+from pytest import raises
+
+from msgpack import BufferFull, ExtType, Unpacker, packb, unpackb
+
+DATA = [b"x" * 100, "str", b"", {"k": b"v"}, ExtType(1, b"e")]
+
+
+def check_views(out, buffer):
+    assert out == DATA
+    for view in [out[0], out[2], out[3]["k"]]:
+        assert type(view) is memoryview
+        assert view.obj is buffer
+
+
+def test_unpackb_bin_as_view():
+    packed = packb(DATA)
+    out = unpackb(packed, bin_as_view=True)
+    check_views(out, packed)
+    assert unpackb(packed) == DATA
+
+
+def test_unpackb_bin_as_view_aliases_input():
+    packed = bytearray(packb([b"abc"]))
+    out = unpackb(packed, bin_as_view=True)
+    packed[-1:] = b"z"
+    assert out[0] == b"abz"
+    assert out[0].readonly is False
+
+
+def test_unpackb_bin_as_view_memoryview_input():
+    packed = packb([b"abc", b"de"])
+    out = unpackb(memoryview(packed)[0:], bin_as_view=True)
+    assert out == [b"abc", b"de"]
+    out = unpackb(memoryview(b"\x00" + packed)[1:], bin_as_view=True)
+    assert out == [b"abc", b"de"]
+
+
+def test_unpacker_bin_as_view():
+    messages = [packb(d) for d in DATA]
+    unpacker = Unpacker(bin_as_view=True)
+    for m in messages:
+        unpacker.feed(m)
+        assert list(unpacker) == [unpackb(m, bin_as_view=True)]
+    assert unpacker.tell() == sum(map(len, messages))
+
+
+def test_unpacker_bin_as_view_split():
+    # An object split across feeds is completed from a copy.
+    packed = b"".join(packb(d) for d in DATA)
+    for step in [1, 7, 50]:
+        unpacker = Unpacker(bin_as_view=True)
+        out = []
+        for i in range(0, len(packed), step):
+            unpacker.feed(packed[i : i + step])
+            out.extend(unpacker)
+        assert out == DATA
+        assert unpacker.tell() == len(packed)
+
+
+def test_unpacker_bin_as_view_file_like():
+    with raises(ValueError):
+        Unpacker(BytesIO(b""), bin_as_view=True)
+
+
+def test_unpacker_bin_as_view_buffer_full():
+    unpacker = Unpacker(bin_as_view=True, max_buffer_size=10)
+    with raises(BufferFull):
+        unpacker.feed(b"\x00" * 11)
@@ -47,3 +47,44 @@ def test_packer_getbuffer():
         buffer.release()
         packer.pack(42)
         assert bytes(packer) == b"\x92*\xa5hello*"
+
+
+def test_pack_into():
+    packer = Packer()
+    buf = bytearray(16)
+    n = packer.pack_into([1, "foo"], buf)
+    assert n == 6
+    assert bytes(buf[:n]) == packb([1, "foo"])
+
+    n2 = packer.pack_into(b"bar", buf, n)
+    assert unpackb(buf[n : n + n2]) == b"bar"
+
+
+def test_pack_into_memoryview():
+    buf = bytearray(8)
+    n = Packer().pack_into({"a": 1}, memoryview(buf)[2:])
+    assert unpackb(buf[2 : 2 + n]) == {"a": 1}
+
+
+def test_pack_into_too_small():
+    packer = Packer()
+    with raises(ValueError, match="21 bytes required"):
+        packer.pack_into("x" * 20, bytearray(10))
+    with raises(ValueError):
+        packer.pack_into(1, bytearray(10), 11)
+    # packer is still usable
+    assert packer.pack(1) == b"\x01"
+
+
+def test_pack_into_readonly():
+    with raises((BufferError, TypeError)):
+        Packer().pack_into(1, b"\x00" * 10)
+
+
+def test_pack_into_keeps_internal_buffer():
+    packer = Packer(autoreset=False)
+    packer.pack(1)
+    buf = bytearray(4)
+    assert packer.pack_into(2, buf) == 1
+    packer.pack(3)
+    assert packer.bytes() == b"\x01\x03"
@@ -0,0 +1,57 @@
+from pytest import raises
+
+from msgpack import Unpacker, packb, unpackb, unpackb_many
+
+RECORDS = [{"status": "ok", "country": "FR", "tag": b"t1", "pair": [1, "x"]} for _ in range(5)]
+
+
+def test_dedup_values():
+    data = packb(RECORDS)
+    ret = unpackb(data, dedup_values=16)
+    assert ret == RECORDS
+    assert ret[0]["status"] is ret[4]["status"]
+    assert ret[0]["tag"] is ret[4]["tag"]
+    assert ret[0]["pair"] is not ret[4]["pair"]
+
+    ret = unpackb(data, dedup_values=16, use_list=False)
+    assert ret[0]["pair"] == (1, "x")
+    assert ret[0]["pair"] is ret[4]["pair"]
+    assert ret[0]["country"] is ret[4]["country"]
+
+    ret = unpackb(data, raw=True, dedup_values=16)
+    assert ret[0][b"status"] == b"ok"
+    assert ret[0][b"status"] is ret[4][b"status"]
+
+
+def test_dedup_values_disabled():
+    ret = unpackb(packb(["".join(["a", "b"])] * 2))
+    assert ret == ["ab", "ab"]
+    assert ret[0] is not ret[1]
+    with raises(ValueError):
+        unpackb(b"\x90", dedup_values=-1)
+    with raises(ValueError):
+        Unpacker(dedup_values=-1)
+
+
+def test_dedup_values_types():
+    # Equal but different objects are not shared.
+    values = [(1,), (True,), (1.0,), "a", b"a", ("a",), (b"a",), "é", "é"]
+    ret = unpackb(packb(values, use_bin_type=True), use_list=False, dedup_values=4)
+    assert ret == tuple(values)
+    assert [type(x[0]) for x in ret[:3]] == [int, bool, float]
+    assert type(ret[3]) is str
+    assert type(ret[4]) is bytes
+    long = "x" * 100
+    ret = unpackb(packb([long, long]), dedup_values=4)
+    assert ret == [long, long]
+
+
+def test_dedup_values_unpacker():
+    unpacker = Unpacker(dedup_values=2, use_list=False)
+    unpacker.feed(packb(RECORDS) * 2)
+    first = unpacker.unpack()
+    second = unpacker.unpack()
+    assert list(first) == list(second) == [{**r, "pair": (1, "x")} for r in RECORDS]
+    assert unpackb_many([packb("value")] * 2, dedup_values=1) == ["value"] * 2
+    one, two = unpackb_many([packb("value")] * 2, dedup_values=1)
+    assert one is two
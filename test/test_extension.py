@@ -1,4 +1,7 @@
 import array
+import pickle
+
+import pytest
 
 import msgpack
 from msgpack import ExtType
@@ -85,3 +88,20 @@ def test_overriding_hooks():
     testout = msgpack.packb(obj, default=default)
 
     assert refout == testout
+
+
+def test_ext_type_api():
+    ext = ExtType(1, b"abc")
+    assert ext == (1, b"abc")
+    assert ext.code == 1 and ext.data == b"abc"
+    assert repr(ext) == "ExtType(code=1, data=b'abc')"
+    assert ext._replace(code=2) == ExtType(2, b"abc")
+    assert pickle.loads(pickle.dumps(ext)) == ext
+    assert type(pickle.loads(pickle.dumps(ext))) is ExtType
+    assert type(msgpack.unpackb(msgpack.packb(ext))) is ExtType
+    with pytest.raises(TypeError):
+        ExtType("1", b"abc")
+    with pytest.raises(TypeError):
+        ExtType(1, "abc")
+    with pytest.raises(ValueError):
+        ExtType(128, b"abc")
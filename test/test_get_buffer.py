@@ -0,0 +1,97 @@
+import socket
+
+from pytest import raises
+
+from msgpack import BufferFull, OutOfData, Unpacker, packb
+
+OBJECTS = [1, "abc", [1, 2, {"a": b"x" * 1000}], None, 2**64 - 1]
+
+
+def test_get_buffer():
+    data = b"".join(packb(o) for o in OBJECTS)
+    unpacker = Unpacker(read_size=16)
+    result = []
+    pos = 0
+    while pos < len(data):
+        buf = unpacker.get_buffer(7)
+        assert len(buf) >= 7
+        n = min(7, len(data) - pos)
+        buf[:n] = data[pos : pos + n]
+        unpacker.buffer_updated(n)
+        pos += n
+        result.extend(unpacker)
+    assert result == OBJECTS
+    assert unpacker.tell() == len(data)
+
+
+def test_get_buffer_mixed_with_feed():
+    unpacker = Unpacker()
+    unpacker.feed(b"\x93\x01")
+    buf = unpacker.get_buffer()
+    buf[:1] = b"\x02"
+    unpacker.buffer_updated(1)
+    with raises(OutOfData):
+        unpacker.unpack()
+    unpacker.feed(b"\x03")
+    assert unpacker.unpack() == [1, 2, 3]
+
+
+def test_get_buffer_recv_into():
+    data = b"".join(packb(o) for o in OBJECTS) * 10
+    a, b = socket.socketpair()
+    with a, b:
+        a.sendall(data)
+        a.close()
+        unpacker = Unpacker()
+        result = []
+        while True:
+            n = b.recv_into(unpacker.get_buffer(1024))
+            if not n:
+                break
+            unpacker.buffer_updated(n)
+            result.extend(unpacker)
+    assert result == OBJECTS * 10
+
+
+def test_get_buffer_max_buffer_size():
+    unpacker = Unpacker(max_buffer_size=10)
+    buf = unpacker.get_buffer(100)
+    assert len(buf) == 10
+    buf[:10] = b"\x01" * 10
+    unpacker.buffer_updated(10)
+    with raises(BufferFull):
+        unpacker.get_buffer()
+    assert unpacker.unpack() == 1
+    assert 1 <= len(unpacker.get_buffer(100)) <= 10
+
+
+def test_buffer_updated_invalid():
+    unpacker = Unpacker()
+    with raises(ValueError):
+        unpacker.buffer_updated(0)
+    buf = unpacker.get_buffer(10)
+    with raises(ValueError):
+        unpacker.buffer_updated(len(buf) + 1)
+    with raises(ValueError):
+        unpacker.buffer_updated(-1)
+    unpacker.buffer_updated(0)
+    with raises(ValueError):
+        unpacker.buffer_updated(0)
+
+
+def test_get_buffer_stale_slice():
+    unpacker = Unpacker(read_size=16)
+    buf = unpacker.get_buffer(16)
+    part = buf[0:16]
+    part[:1] = b"\x01"
+    unpacker.buffer_updated(1)
+    assert unpacker.unpack() == 1
+    # The buffer is not moved nor replaced while a slice of it is in use.
+    with raises(BufferError):
+        unpacker.feed(b"\x02" * 100)
+    with raises(BufferError):
+        unpacker.get_buffer(100)
+    part.release()
+    unpacker.feed(b"\x02" * 100)
+    assert list(unpacker) == [2] * 100
+    assert len(unpacker.get_buffer(100)) >= 100
@@ -0,0 +1,73 @@
+import sys
+
+from pytest import raises
+
+from msgpack import Unpacker, packb, unpackb, unpackb_many
+
+RECORDS = [{"id": i, "name": "x" * i, "ключ": i, "k" * 100: i} for i in range(10)]
+DATA = b"".join(packb(r) for r in RECORDS)
+
+
+def test_key_cache():
+    for key_cache in (0, 1, 256):
+        unpacker = Unpacker(key_cache=key_cache)
+        unpacker.feed(DATA)
+        assert list(unpacker) == RECORDS
+
+
+def test_key_cache_unpackb_many():
+    payloads = [packb(r) for r in RECORDS]
+    assert unpackb_many(payloads) == RECORDS
+    assert unpackb_many(payloads, key_cache=0) == RECORDS
+    assert unpackb_many(payloads, key_cache=2) == RECORDS
+    with raises(ValueError):
+        unpackb_many(payloads, key_cache=-1)
+    with raises(ValueError):
+        Unpacker(key_cache=-1)
+
+
+def test_intern_keys():
+    key = "".join(["dynamic", "_key"])
+    data = packb({key: 1})
+    assert unpackb(data).popitem()[0] is sys.intern(key)
+    unpacker = Unpacker(intern_keys=False, key_cache=0)
+    unpacker.feed(data * 2)
+    k1 = unpacker.unpack().popitem()[0]
+    k2 = unpacker.unpack().popitem()[0]
+    assert k1 == k2 == key
+    assert k1 is not k2
+    assert unpackb(data, intern_keys=False) == {key: 1}
+
+
+def test_key_cache_shares_keys():
+    unpacker = Unpacker(intern_keys=False)
+    unpacker.feed(packb({"cached_key": 1}) * 2)
+    k1 = unpacker.unpack().popitem()[0]
+    k2 = unpacker.unpack().popitem()[0]
+    assert k1 == k2 == "cached_key"
+    if Unpacker.__module__ != "msgpack.fallback":
+        assert k1 is k2
+
+
+def test_key_cache_options():
+    data = packb({"a": 1, "bc": [{"a": 2}]})
+    assert unpackb_many([data], raw=True) == [{b"a": 1, b"bc": [{b"a": 2}]}]
+    assert unpackb_many([data] * 2, select=[("bc", "*", "a")]) == [{"bc": [{"a": 2}]}] * 2
+    # max_str_len applies to cached keys too.
+    unpacker = Unpacker(max_str_len=1)
+    unpacker.feed(data)
+    with raises(ValueError):
+        unpacker.unpack()
+    # Invalid keys are not cached.
+    bad = b"\x81\xa2a\xff\x01"
+    assert unpackb_many([bad] * 2, unicode_errors="replace") == [{"a�": 1}] * 2
+    with raises(UnicodeDecodeError):
+        unpackb_many([bad])
+
+
+def test_key_cache_collisions():
+    # More keys than slots.
+    records = [{str(i): i for i in range(100)}] * 3
+    unpacker = Unpacker(key_cache=4)
+    unpacker.feed(b"".join(packb(r) for r in records))
+    assert list(unpacker) == records
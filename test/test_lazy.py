@@ -0,0 +1,128 @@
+from collections.abc import Mapping, Sequence
+
+from pytest import raises
+
+from msgpack import (
+    ExtraData,
+    ExtType,
+    FormatError,
+    LazyList,
+    LazyMap,
+    Timestamp,
+    packb,
+    unpackb,
+    unpackb_lazy,
+)
+
+DOC = {
+    "id": 42,
+    "name": "doc",
+    "tags": ["a", "b", {"c": [1, 2.5]}],
+    "nested": {"deep": {"deeper": [None, True, b"bin"]}},
+    "empty": {},
+    "none": [],
+    "ext": ExtType(1, b"x"),
+    "ts": Timestamp(1, 2),
+}
+
+
+def test_unpackb_lazy():
+    doc = unpackb_lazy(packb(DOC))
+    assert isinstance(doc, LazyMap)
+    assert isinstance(doc, Mapping)
+    assert doc["id"] == 42
+    assert doc["nested"]["deep"]["deeper"][2] == b"bin"
+    assert isinstance(doc["tags"], LazyList)
+    assert isinstance(doc["tags"], Sequence)
+    assert doc == DOC
+    assert dict(doc).keys() == DOC.keys()
+    assert len(doc) == len(DOC)
+    assert "name" in doc
+    assert "missing" not in doc
+    assert doc.get("missing") is None
+    with raises(KeyError):
+        doc["missing"]
+
+
+def test_values_are_cached():
+    doc = unpackb_lazy(packb(DOC))
+    assert doc["nested"] is doc["nested"]
+    assert doc["tags"][2] is doc["tags"][-1]
+
+
+def test_lazy_list():
+    items = list(range(20)) + ["x", [1, [2]]]
+    lst = unpackb_lazy(packb(items))
+    assert len(lst) == len(items)
+    assert lst == items
+    assert lst[-1][1] == [2]
+    assert lst[3:10:2] == items[3:10:2]
+    assert list(reversed(lst))[0] == lst[-1]
+    assert lst.index("x") == 20
+    with raises(IndexError):
+        lst[len(items)]
+    with raises(IndexError):
+        lst[-len(items) - 1]
+
+
+def test_scalar():
+    assert unpackb_lazy(packb(1)) == 1
+    assert unpackb_lazy(packb("abc")) == "abc"
+    assert unpackb_lazy(packb(b"abc")) == b"abc"
+
+
+def test_options():
+    packed = packb({"a": Timestamp(1, 0), 1: "x"})
+    with raises(ValueError):
+        list(unpackb_lazy(packed))
+    doc = unpackb_lazy(packed, timestamp=1, strict_map_key=False)
+    assert doc["a"] == 1.0
+    assert doc[1] == "x"
+    doc = unpackb_lazy(packb({"a": "b"}), raw=True)
+    assert doc[b"a"] == b"b"
+
+
+def test_key_lookup():
+    # Keys are matched by type, and the last of duplicate keys wins.
+    packed = b"\x84\xa1a\x01\xc4\x01a\x02\xda\x00\x01b\x03\xa1a\x04"
+    doc = unpackb_lazy(packed)
+    assert doc["a"] == 4
+    assert doc[b"a"] == 2
+    assert doc["b"] == 3
+    assert b"b" not in doc
+    assert dict(doc) == unpackb(packed)
+    doc = unpackb_lazy(packed, raw=True)
+    assert doc[b"a"] == 4
+    assert "a" not in doc
+
+    packed = packb({"\xe9": 1, "\udce9": 2}, unicode_errors="surrogateescape")
+    doc = unpackb_lazy(packed, unicode_errors="surrogateescape")
+    assert doc["\xe9"] == 1
+    assert doc["\udce9"] == 2
+
+
+def test_invalid():
+    packed = packb(DOC)
+    with raises(ValueError):
+        unpackb_lazy(packed[:-1])
+    with raises(ValueError):
+        unpackb_lazy(b"")
+    with raises(FormatError):
+        unpackb_lazy(b"\x91\xc1")
+    with raises(ExtraData) as e:
+        unpackb_lazy(packed + b"\x01")
+    assert e.value.unpacked == DOC
+    assert e.value.extra == b"\x01"
+
+
+def test_errors_on_access():
+    doc = unpackb_lazy(packb({"ok": 1, "bad": b"\xff"}, use_bin_type=False))
+    assert doc["ok"] == 1
+    with raises(UnicodeDecodeError):
+        doc["bad"]
+
+
+def test_bytearray_input():
+    packed = bytearray(packb(DOC))
+    doc = unpackb_lazy(packed)
+    assert doc == unpackb(bytes(packed))
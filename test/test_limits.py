@@ -8,6 +8,7 @@ from msgpack import (
     Packer,
     PackOverflowError,
     PackValueError,
+    StackError,
     Unpacker,
     UnpackValueError,
     packb,
@@ -184,6 +185,44 @@ def test_nest_limit_1024():
     assert result is None
 
 
+def test_max_depth():
+    packed = b"\x91" * 5 + b"\xc0"
+    assert unpackb(packed, max_depth=5) == [[[[[None]]]]]
+    with pytest.raises(StackError):
+        unpackb(packed, max_depth=4)
+    packed = b"\x81\xa1a" * 3 + b"\x90"
+    with pytest.raises(StackError):
+        unpackb(packed, max_depth=3)
+    unpacker = Unpacker(max_depth=3)
+    unpacker.feed(packed)
+    with pytest.raises(StackError):
+        unpacker.skip()
+    with pytest.raises(ValueError):
+        unpackb(packed, max_depth=0)
+
+
+def test_max_depth_spill():
+    # Nesting deeper than the stack embedded in the unpack context.
+    depth = 3000
+    packed = b"\x91" * depth + b"\x81\xa1a\x01"
+    with pytest.raises(StackError):
+        unpackb(packed)
+    if Unpacker.__module__ == "msgpack.fallback":
+        return
+    result = unpackb(packed, max_depth=depth + 1)
+    for _ in range(depth):
+        result = result[0]
+    assert result == {"a": 1}
+    # Unpacker keeps the deep stack across feeds.
+    unpacker = Unpacker(max_depth=depth + 1)
+    for i in range(0, len(packed), 100):
+        unpacker.feed(packed[i : i + 100])
+        objs = list(unpacker)
+    assert len(objs) == 1
+    unpacker.feed(packb([[1]]))
+    assert unpacker.unpack() == [[1]]
+
+
 def test_auto_max_map_len():
     # len(packed) == 6 -> max_map_len == 3
     packed = b"\xde\x00\x04zzz"
@@ -0,0 +1,114 @@
+from collections import namedtuple
+from dataclasses import dataclass
+
+from pytest import raises
+
+from msgpack import Unpacker, packb, unpackb, unpackb_many
+
+RECORDS = [{"id": i, "name": "n%d" % i, "tags": ["a"]} for i in range(5)]
+
+
+def test_map_records_tuple():
+    assert unpackb(packb(RECORDS), map_records="tuple") == [(i, "n%d" % i, ["a"]) for i in range(5)]
+    assert unpackb(packb({}), map_records="tuple") == ()
+    # Nested maps are records too.
+    assert unpackb(packb({"a": {"b": 1}}), map_records="tuple") == ((1,),)
+
+
+def test_map_records_namedtuple():
+    ret = unpackb(packb(RECORDS), map_records="namedtuple")
+    assert [r._asdict() for r in ret] == RECORDS
+    assert ret[0].name == "n0"
+    assert type(ret[0]) is type(ret[4])
+    ret = unpackb(packb([{"a": 1, "b": 2}, {"b": 2, "a": 1}, {"a": 1}]), map_records="namedtuple")
+    assert ret[0]._fields == ("a", "b")
+    assert ret[1]._fields == ("b", "a")
+    assert ret[2]._fields == ("a",)
+    # Invalid field names are renamed.
+    ret = unpackb(packb({"class": 1, "x y": 2, "ok": 3}), map_records="namedtuple")
+    assert ret == (1, 2, 3)
+    assert ret.ok == 3
+
+
+def test_map_records_factory():
+    shapes = []
+
+    @dataclass
+    class Point:
+        x: int
+        y: int
+
+    def factory(keys):
+        shapes.append(keys)
+        if keys == ("x", "y"):
+            return Point
+        return namedtuple("Other", keys)
+
+    data = packb([{"x": 1, "y": 2}, {"x": 3, "y": 4}, {"z": 5}, {"x": 6, "y": 7}])
+    assert unpackb(data, map_records=factory) == [Point(1, 2), Point(3, 4), (5,), Point(6, 7)]
+    assert shapes == [("x", "y"), ("z",)]
+
+    shapes.clear()
+    unpacker = Unpacker(map_records=factory)
+    unpacker.feed(data + data)
+    assert list(unpacker) == [unpackb(data, map_records=factory)] * 2
+    assert shapes == [("x", "y"), ("z",)] * 2
+
+
+def test_map_records_not_str_keys():
+    data = packb([{"a": 1, 2: "b", "c": 3}, {1: 2}, {"a": 1}])
+    ret = unpackb(data, map_records="tuple", strict_map_key=False)
+    assert ret == [{"a": 1, 2: "b", "c": 3}, {1: 2}, (1,)]
+    with raises(ValueError):
+        unpackb(data, map_records="tuple")
+    ret = unpackb(packb({b"a": 1}, use_bin_type=True), map_records="tuple")
+    assert ret == {b"a": 1}
+
+
+def test_map_records_stream():
+    data = b"".join(packb(r) for r in RECORDS)
+    unpacker = Unpacker(map_records="namedtuple")
+    result = []
+    for i in range(0, len(data), 3):
+        unpacker.feed(data[i : i + 3])
+        result.extend(unpacker)
+    assert [r._asdict() for r in result] == RECORDS
+    ret = unpackb_many([packb(r) for r in RECORDS], map_records="tuple")
+    assert ret == [tuple(r.values()) for r in RECORDS]
+
+
+def test_map_records_max_shapes():
+    # The shape trie stops growing: maps of new keys become dicts.
+    unpacker = Unpacker(map_records="tuple")
+    maps = [{"k%d" % i: i} for i in range(3000)]
+    unpacker.feed(packb(maps))
+    ret = unpacker.unpack()
+    assert ret[:2047] == [(i,) for i in range(2047)]
+    assert ret[2047:] == maps[2047:]
+    unpacker.feed(packb([{"k0": 0}, {"k0": 0, "x": 1}, {"k0": 0, "k1": 1}]))
+    assert unpacker.unpack() == [(0,), {"k0": 0, "x": 1}, {"k0": 0, "k1": 1}]
+
+    big = {"k%d" % i: i for i in range(3000)}
+    assert unpackb(packb(big), map_records="tuple") == big
+
+
+def test_map_records_invalid():
+    with raises(TypeError):
+        unpackb(b"\x80", map_records="list")
+    with raises(TypeError):
+        unpackb(b"\x80", map_records="tuple", object_hook=dict)
+    with raises(TypeError):
+        Unpacker(map_records="tuple", object_pairs_hook=dict)
+    with raises(ValueError):
+        unpackb(b"\x80", map_records="tuple", select=[("a",)])
+    with raises(ValueError):
+        unpackb_many([], map_records="tuple", select=[("a",)])
+    Point = namedtuple("Point", ["x", "y"])
+    with raises(ValueError):
+        Unpacker(map_records="tuple", schema=Point)
+
+    def factory(keys):
+        raise KeyError(keys)
+
+    with raises(KeyError):
+        unpackb(packb([{"a": 1}]), map_records=factory)
@@ -0,0 +1,90 @@
+import io
+import mmap
+
+from pytest import raises
+
+import msgpack
+from msgpack import Unpacker, packb, scan_offsets
+
+OBJECTS = [1, "abc", [1, {"a": b"bin"}], b"x" * 1000, {"k": "v" * 300}]
+DATA = b"".join(packb(o) for o in OBJECTS)
+
+
+def test_zero_copy_feed():
+    buf = bytearray(DATA)
+    unpacker = Unpacker(zero_copy=True)
+    unpacker.feed(buf)
+    # The data is used in place, so it can't be resized.
+    with raises(BufferError):
+        buf.extend(b"\x00")
+    assert list(unpacker) == OBJECTS
+    assert unpacker.tell() == len(DATA)
+
+
+def test_zero_copy_feed_split():
+    unpacker = Unpacker(zero_copy=True)
+    result = []
+    for i in range(0, len(DATA), 7):
+        unpacker.feed(DATA[i : i + 7])
+        result.extend(unpacker)
+    assert result == OBJECTS
+
+
+def test_zero_copy_mmap(tmp_path):
+    path = tmp_path / "data.msgpack"
+    path.write_bytes(DATA)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        unpacker = Unpacker(zero_copy=True)
+        unpacker.feed(m)
+        assert list(unpacker) == OBJECTS
+        del unpacker
+
+
+def test_zero_copy_file(tmp_path):
+    path = tmp_path / "data.msgpack"
+    path.write_bytes(b"\xc0" + DATA)
+    offsets = [o for o in scan_offsets(b"\xc0" + DATA)][1:]
+    with open(path, "rb") as f:
+        f.seek(1)
+        unpacker = Unpacker(f, zero_copy=True)
+        assert list(unpacker) == OBJECTS
+        assert unpacker.tell() == len(DATA)
+        unpacker.seek(offsets[2])
+        assert unpacker.unpack() == OBJECTS[2]
+        assert unpacker.read_bytes(3) == DATA[offsets[3] - 1 : offsets[3] + 2]
+        with raises(AssertionError):
+            unpacker.feed(b"\xc0")
+
+
+def test_bin_as_view_file(tmp_path):
+    path = tmp_path / "data.msgpack"
+    path.write_bytes(DATA)
+    with open(path, "rb") as f:
+        result = list(Unpacker(f, bin_as_view=True))
+    assert result == OBJECTS
+    assert isinstance(result[3], memoryview)
+
+
+def test_zero_copy_file_like_not_mappable():
+    with raises(ValueError):
+        Unpacker(io.BytesIO(DATA), zero_copy=True)
+
+
+def test_unpack_file(tmp_path, monkeypatch):
+    path = tmp_path / "data.msgpack"
+    packed = packb(OBJECTS)
+    path.write_bytes(b"\xc0" + packed)
+    for threshold in (0, 1 << 30):
+        monkeypatch.setattr(msgpack._mmap, "MAP_THRESHOLD", threshold)
+        with open(path, "rb") as f:
+            f.seek(1)
+            assert msgpack.unpack(f) == OBJECTS
+            assert f.tell() == len(packed) + 1
+            f.seek(0)
+            with raises(msgpack.ExtraData):
+                msgpack.unpack(f)
+    # Views of the mapped file stay valid.
+    with open(path, "rb") as f:
+        f.seek(1)
+        result = msgpack.unpack(f, bin_as_view=True)
+    assert result[3] == OBJECTS[3]
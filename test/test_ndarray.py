@@ -0,0 +1,109 @@
+import subprocess
+import sys
+
+import pytest
+
+from msgpack import ExtType, Packer, Unpacker, packb, unpackb
+
+np = pytest.importorskip("numpy")
+
+CODE = 42
+
+
+def roundtrip(obj, **kwargs):
+    packed = packb(obj, ndarray_ext_code=CODE)
+    return unpackb(packed, ndarray_ext_code=CODE, **kwargs)
+
+
+@pytest.mark.parametrize(
+    "arr",
+    [
+        np.arange(10, dtype=np.float32),
+        np.arange(24, dtype=np.int64).reshape(2, 3, 4),
+        np.arange(6, dtype=">i4").reshape(3, 2),
+        np.array(3.5),
+        np.zeros((0, 3)),
+        np.array([True, False]),
+        np.array(["ab", "c"]),
+        np.array(["2000-01-01"], dtype="datetime64[ns]"),
+    ],
+)
+def test_roundtrip(arr):
+    out = roundtrip(arr)
+    assert out.dtype == arr.dtype
+    assert out.shape == arr.shape
+    assert np.array_equal(out, arr)
+    assert not out.flags.writeable
+
+
+def test_non_contiguous():
+    arr = np.arange(20).reshape(4, 5)[:, ::2]
+    assert np.array_equal(roundtrip(arr), arr)
+    arr = np.asfortranarray(np.arange(6).reshape(2, 3))
+    assert np.array_equal(roundtrip(arr), arr)
+
+
+def test_nested():
+    data = {"a": np.arange(3), "b": [np.ones(2), 1]}
+    out = roundtrip(data)
+    assert np.array_equal(out["a"], data["a"])
+    assert np.array_equal(out["b"][0], data["b"][0])
+
+
+@pytest.mark.skipif(
+    Unpacker.__module__ == "msgpack.fallback",
+    reason="the fallback Unpacker copies its input",
+)
+def test_unpackb_is_view():
+    packed = bytearray(packb(np.arange(4, dtype=np.int32), ndarray_ext_code=CODE))
+    out = unpackb(packed, ndarray_ext_code=CODE)
+    assert out.base is not None
+    packed[-4:] = b"\x07\x00\x00\x00"
+    assert out[-1] == np.frombuffer(b"\x07\x00\x00\x00", out.dtype)[0]
+
+
+def test_unpacker():
+    arrays = [np.arange(i, dtype=np.float64) for i in range(5)]
+    packer = Packer(ndarray_ext_code=CODE)
+    unpacker = Unpacker(ndarray_ext_code=CODE)
+    for arr in arrays:
+        unpacker.feed(packer.pack(arr))
+    for arr, out in zip(arrays, unpacker):
+        assert np.array_equal(out, arr)
+
+
+def test_disabled():
+    with pytest.raises(TypeError):
+        packb(np.arange(3))
+    packed = packb(np.arange(3), ndarray_ext_code=CODE)
+    assert isinstance(unpackb(packed), ExtType)
+
+
+def test_unsupported_dtype():
+    with pytest.raises(TypeError):
+        packb(np.array([object()]), ndarray_ext_code=CODE)
+    with pytest.raises(TypeError):
+        packb(np.zeros(2, dtype="i4,f4"), ndarray_ext_code=CODE)
+
+
+def test_invalid_data():
+    with pytest.raises(ValueError):
+        data = b"\x03<f4\x01" + (2).to_bytes(8, "big") + b"\x00" * 4
+        unpackb(packb(ExtType(CODE, data)), ndarray_ext_code=CODE)
+    with pytest.raises(ValueError):
+        unpackb(packb(ExtType(CODE, b"\x02|O\x00" + b"\x00" * 8)), ndarray_ext_code=CODE)
+    with pytest.raises(ValueError):
+        unpackb(packb(ExtType(CODE, b"\x09")), ndarray_ext_code=CODE)
+
+
+def test_invalid_code():
+    with pytest.raises(ValueError):
+        Packer(ndarray_ext_code=128)
+    with pytest.raises(ValueError):
+        Unpacker(ndarray_ext_code=-1)
+
+
+def test_numpy_not_imported():
+    # numpy is imported when ndarray_ext_code is used, not with msgpack.
+    code = "import sys, msgpack; assert 'numpy' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
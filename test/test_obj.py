@@ -1,8 +1,15 @@
 #!/usr/bin/env python
 
+import uuid
+from dataclasses import dataclass, field
+from fractions import Fraction
+from ipaddress import IPv4Address
+from pathlib import PurePosixPath
+from typing import NamedTuple
+
 from pytest import raises
 
-from msgpack import packb, unpackb
+from msgpack import Packer, packb, unpackb
 
 
 def _decode_complex(obj):
@@ -80,3 +87,95 @@ def test_an_exception_in_objecthook2():
     with raises(DecodeError):
         packed = packb({1: [{"__complex__": True, "real": 1, "imag": 2}]})
         unpackb(packed, list_hook=bad_complex_decoder, use_list=1, strict_map_key=False)
+
+
+@dataclass
+class Point:
+    x: int
+    y: int
+    tags: list = field(default_factory=list)
+
+
+class Pair(NamedTuple):
+    first: int
+    second: str
+
+
+class Slotted:
+    __slots__ = ("a", "__b")
+    __msgpack_slots__ = True
+
+    def __init__(self, a, b):
+        self.a = a
+        self.__b = b
+
+
+class SlottedChild(Slotted):
+    __slots__ = "c"
+
+    def __init__(self, a, b, c):
+        super().__init__(a, b)
+        self.c = c
+
+
+def test_pack_objects_map():
+    packer = Packer(pack_objects="map")
+    assert packer.pack(Point(1, 2, [Point(3, 4)])) == packb(
+        {"x": 1, "y": 2, "tags": [{"x": 3, "y": 4, "tags": []}]}
+    )
+    assert packer.pack(Pair(1, "a")) == packb({"first": 1, "second": "a"})
+    assert packer.pack(Slotted(1, 2)) == packb({"a": 1, "_Slotted__b": 2})
+    assert packer.pack(SlottedChild(1, 2, 3)) == packb({"a": 1, "_Slotted__b": 2, "c": 3})
+
+
+def test_pack_objects_array():
+    packer = Packer(pack_objects="array")
+    assert packer.pack([Point(1, 2), Pair(3, "b")]) == packb([[1, 2, []], [3, "b"]])
+
+
+def test_pack_objects_other_types():
+    class Plain:
+        pass
+
+    packer = Packer(pack_objects="map", default=lambda obj: "plain")
+    assert packer.pack([Plain(), (1, 2), [3]]) == packb(["plain", (1, 2), [3]])
+    packer = Packer(pack_objects="map", type_encoders={Point: lambda p: p.x})
+    assert packer.pack(Point(1, 2)) == packb(1)
+
+
+def test_pack_objects_opt_in():
+    # Classes using __slots__ without __msgpack_slots__ are left to default.
+    class Private:
+        __slots__ = ("_x",)
+
+    packer = Packer(pack_objects="map", default=repr)
+    for obj in (uuid.UUID(int=1), Fraction(1, 3), IPv4Address("1.2.3.4"), PurePosixPath("a")):
+        assert packer.pack(obj) == packb(repr(obj))
+    with raises(TypeError):
+        Packer(pack_objects="map").pack(Private())
+
+
+def test_pack_objects_default_first():
+    packer = Packer(pack_objects="map", default=lambda p: [p.x, p.y])
+    assert packer.pack(Point(1, 2)) == packb([1, 2])
+    # Objects returned unchanged by default are packed by fields.
+    packer = Packer(pack_objects="array", default=lambda obj: obj)
+    assert packer.pack([Point(1, 2), Point(3, 4)]) == packb([[1, 2, []], [3, 4, []]])
+    # NamedTuples are packed by fields without calling default.
+    packer = Packer(pack_objects="map", default=lambda obj: 1 / 0)
+    assert packer.pack(Pair(1, "a")) == packb({"first": 1, "second": "a"})
+
+
+def test_pack_objects_unset_slots():
+    obj = SlottedChild(1, 2, 3)
+    del obj.a
+    assert Packer(pack_objects="map").pack(obj) == packb({"_Slotted__b": 2, "c": 3})
+    assert Packer(pack_objects="array").pack(obj) == packb([None, 2, 3])
+
+
+def test_pack_objects_disabled():
+    with raises(TypeError):
+        packb(Point(1, 2))
+    assert packb(Pair(1, "a")) == packb([1, "a"])
+    with raises(ValueError):
+        Packer(pack_objects="list")
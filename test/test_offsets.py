@@ -0,0 +1,115 @@
+import io
+from array import array
+
+from pytest import raises
+
+from msgpack import FormatError, StackError, Unpacker, packb, scan_offsets
+
+OBJECTS = [
+    1,
+    "abc",
+    [1, {"a": [None, True, 1.5]}],
+    b"x" * 70000,
+    {"k": "v" * 300},
+    [[[[]]]],
+    2**64 - 1,
+]
+
+
+def packed_objects():
+    offsets = []
+    data = b""
+    for o in OBJECTS:
+        offsets.append(len(data))
+        data += packb(o)
+    return data, offsets
+
+
+def test_scan_offsets_buffer():
+    data, offsets = packed_objects()
+    result = scan_offsets(data)
+    assert isinstance(result, array)
+    assert result.typecode == "Q"
+    assert list(result) == offsets
+    assert list(scan_offsets(bytearray(data))) == offsets
+    assert list(scan_offsets(memoryview(data))) == offsets
+    assert list(scan_offsets(b"")) == []
+
+
+def test_scan_offsets_file():
+    data, offsets = packed_objects()
+    for read_size in (1, 7, 1024, 1024 * 1024):
+        assert list(scan_offsets(io.BytesIO(data), read_size=read_size)) == offsets
+    # Offsets count from the start of the file.
+    f = io.BytesIO(b"\xc0" + data)
+    f.seek(1)
+    assert list(scan_offsets(f)) == [o + 1 for o in offsets]
+
+
+def test_scan_offsets_invalid():
+    data, _ = packed_objects()
+    with raises(ValueError):
+        scan_offsets(data[:-1])
+    with raises(ValueError):
+        scan_offsets(io.BytesIO(data[:-1]), read_size=10)
+    with raises(FormatError):
+        scan_offsets(b"\x01\xc1")
+    with raises(FormatError):
+        scan_offsets(io.BytesIO(b"\x01\xc1"))
+
+
+def test_scan_offsets_max_depth():
+    deep = b"\x91" * 5000 + b"\x01"
+    with raises(StackError):
+        scan_offsets(deep)
+    with raises(StackError):
+        scan_offsets(io.BytesIO(deep))
+    # The same limit as Unpacker, empty containers included.
+    data = b"\x91" * 9 + b"\x80" + b"\x01"
+    assert list(scan_offsets(data, max_depth=10)) == [0, 10]
+    with raises(StackError):
+        scan_offsets(data, max_depth=9)
+    unpacker = Unpacker(max_depth=9)
+    unpacker.feed(data)
+    with raises(StackError):
+        unpacker.unpack()
+
+
+def test_seek():
+    data, offsets = packed_objects()
+    unpacker = Unpacker(io.BytesIO(data), read_size=16)
+    for i in (3, 0, 6, 2, 2, 5):
+        unpacker.seek(offsets[i])
+        assert unpacker.tell() == offsets[i]
+        assert unpacker.unpack() == OBJECTS[i]
+    assert list(unpacker) == OBJECTS[6:]
+    # The file can be read again after EOF.
+    unpacker.seek(offsets[4])
+    assert list(unpacker) == OBJECTS[4:]
+    assert unpacker.tell() == len(data)
+
+
+def test_seek_partial_object():
+    data, offsets = packed_objects()
+
+    def hook(obj):
+        raise KeyError
+
+    unpacker = Unpacker(io.BytesIO(data), read_size=16, object_hook=hook)
+    unpacker.seek(offsets[2])
+    with raises(KeyError):
+        unpacker.unpack()
+    unpacker.seek(offsets[3] + 5)
+    assert unpacker.unpack() == ord("x")
+    unpacker.seek(offsets[2])
+    assert unpacker.read_array_header() == 2
+    assert unpacker.unpack() == 1
+
+
+def test_seek_unsupported():
+    unpacker = Unpacker()
+    with raises(io.UnsupportedOperation):
+        unpacker.seek(0)
+    unpacker = Unpacker(io.BytesIO(b""))
+    with raises(ValueError):
+        unpacker.seek(-1)
@@ -200,3 +200,260 @@ def test_buf_size_is_converted_once():
     buf_size = Counting()
     Packer(buf_size=buf_size)
     assert buf_size.count == 1
+
+
+def test_zero_copy():
+    packer = Packer(zero_copy=True, buf_size=16)
+    for obj in [1, "a" * 100, [b"x" * 1000] * 100, {}]:
+        assert packer.pack(obj) == packb(obj)
+    assert packer.pack_array_header(2) == b"\x92"
+    assert packer.pack_map_header(1) == b"\x81"
+    assert packer.pack_map_pairs([(1, 2)]) == b"\x81\x01\x02"
+    assert packer.pack_ext_type(1, b"a") == b"\xd4\x01a"
+
+
+def test_zero_copy_after_error():
+    packer = Packer(zero_copy=True)
+    with pytest.raises(TypeError):
+        packer.pack([1, object()])
+    assert packer.pack([1, 2]) == b"\x92\x01\x02"
+    with pytest.raises(TypeError):
+        packer.pack_map_pairs([(1, 2), (3, object())])
+    for obj in [1, "abc", [1, 2], {"a": None}]:
+        assert packer.pack(obj) == packb(obj)
+
+
+def test_zero_copy_small_after_large_error():
+    import tracemalloc
+
+    packer = Packer(zero_copy=True)
+    assert packer.pack(1) == b"\x01"
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        with pytest.raises(TypeError):
+            packer.pack([b"x" * (4 * 1024 * 1024), object()])
+        # The grown buffer is not kept after the error.
+        assert tracemalloc.get_traced_memory()[0] - before < 64 * 1024
+    finally:
+        tracemalloc.stop()
+    assert packer.pack([1, "a"]) == b"\x92\x01\xa1a"
+    # Sizes carried over from a large message don't change the results.
+    large = [b"x" * 100000, "y" * 1000]
+    assert packer.pack(large) == packb(large)
+    for obj in [None, "a" * 40, list(range(100)), large]:
+        assert packer.pack(obj) == packb(obj)
+
+
+def test_zero_copy_requires_autoreset():
+    with pytest.raises(ValueError):
+        Packer(zero_copy=True, autoreset=False)
+
+
+def test_packb_reentrant():
+    class Point:
+        def __init__(self, x, y):
+            self.x, self.y = x, y
+
+    def default(obj):
+        return packb([obj.x, obj.y])
+
+    packed = packb([Point(1, 2), Point(3, 4)], default=default)
+    assert unpackb(packed) == [packb([1, 2]), packb([3, 4])]
+
+
+def test_packb_unhashable_option():
+    class Default:
+        __hash__ = None
+
+        def __call__(self, obj):
+            return str(obj)
+
+    assert unpackb(packb(object, default=Default())) == str(object)
+
+
+def test_packb_autoreset_false():
+    assert packb(1, autoreset=False) is None
+    assert packb(1, autoreset=True) == b"\x01"
+
+
+def test_packb_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    data = [{"id": i, "name": "x" * i} for i in range(100)]
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(packb, data))
+    assert [unpackb(r) for r in results] == data
+
+
+def test_packb_many_options():
+    for _ in range(2):
+        for i in range(20):
+            assert packb("a" * i, buf_size=1024 + i) == packb("a" * i)
+
+
+def test_packb_pool_memory():
+    import tracemalloc
+
+    data = b"x" * (8 * 1024 * 1024)
+    packb(1)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        packb(data)
+        # The pooled packer doesn't keep the large buffer.
+        assert tracemalloc.get_traced_memory()[0] - before < 1024 * 1024
+    finally:
+        tracemalloc.stop()
+    assert packb(data, buf_retain=0) == packb(data)
+
+
+def test_packb_pool_mutable_options():
+    class A:
+        pass
+
+    encoders = {}
+    assert packb(1, type_encoders=encoders) == b"\x01"
+    encoders[A] = lambda obj: "A"
+    assert packb(A(), type_encoders=encoders) == packb("A")
+
+    class Default:
+        def __init__(self):
+            self.value = 1
+
+        def __call__(self, obj):
+            return self.value
+
+    default = Default()
+    assert packb(A(), default=default) == b"\x01"
+    default.value = 2
+    # Cached decisions are kept by the packer, like with Packer(default=...).
+    assert packb(A(), default=default) == Packer(default=default).pack(A())
+    assert packb(A(), default=Default()) == b"\x01"
+
+
+@pytest.mark.parametrize("growth", [1.0, 1.5, 2.0])
+def test_buf_growth(growth):
+    data = [b"x" * 100, "y" * 1000, list(range(1000))]
+    packer = Packer(buf_size=16, buf_growth=growth, buf_retain=64)
+    for obj in data:
+        assert packer.pack(obj) == packb(obj)
+
+    packer = Packer(autoreset=False, buf_size=16, buf_growth=growth, buf_retain=64)
+    for obj in data:
+        packer.pack(obj)
+    expected = b"".join(packb(obj) for obj in data)
+    assert packer.bytes() == expected
+    assert packer.getbuffer() == expected
+    packer.pack(1)
+    assert packer.bytes() == expected + b"\x01"
+    packer.reset()
+    assert packer.bytes() == b""
+    packer.pack(data)
+    assert packer.bytes() == packb(data)
+
+
+def test_buf_size_zero():
+    import tracemalloc
+
+    data = list(range(10000))
+    expected = packb(data)
+    tracemalloc.start()
+    try:
+        packer = Packer(buf_size=0, buf_growth=1.0, autoreset=False)
+        packer.pack(data)
+        # Segments don't shrink to one per write.
+        assert tracemalloc.get_traced_memory()[1] < 4 * len(expected) + 64 * 1024
+    finally:
+        tracemalloc.stop()
+    assert packer.bytes() == expected
+    assert Packer(buf_size=0).pack(data) == expected
+
+
+def test_buf_growth_after_error():
+    packer = Packer(buf_size=16)
+    with pytest.raises(TypeError):
+        packer.pack([b"x" * 100, object()])
+    assert packer.pack([1, 2]) == b"\x92\x01\x02"
+
+
+def test_buf_options_invalid():
+    with pytest.raises(ValueError):
+        Packer(buf_growth=0.5)
+    with pytest.raises(ValueError):
+        Packer(buf_retain=-1)
+
+
+@pytest.mark.parametrize("use_bin_type", [True, False])
+def test_key_cache(use_bin_type):
+    keys = ["id", "name", "é" * 20, "k" * 40, "x" * 300] + ["key%d" % i for i in range(20)]
+    records = [{k: i for k in keys} for i in range(3)]
+    records.append({1: "id", b"id": "name"})
+    for size in [1, 4, 256]:
+        packer = Packer(key_cache=size, use_bin_type=use_bin_type)
+        for _ in range(2):
+            assert packer.pack(records) == packb(records, use_bin_type=use_bin_type)
+
+
+def test_key_cache_unicode_errors():
+    packer = Packer(key_cache=16, unicode_errors="ignore")
+    data = {"a\udc80b": 1}
+    assert packer.pack(data) == packer.pack(data) == packb({"ab": 1})
+
+
+def test_key_cache_str_encoder():
+    # An encoder for str applies to cached keys as to values.
+    packer = Packer(key_cache=16, type_encoders={str: str.upper})
+    data = {"a": "b", "c": {"a": 1}}
+    expected = packb({"A": "B", "C": {"A": 1}})
+    assert packer.pack(data) == packer.pack(data) == expected
+
+
+def test_key_cache_invalid():
+    with pytest.raises(ValueError):
+        Packer(key_cache=-1)
+
+
+def test_type_encoders():
+    class Point:
+        def __init__(self, x, y):
+            self.x, self.y = x, y
+
+    class Point3(Point):
+        pass
+
+    packer = Packer(type_encoders={Point: lambda p: [p.x, p.y], complex: str})
+    assert packer.pack([Point(1, 2), 1j]) == packb([[1, 2], "1j"])
+    # Lookup is by exact type.
+    with pytest.raises(TypeError):
+        packer.pack(Point3(1, 2))
+
+    packer = Packer(type_encoders={Point: lambda p: [p.x, p.y]}, default=lambda p: [p.x, p.y, 3])
+    assert packer.pack([Point3(1, 2), Point(1, 2)]) == packb([[1, 2, 3], [1, 2]])
+
+    with pytest.raises(TypeError):
+        Packer(type_encoders={Point: None})
+
+
+def test_default_decision_cache():
+    from decimal import Decimal
+
+    calls = []
+
+    def default(obj):
+        calls.append(obj)
+        return str(obj)
+
+    packer = Packer(default=default)
+    for _ in range(3):
+        assert packer.pack([Decimal("1.5"), 1 << 70]) == packb(["1.5", str(1 << 70)])
+    assert len(calls) == 6
+
+
+def test_default_decision_cache_datetime():
+    from datetime import datetime, timezone
+
+    packer = Packer(datetime=True, default=lambda obj: "naive")
+    assert packer.pack(datetime(2000, 1, 1)) == packb("naive")
+    aware = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    assert packer.pack(aware) == packb(aware, datetime=True)
@@ -0,0 +1,52 @@
+from array import array
+
+from pytest import raises
+
+from msgpack import Packer, Unpacker, packb, scan_offsets, unpackb
+
+OBJECTS = [1, "abc", [1, 2, {"a": b"x" * 100}], None, {"k": [1.5, True]}, b"y" * 70000]
+
+
+def test_pack_many():
+    data, offsets = Packer().pack_many(OBJECTS)
+    assert data == b"".join(packb(o) for o in OBJECTS)
+    assert isinstance(offsets, array)
+    assert offsets.typecode == "Q"
+    assert offsets == scan_offsets(data)
+    ends = list(offsets[1:]) + [len(data)]
+    assert [unpackb(data[s:e]) for s, e in zip(offsets, ends)] == OBJECTS
+
+
+def test_pack_many_iterable():
+    packer = Packer()
+    assert packer.pack_many(iter(OBJECTS)) == packer.pack_many(OBJECTS)
+    assert packer.pack_many(tuple(OBJECTS)) == packer.pack_many(OBJECTS)
+    assert packer.pack_many([]) == (b"", array("Q"))
+    # autoreset
+    assert packer.pack_many([1]) == (b"\x01", array("Q", [0]))
+
+
+def test_pack_many_no_autoreset():
+    packer = Packer(autoreset=False)
+    packer.pack("head")
+    data, offsets = packer.pack_many([1, "abc"])
+    assert data is None
+    assert list(offsets) == [5, 6]
+    unpacker = Unpacker()
+    unpacker.feed(packer.bytes())
+    assert list(unpacker) == ["head", 1, "abc"]
+
+
+def test_pack_many_error():
+    packer = Packer()
+    with raises(TypeError):
+        packer.pack_many([1, object()])
+    # The buffer is reset after an error.
+    assert packer.pack_many([2]) == (b"\x02", array("Q", [0]))
+
+
+def test_pack_many_default():
+    packer = Packer(default=list)
+    data, offsets = packer.pack_many([{1, 2}, 3])
+    assert data == packb([1, 2]) + packb(3)
+    assert list(offsets) == [0, 3]
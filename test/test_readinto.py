@@ -0,0 +1,122 @@
+import io
+import socket
+
+from pytest import raises
+
+from msgpack import BufferFull, Unpacker, packb
+
+OBJECTS = [1, "abc", [1, {"a": b"bin"}], b"x" * 1000, {"k": "v" * 300}] * 20
+DATA = b"".join(packb(o) for o in OBJECTS)
+
+
+class ReadInto:
+    """File with readinto() only, returning short reads."""
+
+    def __init__(self, data, chunk):
+        self.f = io.BytesIO(data)
+        self.chunk = chunk
+        self.calls = 0
+
+    def readinto(self, b):
+        self.calls += 1
+        with memoryview(b) as view:
+            return self.f.readinto(view[: self.chunk])
+
+    def read(self, n):
+        raise AssertionError("read() is not used")
+
+
+def test_readinto():
+    for chunk in (1, 7, 100, 10**6):
+        f = ReadInto(DATA, chunk)
+        unpacker = Unpacker(f, read_size=64)
+        assert list(unpacker) == OBJECTS
+        assert unpacker.tell() == len(DATA)
+        assert f.calls > 0
+
+
+def test_readinto_read_bytes():
+    data = packb([1, 2]) + b"raw bytes" + packb("end")
+    f = io.BytesIO(data)
+    unpacker = Unpacker(f, read_size=4)
+    assert unpacker.unpack() == [1, 2]
+    assert unpacker.read_bytes(9) == b"raw bytes"
+    assert unpacker.unpack() == "end"
+
+
+def test_readinto_buffer_full():
+    unpacker = Unpacker(
+        io.BytesIO(packb(b"x" * 100)), read_size=10, max_buffer_size=50, max_bin_len=100
+    )
+    with raises(BufferFull):
+        unpacker.unpack()
+
+
+def test_recv_into():
+    a, b = socket.socketpair()
+    try:
+        a.sendall(DATA)
+        a.shutdown(socket.SHUT_WR)
+        unpacker = Unpacker(b, read_size=256)
+        assert list(unpacker) == OBJECTS
+    finally:
+        a.close()
+        b.close()
+
+
+def test_recv_into_read_bytes():
+    a, b = socket.socketpair()
+    try:
+        a.sendall(packb(1) + b"abcdef")
+        a.shutdown(socket.SHUT_WR)
+        unpacker = Unpacker(b, read_size=1)
+        assert unpacker.unpack() == 1
+        assert unpacker.read_bytes(6) == b"abcdef"
+    finally:
+        a.close()
+        b.close()
+
+
+class RawRead(io.RawIOBase):
+    """io.RawIOBase implementing read() only."""
+
+    def __init__(self, data):
+        self.f = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def read(self, n=-1):
+        return self.f.read(n)
+
+
+class RawNotImplemented(RawRead):
+    def readinto(self, b):
+        raise NotImplementedError
+
+
+def test_raw_read_only():
+    for cls in (RawRead, RawNotImplemented):
+        unpacker = Unpacker(cls(DATA), read_size=64)
+        assert list(unpacker) == OBJECTS
+        unpacker = Unpacker(cls(packb(1) + b"abc"), read_size=1)
+        assert unpacker.unpack() == 1
+        assert unpacker.read_bytes(3) == b"abc"
+
+
+def test_readinto_bad_count():
+    class Bad(ReadInto):
+        def readinto(self, b):
+            return len(b) + 1
+
+    with raises(ValueError):
+        Unpacker(Bad(DATA, 10)).unpack()
+
+
+def test_read_bytes_type():
+    unpacker = Unpacker(io.BytesIO(packb(1) + b"abc"))
+    assert unpacker.unpack() == 1
+    assert type(unpacker.read_bytes(3)) is bytes
+    unpacker = Unpacker()
+    unpacker.feed(b"abc")
+    assert type(unpacker.read_bytes(3)) is bytes
@@ -0,0 +1,124 @@
+from dataclasses import dataclass, field
+from typing import NamedTuple, Optional
+
+from pytest import raises
+
+from msgpack import ExtraData, Timestamp, Unpacker, packb, unpackb
+
+
+@dataclass
+class Point:
+    x: int
+    y: float = 0.0
+
+
+@dataclass
+class Node:
+    name: str
+    children: list["Node"] = field(default_factory=list)
+    location: Optional[Point] = None
+
+
+@dataclass(kw_only=True)
+class Options:
+    verbose: bool = False
+    level: int
+
+
+class Pair(NamedTuple):
+    key: str
+    value: object = None
+
+
+def test_schema_map():
+    assert unpackb(packb({"x": 1, "y": 2.5}), schema=Point) == Point(1, 2.5)
+    assert unpackb(packb({"y": 2, "x": 1}), schema=Point) == Point(1, 2)
+    # Unknown keys are ignored and missing fields take their default.
+    assert unpackb(packb({"x": 1, "z": [1, {"a": 2}]}), schema=Point) == Point(1)
+
+
+def test_schema_array():
+    assert unpackb(packb([1, 2.5]), schema=Point) == Point(1, 2.5)
+    assert unpackb(packb([1]), schema=Point) == Point(1)
+    with raises(ValueError, match="Point: expected at most 2 items, got 3"):
+        unpackb(packb([1, 2.5, 3]), schema=Point)
+    with raises(ValueError, match="Point: expected at most 2 items, got 3"):
+        unpackb(packb({"name": "a", "location": [1, 2.5, 3]}), schema=Node)
+
+
+def test_schema_nested():
+    data = {
+        "name": "root",
+        "children": [{"name": "a", "location": {"x": 1}}, {"name": "b"}],
+        "location": None,
+    }
+    expected = Node("root", [Node("a", location=Point(1)), Node("b")])
+    assert unpackb(packb(data), schema=Node) == expected
+    assert unpackb(packb(data), schema=Node).children[1].children == []
+
+
+def test_schema_kw_only():
+    assert unpackb(packb({"level": 2}), schema=Options) == Options(level=2)
+    assert unpackb(packb([True, 3]), schema=Options) == Options(verbose=True, level=3)
+
+
+def test_schema_namedtuple():
+    assert unpackb(packb({"key": "a"}), schema=Pair) == Pair("a")
+    assert unpackb(packb({"key": "a", "value": [1]}), schema=Pair) == Pair("a", [1])
+
+
+def test_schema_raw():
+    packed = packb({b"x": 1}, use_bin_type=False)
+    assert unpackb(packed, schema=Point, raw=True) == Point(1)
+
+
+def test_schema_type_error():
+    with raises(ValueError, match="Point.x: expected int, got str"):
+        unpackb(packb({"x": "1"}), schema=Point)
+    with raises(ValueError, match=r"Point.y: expected float \| int, got NoneType"):
+        unpackb(packb({"x": 1, "y": None}), schema=Point)
+    with raises(ValueError, match="missing field 'x'"):
+        unpackb(packb({"y": 1.0}), schema=Point)
+    with raises(ValueError):
+        unpackb(packb({1: 2}), schema=Point)
+
+
+def test_schema_not_a_record():
+    with raises(ValueError, match="Point: expected a map or an array, got int"):
+        unpackb(packb(1), schema=Point)
+    with raises(ValueError, match="Point: expected a map or an array, got NoneType"):
+        unpackb(packb(None), schema=Point)
+    unpacker = Unpacker(schema=Point)
+    unpacker.feed(packb("x"))
+    with raises(ValueError, match="got str"):
+        unpacker.unpack()
+    with raises(ValueError, match="Node.children"):
+        unpackb(packb({"name": "a", "children": 1}), schema=Node)
+    with raises(TypeError):
+        unpackb(packb({}), schema=dict)
+
+
+def test_schema_unpacker():
+    unpacker = Unpacker(schema=Point, use_list=False)
+    unpacker.feed(packb({"x": 1}) + packb([2, 3.0]))
+    assert list(unpacker) == [Point(1), Point(2, 3.0)]
+
+    unpacker.feed(packb({"x": 4})[:2])
+    assert list(unpacker) == []
+    unpacker.feed(packb({"x": 4})[2:])
+    assert unpacker.unpack() == Point(4)
+
+
+def test_schema_extradata():
+    with raises(ExtraData) as e:
+        unpackb(packb({"x": 1}) + b"\x01", schema=Point)
+    assert e.value.unpacked == Point(1)
+
+
+def test_schema_timestamp():
+    @dataclass
+    class Event:
+        at: Timestamp
+
+    ts = Timestamp(1, 2)
+    assert unpackb(packb({"at": ts}), schema=Event) == Event(ts)
@@ -0,0 +1,100 @@
+from collections import OrderedDict
+
+from pytest import raises
+
+from msgpack import ExtraData, FormatError, Selector, packb, unpackb
+
+DOC = {
+    "user": {"id": 1, "name": "alice", "tags": ["a", "b"]},
+    "events": [
+        {"ts": 10, "kind": "login", "data": {"ip": "127.0.0.1"}},
+        {"ts": 11, "kind": "logout", "data": [1, 2.5, None, b"x"]},
+        "not a map",
+    ],
+    "blob": b"\x00" * 100,
+    "nested": [[1, [2, 3]], {"a": {"b": 1}}],
+}
+
+
+def test_select():
+    packed = packb(DOC)
+    assert unpackb(packed, select=[("user", "id"), ("events", "*", "ts")]) == {
+        "user": {"id": 1},
+        "events": [{"ts": 10}, {"ts": 11}, "not a map"],
+    }
+    assert unpackb(packed, select=[("user",)]) == {"user": DOC["user"]}
+    assert unpackb(packed, select=[("missing", "x")]) == {}
+    assert unpackb(packed, select=[()]) == DOC
+    assert unpackb(packb(1), select=[("a",)]) == 1
+
+
+def test_select_wildcard():
+    packed = packb(DOC)
+    assert unpackb(packed, select=[("*", "id")]) == {
+        "user": {"id": 1},
+        "events": [],
+        "blob": b"\x00" * 100,
+        "nested": [],
+    }
+    # The wildcard is merged with explicit keys.
+    assert unpackb(packed, select=[("user", "name"), ("*", "id")])["user"] == {
+        "id": 1,
+        "name": "alice",
+    }
+    assert unpackb(packed, select=[("nested", "*", "a")]) == {"nested": [[], {"a": {"b": 1}}]}
+    assert unpackb(packed, select=[("user", "tags"), ("user", "tags", "x")]) == {
+        "user": {"tags": ["a", "b"]}
+    }
+
+
+def test_select_key_on_array():
+    # Only "*" selects array items: a named key yields an empty list, also
+    # when the array would hold maps with that key.
+    packed = packb({"a": [{"b": 1}, {"b": 2}], "c": 3})
+    assert unpackb(packed, select=[("a", "b")]) == {"a": []}
+    assert unpackb(packed, select=[("a", "*", "b")]) == {"a": [{"b": 1}, {"b": 2}]}
+    assert unpackb(packed, select=[("c", "b")]) == {"c": 3}
+    assert unpackb(packb([{"b": 1}]), select=[("b",)], use_list=False) == ()
+
+
+def test_select_hooks():
+    packed = packb(DOC)
+    sel = Selector([("user", "id"), ("events", "*", "kind")])
+    ret = unpackb(packed, select=sel, object_pairs_hook=OrderedDict, use_list=False)
+    assert ret == OrderedDict(
+        [
+            ("user", OrderedDict([("id", 1)])),
+            ("events", ({"kind": "login"}, {"kind": "logout"}, "not a map")),
+        ]
+    )
+    assert isinstance(ret["events"], tuple)
+    assert unpackb(packed, select=sel, object_hook=len, list_hook=len) == 2
+    assert unpackb(packb({"a": [1]}), select=[("b",)], object_pairs_hook=list) == []
+
+
+def test_select_errors():
+    packed = packb(DOC)
+    with raises(ValueError):
+        unpackb(packed[:-1], select=[("user",)])
+    with raises(ExtraData):
+        unpackb(packed + b"\x00", select=[("user",)])
+    with raises(FormatError):
+        unpackb(b"\x82\xa1a\x01\xa1b\xc1", select=[("a",)])
+    with raises(ValueError):
+        unpackb(packed, select=[])
+    with raises(TypeError):
+        unpackb(packed, select=["user"])
+    with raises(ValueError):
+        unpackb(packed, select=[("user",)], schema=dict)
+
+
+def test_select_skips_invalid_values():
+    # Skipped values are not decoded.
+    packed = packb({"a": 1, "b": b"\xff"}, use_bin_type=False)
+    assert unpackb(packed, select=[("a",)]) == {"a": 1}
+    packed = packb({"a": 1, 2: 3})
+    assert unpackb(packed, select=[("a",)]) == {"a": 1}
+
+
+def test_selector_repr():
+    assert repr(Selector([("a", "b")])) == "Selector([('a', 'b')])"
@@ -1,4 +1,6 @@
+import copy
 import datetime
+import pickle
 
 import pytest
 
@@ -216,3 +218,122 @@ def test_too_large_timestamp():
     # When timestamp64 is too large, conversion to datetime fails due to int64 -> int32 conversion.
     # https://github.com/msgpack/msgpack-python/issues/696
     print(msgpack.unpackb(b"\xd7\xff" + b"\x00" * 8, timestamp=3))
+
+
+def test_timestamp_seconds_range():
+    for seconds in (-(2**63), 2**63 - 1):
+        ts = Timestamp(seconds, 1)
+        assert ts.seconds == seconds
+        assert msgpack.unpackb(msgpack.packb(ts)) == ts
+    for seconds in (-(2**63) - 1, 2**63, 2**100):
+        with pytest.raises(ValueError, match="64-bit"):
+            Timestamp(seconds)
+
+
+def test_timestamp_pickle():
+    ts = Timestamp(-3, 700000000)
+    for proto in range(2, pickle.HIGHEST_PROTOCOL + 1):
+        assert pickle.loads(pickle.dumps(ts, proto)) == ts
+    assert copy.copy(ts) == ts
+    # Pickled by the pure Python Timestamp, with the state of its slots.
+    data = (
+        b"\x80\x02cmsgpack.ext\nTimestamp\nq\x00)\x81q\x01N}q\x02(X\x07\x00\x00\x00secondsq"
+        b"\x03K\x05X\x0b\x00\x00\x00nanosecondsq\x04K\x06u\x86q\x05b."
+    )
+    assert pickle.loads(data) == Timestamp(5, 6)
+    # Pickled by the C Timestamp.
+    data = b"\x80\x02cmsgpack.ext\nTimestamp\nq\x00K\x05K\x06\x86q\x01Rq\x02."
+    assert pickle.loads(data) == Timestamp(5, 6)
+
+
+def test_timestamp_methods():
+    ts = Timestamp(5, 6)
+    assert repr(ts) == "Timestamp(seconds=5, nanoseconds=6)"
+    assert hash(ts) == hash((5, 6))
+    assert ts != Timestamp(5, 7)
+    assert ts != (5, 6)
+    assert Timestamp.from_bytes(bytearray(ts.to_bytes())) == ts
+    assert Timestamp.from_unix_nano(ts.to_unix_nano()) == ts
+    assert ts.to_unix() == 5.000000006
+    with pytest.raises(ValueError):
+        Timestamp.from_bytes(b"\x00" * 5)
+    with pytest.raises(TypeError):
+        Timestamp(1.0)
+    with pytest.raises(TypeError):
+        Timestamp(1, 1.0)
+    with pytest.raises(ValueError):
+        Timestamp(1, 10**9)
+    with pytest.raises(ValueError):
+        Timestamp(1, -1)
+    assert isinstance(msgpack.unpackb(msgpack.packb(ts)), Timestamp)
+
+
+def test_datetime_fields():
+    utc = datetime.timezone.utc
+    epoch = datetime.datetime(1970, 1, 1, tzinfo=utc)
+    zones = [
+        utc,
+        datetime.timezone(datetime.timedelta(hours=5, minutes=30)),
+        datetime.timezone(-datetime.timedelta(hours=11, seconds=1, microseconds=1)),
+    ]
+    dates = [
+        datetime.datetime(1, 1, 2, 0, 0, 0, 1),
+        datetime.datetime(1600, 2, 29, 12, 30, 15, 999999),
+        datetime.datetime(1969, 12, 31, 23, 59, 59, 500000),
+        datetime.datetime(1970, 3, 1),
+        datetime.datetime(2000, 2, 29, 1, 2, 3, 4),
+        datetime.datetime(2100, 3, 1, 23, 59, 59),
+        datetime.datetime(9999, 12, 30, 23, 59, 59, 999999),
+    ]
+    for tz in zones:
+        for dt in dates:
+            dt = dt.replace(tzinfo=tz)
+            delta = dt - epoch
+            ts = Timestamp(delta.days * 86400 + delta.seconds, delta.microseconds * 1000)
+            assert Timestamp.from_datetime(dt) == ts
+            packed = msgpack.packb(dt, datetime=True)
+            assert msgpack.unpackb(packed) == ts
+            assert msgpack.unpackb(packed, timestamp=3) == dt
+            assert ts.to_datetime() == dt
+
+
+def test_datetime_out_of_range():
+    for seconds in (-62135596801, 253402300800):
+        packed = msgpack.packb(Timestamp(seconds))
+        with pytest.raises(OverflowError):
+            msgpack.unpackb(packed, timestamp=3)
+        with pytest.raises(OverflowError):
+            msgpack.unpackb(packed, timestamp=4)
+
+
+def test_pack_naive_utc():
+    utc = datetime.timezone.utc
+    dt = datetime.datetime(2024, 2, 29, 13, 14, 15, 16)
+    packed = msgpack.packb(dt, datetime=True, naive_utc=True)
+    assert packed == msgpack.packb(dt.replace(tzinfo=utc), datetime=True)
+    assert msgpack.unpackb(packed, timestamp=4) == dt
+    assert msgpack.unpackb(packed, timestamp=3) == dt.replace(tzinfo=utc)
+    assert msgpack.unpackb(packed, timestamp=4).tzinfo is None
+    with pytest.raises(ValueError):
+        msgpack.packb(dt, naive_utc=True)
+    with pytest.raises(ValueError):
+        msgpack.unpackb(packed, timestamp=5)
+
+
+def test_pack_date():
+    day = datetime.date(1969, 7, 20)
+    packed = msgpack.packb(day, datetime=True, naive_utc=True)
+    assert msgpack.unpackb(packed, timestamp=4) == datetime.datetime(1969, 7, 20)
+    # Without naive_utc, dates are left to default as before.
+    packed = msgpack.packb([day], datetime=True, default=str)
+    assert msgpack.unpackb(packed) == ["1969-07-20"]
+
+
+def test_pack_datetime_without_utcoffset():
+    class NoOffset(datetime.tzinfo):
+        def utcoffset(self, dt):
+            return None
+
+    dt = datetime.datetime(2000, 1, 1, tzinfo=NoOffset())
+    with pytest.raises(TypeError):
+        msgpack.packb(dt, datetime=True)
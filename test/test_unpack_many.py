@@ -0,0 +1,96 @@
+import io
+
+from pytest import raises
+
+from msgpack import FormatError, Unpacker, packb
+
+OBJECTS = [1, "abc", [1, 2, {"a": b"x" * 100}], None, 2**64 - 1] * 20
+DATA = b"".join(packb(o) for o in OBJECTS)
+
+
+def test_unpack_many():
+    unpacker = Unpacker()
+    assert unpacker.unpack_many() == []
+    unpacker.feed(DATA)
+    assert unpacker.unpack_many(3) == OBJECTS[:3]
+    assert unpacker.unpack_many(0) == []
+    assert unpacker.unpack_many() == OBJECTS[3:]
+    assert unpacker.unpack_many() == []
+    assert unpacker.tell() == len(DATA)
+
+
+def test_unpack_many_max_bytes():
+    unpacker = Unpacker()
+    unpacker.feed(DATA)
+    # Stops after the object which reaches max_bytes.
+    assert unpacker.unpack_many(max_bytes=1) == [1]
+    assert unpacker.unpack_many(max_bytes=len(packb("abc")) + 1) == OBJECTS[1:3]
+    assert unpacker.unpack_many(2, max_bytes=len(DATA)) == OBJECTS[3:5]
+
+
+def test_unpack_many_partial():
+    unpacker = Unpacker()
+    for i in range(0, len(DATA), 7):
+        unpacker.feed(DATA[i : i + 7])
+        unpacker.unpack_many()
+    unpacker = Unpacker()
+    result = []
+    for i in range(0, len(DATA), 7):
+        unpacker.feed(DATA[i : i + 7])
+        result += unpacker.unpack_many()
+    assert result == OBJECTS
+
+
+def test_unpack_many_file():
+    unpacker = Unpacker(io.BytesIO(DATA), read_size=16)
+    result = []
+    while True:
+        objs = unpacker.unpack_many(7)
+        if not objs:
+            break
+        assert len(objs) <= 7
+        result += objs
+    assert result == OBJECTS
+
+
+def test_unpack_many_error():
+    unpacker = Unpacker()
+    unpacker.feed(packb(1) + packb(2) + b"\xc1" + packb(3))
+    assert unpacker.unpack_many() == [1, 2]
+    with raises(FormatError):
+        unpacker.unpack_many()
+
+    def hook(obj):
+        if obj == {"b": 2}:
+            raise KeyError
+        return obj
+
+    unpacker = Unpacker(object_hook=hook)
+    unpacker.feed(packb({"a": 1}) + packb({"b": 2}))
+    assert unpacker.unpack_many() == [{"a": 1}]
+    with raises(KeyError):
+        unpacker.unpack_many()
+    with raises(ValueError):
+        unpacker.unpack_many(-1)
+
+
+def test_iter_batches():
+    unpacker = Unpacker(io.BytesIO(DATA), read_size=16)
+    batches = list(unpacker.iter_batches(30))
+    assert [len(b) for b in batches] == [30, 30, 30, 10]
+    assert sum(batches, []) == OBJECTS
+
+    unpacker = Unpacker()
+    unpacker.feed(DATA)
+    assert sum(unpacker.iter_batches(7), []) == OBJECTS
+    with raises(ValueError):
+        next(unpacker.iter_batches(0))
+
+
+def test_iter_batches_error():
+    unpacker = Unpacker()
+    unpacker.feed(packb(1) + packb(2) + b"\xc1")
+    batches = unpacker.iter_batches(10)
+    assert next(batches) == [1, 2]
+    with raises(FormatError):
+        next(batches)
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+
+from pytest import raises
+
+from msgpack import ExtraData, FormatError, packb, unpackb, unpackb_many
+
+OBJECTS = [1, "abc", [1, 2, {"a": b"x" * 100}], None, {"k": [1.5, True]}]
+
+
+def test_unpackb_many():
+    payloads = [packb(o) for o in OBJECTS]
+    assert unpackb_many(payloads) == OBJECTS
+    assert unpackb_many(iter(payloads)) == OBJECTS
+    assert unpackb_many([bytearray(p) for p in payloads]) == OBJECTS
+    assert unpackb_many([memoryview(p) for p in payloads]) == OBJECTS
+    assert unpackb_many([]) == []
+
+
+def test_unpackb_many_options():
+    payloads = [packb(o) for o in OBJECTS]
+    assert unpackb_many(payloads, use_list=False) == [unpackb(p, use_list=False) for p in payloads]
+    ret = unpackb_many(payloads, object_pairs_hook=OrderedDict)
+    assert isinstance(ret[4], OrderedDict)
+    assert unpackb_many(payloads, select=[("k",)])[4] == {"k": [1.5, True]}
+    assert unpackb_many([packb({"a": 1, "b": 2})] * 2, select=[("b",)]) == [{"b": 2}] * 2
+    # Limits are configured for each payload.
+    assert unpackb_many([packb([1] * 10), packb([1])]) == [[1] * 10, [1]]
+    with raises(ValueError):
+        unpackb_many(payloads, max_array_len=1)
+
+
+def test_unpackb_many_invalid_options():
+    with raises(ValueError):
+        unpackb_many([], on_error="ignore")
+    with raises(TypeError):
+        unpackb_many([], object_hook=1)
+    with raises(ValueError):
+        unpackb_many([], select=[("a",)], schema=dict)
+
+
+def test_unpackb_many_errors():
+    payloads = [packb(1), b"\xc1", packb(2)[:0], packb(3) + b"\x00", packb(4), None]
+    with raises(FormatError):
+        unpackb_many(payloads)
+    assert unpackb_many(payloads, on_error="skip") == [1, 4]
+    ret = unpackb_many(payloads, on_error="collect")
+    assert len(ret) == len(payloads)
+    assert ret[0] == 1
+    assert isinstance(ret[1], FormatError)
+    assert isinstance(ret[2], ValueError)
+    assert isinstance(ret[3], ExtraData)
+    assert ret[4] == 4
+    assert isinstance(ret[5], TypeError)
+
+
+def test_unpackb_many_hook_error():
+    def hook(obj):
+        if "bad" in obj:
+            raise KeyError
+        return obj
+
+    payloads = [packb({"a": 1}), packb({"bad": [1, 2]}), packb({"b": 2})]
+    with raises(KeyError):
+        unpackb_many(payloads, object_hook=hook)
+    assert unpackb_many(payloads, object_hook=hook, on_error="skip") == [{"a": 1}, {"b": 2}]